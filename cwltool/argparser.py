@@ -1,6 +1,7 @@
 """Command line argument parsing for cwltool."""
 
 import argparse
+import importlib.util
 import os
 from typing import (
     Any,
@@ -17,13 +18,22 @@ from typing import (
 
 from schema_salad.ref_resolver import file_uri
 
+from .file_copy import DEFAULT_STRATEGY, STRATEGIES
+from .job_cache import parse_size
 from .loghandler import _logger
 from .process import Process, shortname
 from .resolver import ga4gh_tool_registries
-from .software_requirements import SOFTWARE_REQUIREMENTS_ENABLED
 from .utils import DEFAULT_TMP_PREFIX
 
 
+def _software_requirements_enabled() -> bool:
+    """Check for galaxy-tool-util without importing cwltool.software_requirements."""
+    try:
+        return importlib.util.find_spec("galaxy.tool_util.deps") is not None
+    except ImportError:
+        return False
+
+
 def arg_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Reference executor for Common Workflow Language standards. "
@@ -141,6 +151,60 @@ def arg_parser() -> argparse.ArgumentParser:
         "troubleshooting of CWL documents.",
     )
 
+    parser.add_argument(
+        "--cache-max-size",
+        type=parse_size,
+        default=None,
+        metavar="SIZE",
+        help="Evict entries from --cachedir to keep it under SIZE bytes. "
+        "SIZE may end in K, M, G or T.",
+    )
+    parser.add_argument(
+        "--cache-max-age",
+        type=float,
+        default=None,
+        metavar="DAYS",
+        help="Evict entries from --cachedir that have not been used for DAYS days.",
+    )
+    parser.add_argument(
+        "--cache-eviction",
+        choices=("lru", "lfu"),
+        default="lru",
+        help="Evict the least recently used (default) or least frequently "
+        "used entries of --cachedir first.",
+    )
+    parser.add_argument(
+        "--remote-cache",
+        type=str,
+        default=None,
+        metavar="URL",
+        help="Share the entries of --cachedir with other machines through an "
+        "HTTP server (such as python -m cwltool.cache_backends) or a shared "
+        "directory.",
+    )
+    parser.add_argument(
+        "--incremental",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="Record the steps of the run and their outputs in DIR, and only "
+        "rerun the steps that changed since the last run recorded there, and "
+        "the steps after them.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Don't run anything; report which jobs would use outputs from "
+        "--cachedir, which would run, and which can't be told before the "
+        "outputs of others are made.",
+    )
+    parser.add_argument(
+        "--cache-gc",
+        action="store_true",
+        help="Evict entries from --cachedir according to --cache-max-size and "
+        "--cache-max-age, remove what interrupted runs left behind, and exit.",
+    )
+
     tmpgroup = parser.add_mutually_exclusive_group()
     tmpgroup.add_argument(
         "--rm-tmpdir",
@@ -188,6 +252,34 @@ def arg_parser() -> argparse.ArgumentParser:
         dest="move_outputs",
     )
 
+    parser.add_argument(
+        "--copy-strategy",
+        choices=tuple(STRATEGIES),
+        default=DEFAULT_STRATEGY,
+        help="How to copy outputs out of --cachedir and intermediate output "
+        "directories: 'reflink' clones files, or copies them in the kernel, "
+        "where the filesystem allows (default); 'link' also tries hardlinks "
+        "first, which makes copies that must not be modified in place; "
+        "'copy' always copies the contents.",
+    )
+    parser.add_argument(
+        "--staging-workers",
+        type=int,
+        default=8,
+        metavar="N",
+        help="Link or copy up to N input files of a job at a time (default 8).",
+    )
+    parser.add_argument(
+        "--writable-staging",
+        choices=("reflink", "copy", "overlay"),
+        default="reflink",
+        help="How to stage the writable inputs of a job: 'reflink' clones "
+        "them where the filesystem allows, and copies them otherwise "
+        "(default); 'copy' always copies the contents; 'overlay' also mounts "
+        "writable directories in Docker containers behind an overlay, which "
+        "needs a Docker daemon able to mount overlay filesystems.",
+    )
+
     pullgroup = parser.add_mutually_exclusive_group()
     pullgroup.add_argument(
         "--enable-pull",
@@ -313,7 +405,12 @@ def arg_parser() -> argparse.ArgumentParser:
         "--version", action="store_true", help="Print version and exit"
     )
     printgroup.add_argument(
-        "--validate", action="store_true", help="Validate CWL document only."
+        "--validate",
+        action="store_true",
+        help="Validate CWL document only. Given a directory or several .cwl "
+        "files, validate all of them and print one JSON result per document; "
+        "with --parallel this uses a pool of worker processes, and with "
+        "--load-cache documents unchanged since the last run are skipped.",
     )
     printgroup.add_argument(
         "--print-supported-versions",
@@ -373,6 +470,68 @@ def arg_parser() -> argparse.ArgumentParser:
         dest="doc_cache",
     )
 
+    parser.add_argument(
+        "--load-cache",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="Cache resolved, validated and updated CWL documents, and the "
+        "compiled CWL schemas, in DIR. Entries are reused as long as none of "
+        "the files they were loaded from have changed.",
+    )
+
+    parser.add_argument(
+        "--parallel-fetch",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Before resolving the workflow, discover the documents it "
+        "references through 'run' and '$import' and fetch up to N of them "
+        "at a time.",
+    )
+
+    parser.add_argument(
+        "--serve",
+        nargs="?",
+        const="127.0.0.1:8585",
+        default=None,
+        metavar="ADDRESS",
+        help="Run as a long-lived server accepting run submissions over HTTP "
+        "on HOST:PORT or on a Unix socket given as unix:PATH "
+        "(default 127.0.0.1:8585). Clients must send the token given in "
+        "CWLTOOL_SERVE_TOKEN, or else logged when the server starts.",
+    )
+    parser.add_argument(
+        "--serve-root",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="Directory the base and output directories of runs submitted to "
+        "--serve must be in (default: the current directory).",
+    )
+    parser.add_argument(
+        "--serve-workers",
+        type=int,
+        default=4,
+        metavar="N",
+        help="Number of runs executed concurrently by --serve (default 4).",
+    )
+    parser.add_argument(
+        "--serve-run-ttl",
+        type=float,
+        default=3600.0,
+        metavar="SECONDS",
+        help="How long --serve keeps the state of finished runs (default 3600).",
+    )
+    parser.add_argument(
+        "--serve-max-runs",
+        type=int,
+        default=1000,
+        metavar="N",
+        help="Forget the oldest finished runs once --serve has more than N "
+        "(default 1000).",
+    )
+
     volumegroup = parser.add_mutually_exclusive_group()
     volumegroup.add_argument("--verbose", action="store_true", help="Default logging")
     volumegroup.add_argument(
@@ -450,7 +609,7 @@ def arg_parser() -> argparse.ArgumentParser:
     use_biocontainers_help = argparse.SUPPRESS
     conda_dependencies = argparse.SUPPRESS
 
-    if SOFTWARE_REQUIREMENTS_ENABLED:
+    if _software_requirements_enabled():
         dependency_resolvers_configuration_help = "Dependency resolver "
         "configuration file describing how to adapt 'SoftwareRequirement' "
         "packages to current system."
@@ -1,6 +1,7 @@
 import copy
 import logging
 import math
+import weakref
 from typing import (
     IO,
     Any,
@@ -18,10 +19,8 @@ from typing import (
 
 from rdflib import Graph, URIRef
 from rdflib.namespace import OWL, RDFS
-from ruamel.yaml.comments import CommentedMap
 from schema_salad.avro.schema import Names, Schema, make_avsc_object
 from schema_salad.exceptions import ValidationException
-from schema_salad.sourceline import SourceLine
 from schema_salad.utils import convert_to_dict, json_dumps
 from schema_salad.validate import validate
 from typing_extensions import TYPE_CHECKING, Type  # pylint: disable=unused-import
@@ -30,8 +29,8 @@ from . import expression
 from .errors import WorkflowException
 from .loghandler import _logger
 from .mutation import MutationManager
-from .software_requirements import DependenciesConfiguration
-from .stdfsaccess import StdFsAccess
+from .sourceline import PlainMap, SourceLine, plain_shallow_copy
+from .stdfsaccess import DirectoryIndex, StdFsAccess
 from .utils import (
     CONTENT_LIMIT,
     CWLObjectType,
@@ -45,6 +44,7 @@ from .utils import (
 if TYPE_CHECKING:
     from .pathmapper import PathMapper
     from .provenance_profile import ProvenanceProfile  # pylint: disable=unused-import
+    from .software_requirements import DependenciesConfiguration
 
 
 def content_limit_respected_read_bytes(f):  # type: (IO[bytes]) -> bytes
@@ -105,6 +105,33 @@ def formatSubclassOf(
     return False
 
 
+# Answers of formatSubclassOf per ontology, with the number of triples in the
+# ontology when they were found.
+_format_subclasses = (
+    weakref.WeakKeyDictionary()
+)  # type: weakref.WeakKeyDictionary[Graph, Tuple[int, Dict[Tuple[str, str], bool]]]
+
+
+def format_is_subclass(fmt: str, cls: str, ontology: Optional[Graph]) -> bool:
+    """
+    Determine if `fmt` is a subclass of `cls`, remembering the answer.
+
+    Answers are kept until triples are added to the ontology, so checking
+    many Files of the same formats only walks it once.
+    """
+    if ontology is None:
+        return formatSubclassOf(fmt, cls, ontology, set())
+    size = len(ontology)
+    cached = _format_subclasses.get(ontology)
+    if cached is None or cached[0] != size:
+        cached = (size, {})
+        _format_subclasses[ontology] = cached
+    answer = cached[1].get((fmt, cls))
+    if answer is None:
+        answer = cached[1][(fmt, cls)] = formatSubclassOf(fmt, cls, ontology, set())
+    return answer
+
+
 def check_format(
     actual_file: Union[CWLObjectType, List[CWLObjectType]],
     input_formats: Union[List[str], str],
@@ -119,8 +146,8 @@ def check_format(
                 "File has no 'format' defined: {}".format(json_dumps(afile, indent=4))
             )
         for inpf in aslist(input_formats):
-            if afile["format"] == inpf or formatSubclassOf(
-                afile["format"], inpf, ontology, set()
+            if afile["format"] == inpf or format_is_subclass(
+                cast(str, afile["format"]), inpf, ontology
             ):
                 return
         raise ValidationException(
@@ -163,7 +190,7 @@ class Builder(HasReqsHints):
         formatgraph: Optional[Graph],
         make_fs_access: Type[StdFsAccess],
         fs_access: StdFsAccess,
-        job_script_provider: Optional[DependenciesConfiguration],
+        job_script_provider: Optional["DependenciesConfiguration"],
         timeout: float,
         debug: bool,
         js_console: bool,
@@ -209,6 +236,12 @@ class Builder(HasReqsHints):
         self.pathmapper = None  # type: Optional[PathMapper]
         self.prov_obj = None  # type: Optional[ProvenanceProfile]
         self.find_default_container = None  # type: Optional[Callable[[], str]]
+        self.directory_index = None  # type: Optional[DirectoryIndex]
+
+    def _exists(self, location: str) -> bool:
+        if self.directory_index is not None:
+            return self.directory_index.exists(self.fs_access, location)
+        return self.fs_access.exists(location)
 
     def build_job_script(self, commands: List[str]) -> Optional[str]:
         if self.job_script_provider is not None:
@@ -232,12 +265,14 @@ class Builder(HasReqsHints):
         bindings = []  # type: List[MutableMapping[str, Union[str, List[int]]]]
         binding = (
             {}
-        )  # type: Union[MutableMapping[str, Union[str, List[int]]], CommentedMap]
+        )  # type: Union[MutableMapping[str, Union[str, List[int]]], PlainMap]
         value_from_expression = False
         if "inputBinding" in schema and isinstance(
             schema["inputBinding"], MutableMapping
         ):
-            binding = CommentedMap(schema["inputBinding"].items())
+            # Only the top of the binding is modified, so its fields (and the
+            # datum of the bindings of array items) are shared.
+            binding = cast(PlainMap, plain_shallow_copy(schema["inputBinding"]))
 
             bp = list(aslist(lead_pos))
             if "position" in binding:
@@ -273,7 +308,7 @@ class Builder(HasReqsHints):
                 if not avsc:
                     avsc = make_avsc_object(convert_to_dict(t), self.names)
                 if validate(avsc, datum):
-                    schema = copy.deepcopy(schema)
+                    schema = plain_shallow_copy(schema)
                     schema["type"] = t
                     if not value_from_expression:
                         return self.bind_input(
@@ -297,7 +332,7 @@ class Builder(HasReqsHints):
                     "'{}' is not a valid union {}".format(datum, schema["type"])
                 )
         elif isinstance(schema["type"], MutableMapping):
-            st = copy.deepcopy(schema["type"])
+            st = plain_shallow_copy(schema["type"])
             if (
                 binding
                 and "inputBinding" not in st
@@ -352,7 +387,7 @@ class Builder(HasReqsHints):
                 for n, item in enumerate(cast(MutableSequence[CWLObjectType], datum)):
                     b2 = None
                     if binding:
-                        b2 = cast(CWLObjectType, copy.deepcopy(binding))
+                        b2 = cast(CWLObjectType, plain_shallow_copy(binding))
                         b2["datum"] = item
                     itemschema = {
                         "type": schema["items"],
@@ -473,7 +508,7 @@ class Builder(HasReqsHints):
                                         ),
                                         sfname,
                                     )
-                                elif discover_secondaryFiles and self.fs_access.exists(
+                                elif discover_secondaryFiles and self._exists(
                                     sf_location
                                 ):
                                     addsf(
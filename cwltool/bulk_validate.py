@@ -0,0 +1,240 @@
+"""Validate many CWL documents in one process."""
+
+import hashlib
+import json
+import os
+import tempfile
+from codecs import StreamWriter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Union, cast
+
+from schema_salad.fetcher import DefaultFetcher
+from schema_salad.ref_resolver import file_uri
+from schema_salad.utils import CacheType, json_dumps
+from typing_extensions import TYPE_CHECKING
+
+from .context import LoadingContext
+from .document_cache import DependencyType, dependencies, dependency_unchanged
+from .load_tool import (
+    default_loader,
+    fetch_document,
+    make_tool,
+    resolve_and_validate_document,
+    resolve_tool_uri,
+)
+from .loghandler import _logger
+
+if TYPE_CHECKING:
+    import requests  # pylint: disable=unused-import
+
+# Text of every document fetched by this process, so files $import-ed or
+# run by many documents are only read once.
+shared_texts = {}  # type: Dict[str, str]
+
+# The loading context the documents of this process are validated with.
+_loading_context = None  # type: Optional[LoadingContext]
+
+
+class SharedTextFetcher(DefaultFetcher):
+    """Fetcher that remembers the text of every document it fetches."""
+
+    def fetch_text(self, url: str, content_types: Optional[List[str]] = None) -> str:
+        """Fetch the text of a document, unless it was fetched before."""
+        text = shared_texts.get(url)
+        if text is None:
+            text = super().fetch_text(url, content_types)
+            shared_texts[url] = text
+        return text
+
+
+def _shared_fetcher(
+    cache: CacheType, session: Optional["requests.sessions.Session"]
+) -> DefaultFetcher:
+    return SharedTextFetcher(cache, session)
+
+
+def is_bulk_validation(paths: List[str]) -> bool:
+    """
+    Check whether --validate was given a set of documents.
+
+    That is a directory, or several paths which are all directories or
+    .cwl files (rather than a document and its input object).
+    """
+    paths = [p for p in paths if p]
+    if not paths or not all(os.path.isdir(p) or p.endswith(".cwl") for p in paths):
+        return False
+    return len(paths) > 1 or os.path.isdir(paths[0])
+
+
+def find_documents(paths: Iterable[str]) -> List[str]:
+    """List the .cwl files named by, or found under, the given paths."""
+    documents = []  # type: List[str]
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                documents.extend(
+                    os.path.join(root, f) for f in sorted(files) if f.endswith(".cwl")
+                )
+        else:
+            documents.append(path)
+    return [os.path.abspath(d) for d in documents]
+
+
+def _init_worker(loadingContext: LoadingContext) -> None:
+    global _loading_context  # pylint: disable=global-statement
+    _loading_context = loadingContext
+    shared_texts.clear()
+
+
+def validate_document(path: str) -> Dict[str, Any]:
+    """Load and validate one document, reporting the outcome."""
+    if _loading_context is None:
+        raise ValueError("validate_document called before _init_worker")
+    loadingContext = _loading_context.copy()
+    loadingContext.fetcher_constructor = _shared_fetcher
+    loadingContext.loader = default_loader(
+        _shared_fetcher,
+        enable_dev=loadingContext.enable_dev,
+        doc_cache=loadingContext.doc_cache,
+    )
+    loadingContext.overrides_list = []
+    loadingContext.metadata = {}
+    result = {"path": path, "valid": True, "error": None}  # type: Dict[str, Any]
+    try:
+        uri, _ = resolve_tool_uri(
+            path,
+            resolver=loadingContext.resolver,
+            fetcher_constructor=loadingContext.fetcher_constructor,
+        )
+        loadingContext, workflowobj, uri = fetch_document(uri, loadingContext)
+        loadingContext, uri = resolve_and_validate_document(
+            loadingContext, workflowobj, uri
+        )
+        make_tool(uri, loadingContext)
+    except Exception as err:  # pylint: disable=broad-except
+        result["valid"] = False
+        result["error"] = str(err)
+    deps = None  # type: Optional[List[DependencyType]]
+    if loadingContext.loader is not None:
+        deps = dependencies(
+            [file_uri(path)] + [k for k in loadingContext.loader.idx if "#" not in k]
+        )
+    result["dependencies"] = deps
+    return result
+
+
+class ValidationState:
+    """Results of an earlier bulk validation, keyed by document path."""
+
+    def __init__(self, path: Optional[str]) -> None:
+        """Read the state file, if any."""
+        self.path = path
+        self.results = {}  # type: Dict[str, Dict[str, Any]]
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path) as handle:
+                    self.results = json.load(handle)
+            except (OSError, ValueError):
+                _logger.warning("Ignoring unreadable validation state %s", path)
+
+    def unchanged(self, document: str) -> Optional[Dict[str, Any]]:
+        """Return the previous result for document if none of its files changed."""
+        result = self.results.get(document)
+        if result is None or result.get("dependencies") is None:
+            return None
+        dependencies = result["dependencies"]  # type: List[List[Any]]
+        if all(
+            dependency_unchanged(cast(DependencyType, tuple(d))) for d in dependencies
+        ):
+            return result
+        return None
+
+    def save(self) -> None:
+        """Replace the state file with the current results, if there is one."""
+        if self.path is None:
+            return
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        with os.fdopen(fd, "w") as handle:
+            json.dump(self.results, handle)
+        os.replace(tmp, self.path)
+
+
+def _state_file(loadingContext: LoadingContext) -> Optional[str]:
+    if not loadingContext.load_cache:
+        return None
+    os.makedirs(loadingContext.load_cache, exist_ok=True)
+    options = hashlib.sha256(
+        json_dumps(
+            {
+                "strict": loadingContext.strict,
+                "enable_dev": loadingContext.enable_dev,
+                "do_validate": loadingContext.do_validate,
+                "disable_js_validation": loadingContext.disable_js_validation,
+            },
+            sort_keys=True,
+        ).encode("utf-8")
+    ).hexdigest()[:16]
+    return os.path.join(loadingContext.load_cache, f"validate-{options}.json")
+
+
+def validate_documents(
+    paths: List[str],
+    loadingContext: LoadingContext,
+    stdout: Union[TextIO, StreamWriter],
+    workers: int = 1,
+) -> int:
+    """
+    Validate every CWL document named by, or found under, paths.
+
+    Prints one JSON object per document with its path, whether it is
+    valid, and the error if not. Documents are loaded in a pool of worker
+    processes when workers > 1. If loadingContext.load_cache is set,
+    documents none of whose files changed since the last run are not
+    validated again, and their previous result is reported with
+    ``"cached": true``.
+
+    Returns 0 if all documents are valid, 1 otherwise.
+    """
+    documents = find_documents(paths)
+    state = ValidationState(_state_file(loadingContext))
+    results = {}  # type: Dict[str, Dict[str, Any]]
+    pending = []  # type: List[str]
+    for document in documents:
+        previous = state.unchanged(document)
+        if previous is not None:
+            results[document] = dict(previous, cached=True)
+        else:
+            pending.append(document)
+
+    loadingContext = loadingContext.copy()
+    loadingContext.loader = None
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(loadingContext,)
+        ) as executor:
+            for result in executor.map(validate_document, pending):
+                results[result["path"]] = dict(result, cached=False)
+    else:
+        _init_worker(loadingContext)
+        for document in pending:
+            results[document] = dict(validate_document(document), cached=False)
+
+    all_valid = True
+    for document in documents:
+        result = results[document]
+        state.results[document] = {k: v for k, v in result.items() if k != "cached"}
+        all_valid = all_valid and bool(result["valid"])
+        stdout.write(
+            json_dumps(
+                {
+                    "path": document,
+                    "valid": result["valid"],
+                    "error": result["error"],
+                    "cached": result["cached"],
+                }
+            )
+            + "\n"
+        )
+    state.save()
+    return 0 if all_valid else 1
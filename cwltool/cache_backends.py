@@ -0,0 +1,365 @@
+"""
+Shared stores of job cache entries, for --remote-cache.
+
+A --cachedir is only seen by the machines that mount it.  A backend holds
+the manifests of job outputs, by job key, and the files they list, by
+SHA-1, somewhere every machine can reach: a shared directory, or an HTTP
+server such as the one in this module or an object store behind one.
+
+Each machine keeps its --cachedir, which the jobs run in.  Entries missing
+from it are fetched from the backend, and new entries are published to
+it, files first, so that a manifest never refers to files the backend
+does not have yet.
+
+Over HTTP, manifests are at <url>/manifests/<key> and files at
+<url>/blobs/<sha1>, and are read with GET and HEAD and written with PUT.
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import urllib.parse
+from abc import ABCMeta, abstractmethod
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import IO, Any, List, Optional, Tuple, cast
+
+import requests
+
+from .job_cache import CACHE_FORMAT, ManifestType, check_manifest
+from .loghandler import _logger
+
+CHUNK_SIZE = 1024 * 1024
+
+_KEY = re.compile(r"^[0-9A-Za-z_.-]+$")
+_DIGEST = re.compile(r"^[0-9a-f]{40}$")
+
+
+def _digest(checksum: str) -> str:
+    method, _, digest = checksum.partition("$")
+    if method != "sha1" or not _DIGEST.match(digest):
+        raise ValueError("Not a SHA-1 checksum: %r" % checksum)
+    return digest
+
+
+def _check_key(key: str) -> str:
+    if not _KEY.match(key):
+        raise ValueError("Invalid job key %r" % key)
+    return key
+
+
+def dump_manifest(manifest: ManifestType) -> bytes:
+    """Serialize a manifest, with the cache format it was made for."""
+    return json.dumps({"format": CACHE_FORMAT, "manifest": manifest}).encode("utf-8")
+
+
+def load_manifest(data: bytes) -> Optional[ManifestType]:
+    """
+    Read a manifest, or give None if it was made for another cache format.
+
+    Anyone who can write to the backend can write manifests, so those that
+    would put files outside of the output directory they are restored to,
+    or that list files by invalid checksums, are rejected with a
+    ValueError.
+    """
+    document = json.loads(data.decode("utf-8"))
+    if not isinstance(document, dict) or document.get("format") != CACHE_FORMAT:
+        return None
+    return check_manifest(document.get("manifest"))
+
+
+class CacheBackend(metaclass=ABCMeta):
+    """Where job manifests and the files they list are shared."""
+
+    @abstractmethod
+    def get_manifest(self, key: str) -> Optional[ManifestType]:
+        """Give the manifest stored for a job key, if there is one."""
+
+    @abstractmethod
+    def put_manifest(self, key: str, manifest: ManifestType) -> None:
+        """Store the manifest of a job, replacing any other."""
+
+    @abstractmethod
+    def has_blob(self, checksum: str) -> bool:
+        """Tell whether the file with the given checksum is stored."""
+
+    @abstractmethod
+    def get_blob(self, checksum: str, dst: IO[bytes]) -> bool:
+        """Write a stored file to dst, or give False if it is not stored."""
+
+    @abstractmethod
+    def put_blob(self, checksum: str, src: IO[bytes]) -> None:
+        """Store the file read from src, which must have the given checksum."""
+
+
+class DirectoryBackend(CacheBackend):
+    """
+    Entries kept as plain files in a directory, which may be shared.
+
+    Files are written under a temporary name and renamed into place, so
+    readers never see them half-written, and no locks are needed.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Use (and create if needed) the given directory."""
+        self.directory = directory
+        self.manifests = os.path.join(directory, "manifests")
+        self.blobs = os.path.join(directory, "blobs")
+        for subdir in (self.manifests, self.blobs):
+            os.makedirs(subdir, exist_ok=True)
+
+    def _blob(self, checksum: str) -> str:
+        digest = _digest(checksum)
+        return os.path.join(self.blobs, digest[:2], digest)
+
+    def _replace(self, src: IO[bytes], path: str, digest: Optional[str]) -> None:
+        """Copy src to path, checking its SHA-1 if a digest is given."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        checksum = hashlib.sha1()  # nosec
+        handle, tmp = tempfile.mkstemp(prefix="tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(handle, "wb") as dst:
+                contents = src.read(CHUNK_SIZE)
+                while contents:
+                    checksum.update(contents)
+                    dst.write(contents)
+                    contents = src.read(CHUNK_SIZE)
+            if digest is not None and checksum.hexdigest() != digest:
+                raise ValueError("Contents do not match checksum sha1$%s" % digest)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def get_manifest(self, key: str) -> Optional[ManifestType]:
+        try:
+            with open(os.path.join(self.manifests, _check_key(key)), "rb") as f:
+                return load_manifest(f.read())
+        except FileNotFoundError:
+            return None
+
+    def put_manifest(self, key: str, manifest: ManifestType) -> None:
+        path = os.path.join(self.manifests, _check_key(key))
+        with tempfile.TemporaryFile() as src:
+            src.write(dump_manifest(manifest))
+            src.seek(0)
+            self._replace(src, path, None)
+
+    def has_blob(self, checksum: str) -> bool:
+        return os.path.isfile(self._blob(checksum))
+
+    def get_blob(self, checksum: str, dst: IO[bytes]) -> bool:
+        try:
+            with open(self._blob(checksum), "rb") as src:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put_blob(self, checksum: str, src: IO[bytes]) -> None:
+        self._replace(src, self._blob(checksum), _digest(checksum))
+
+
+class HttpBackend(CacheBackend):
+    """Entries kept by an HTTP server, streamed in and out."""
+
+    def __init__(self, url: str) -> None:
+        """Use the server at the given base URL."""
+        self.url = url.rstrip("/")
+        self.local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """Give the connection pool of the current thread."""
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return cast(requests.Session, session)
+
+    def _manifest_url(self, key: str) -> str:
+        return "{}/manifests/{}".format(self.url, _check_key(key))
+
+    def _blob_url(self, checksum: str) -> str:
+        return "{}/blobs/{}".format(self.url, _digest(checksum))
+
+    def get_manifest(self, key: str) -> Optional[ManifestType]:
+        response = self.session.get(self._manifest_url(key))
+        if response.status_code == HTTPStatus.NOT_FOUND:
+            return None
+        response.raise_for_status()
+        return load_manifest(response.content)
+
+    def put_manifest(self, key: str, manifest: ManifestType) -> None:
+        self.session.put(
+            self._manifest_url(key), data=dump_manifest(manifest)
+        ).raise_for_status()
+
+    def has_blob(self, checksum: str) -> bool:
+        response = self.session.head(self._blob_url(checksum))
+        if response.status_code == HTTPStatus.NOT_FOUND:
+            return False
+        response.raise_for_status()
+        return True
+
+    def get_blob(self, checksum: str, dst: IO[bytes]) -> bool:
+        response = self.session.get(self._blob_url(checksum), stream=True)
+        try:
+            if response.status_code == HTTPStatus.NOT_FOUND:
+                return False
+            response.raise_for_status()
+            for contents in response.iter_content(CHUNK_SIZE):
+                dst.write(contents)
+        finally:
+            response.close()
+        return True
+
+    def put_blob(self, checksum: str, src: IO[bytes]) -> None:
+        self.session.put(self._blob_url(checksum), data=src).raise_for_status()
+
+
+@functools.lru_cache(maxsize=None)
+def cache_backend(url: str) -> CacheBackend:
+    """Open the backend at a URL (or path) once per process."""
+    scheme = urllib.parse.urlparse(url).scheme
+    if scheme in ("http", "https"):
+        return HttpBackend(url)
+    if scheme == "file":
+        return DirectoryBackend(urllib.parse.unquote(urllib.parse.urlparse(url).path))
+    return DirectoryBackend(os.path.abspath(url))
+
+
+class _Body:
+    """The body of a request, read up to its Content-Length."""
+
+    def __init__(self, rfile: IO[bytes], length: int) -> None:
+        self.rfile = rfile
+        self.remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        contents = self.rfile.read(size) if size else b""
+        self.remaining -= len(contents)
+        return contents
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    """Serve a DirectoryBackend over HTTP."""
+
+    @property
+    def backend(self) -> DirectoryBackend:
+        """Give the backend of the server handling the request."""
+        return cast(CacheServer, self.server).backend
+
+    def _route(self) -> Optional[Tuple[str, str]]:
+        parts = urllib.parse.urlparse(self.path).path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "manifests" and _KEY.match(parts[1]):
+            return parts[0], parts[1]
+        if len(parts) == 2 and parts[0] == "blobs" and _DIGEST.match(parts[1]):
+            return parts[0], "sha1$" + parts[1]
+        self.send_error(HTTPStatus.NOT_FOUND)
+        return None
+
+    def _send(self, path: str, body: bool) -> None:
+        try:
+            src = open(path, "rb")
+        except FileNotFoundError:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        with src:
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(os.fstat(src.fileno()).st_size))
+            self.end_headers()
+            if body:
+                shutil.copyfileobj(src, self.wfile, CHUNK_SIZE)
+
+    def _get(self, body: bool) -> None:
+        route = self._route()
+        if route is None:
+            return
+        kind, name = route
+        if kind == "manifests":
+            self._send(os.path.join(self.backend.manifests, name), body)
+        else:
+            self._send(self.backend._blob(name), body)
+
+    def do_GET(self) -> None:
+        self._get(True)
+
+    def do_HEAD(self) -> None:
+        self._get(False)
+
+    def do_PUT(self) -> None:
+        route = self._route()
+        if route is None:
+            return
+        if "Content-Length" not in self.headers:
+            self.send_error(HTTPStatus.LENGTH_REQUIRED)
+            return
+        kind, name = route
+        body = cast(IO[bytes], _Body(self.rfile, int(self.headers["Content-Length"])))
+        try:
+            if kind == "manifests":
+                path = os.path.join(self.backend.manifests, name)
+                self.backend._replace(body, path, None)
+            else:
+                self.backend.put_blob(name, body)
+        except ValueError as err:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(err))
+            return
+        self.send_response(HTTPStatus.CREATED)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        _logger.debug("Cache server: " + format, *args)
+
+
+class CacheServer(socketserver.ThreadingMixIn, HTTPServer):
+    """A minimal HTTP cache server, keeping entries in a directory."""
+
+    daemon_threads = True
+
+    def __init__(self, directory: str, host: str = "127.0.0.1", port: int = 0):
+        """Listen on host and port; port 0 picks a free one."""
+        self.backend = DirectoryBackend(directory)
+        super().__init__((host, port), CacheRequestHandler)
+
+    @property
+    def url(self) -> str:
+        """Give the base URL to pass to --remote-cache."""
+        host, port = self.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run a cache server until interrupted."""
+    parser = argparse.ArgumentParser(
+        description="Share job cache entries between cwltool runs over HTTP."
+    )
+    parser.add_argument("directory", help="Directory to keep entries in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+    server = CacheServer(args.directory, args.host, args.port)
+    print("Serving {} at {}".format(args.directory, server.url), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+The parts of a tool's command line that are the same for every job.
+
+Each job's command line bindings are its input bindings, plus bindings for
+the tool's baseCommand and arguments, sorted by position.  Only the
+arguments with an expression for a position change between jobs, so the
+others are made, and sorted, once per tool, and shared by all its jobs.
+"""
+
+import functools
+import heapq
+from operator import itemgetter
+from typing import Any, List, MutableMapping, Optional, Tuple, cast
+
+from ruamel.yaml.comments import CommentedSeq
+from typing_extensions import TYPE_CHECKING
+
+from .sourceline import plain_copy, plain_map
+from .utils import CWLObjectType, PositionKey, aslist, cmp_like_py2, position_key
+
+if TYPE_CHECKING:
+    from .builder import Builder
+
+_first = itemgetter(0)
+
+
+class CommandLineTemplate:
+    """The baseCommand and arguments of a tool, as command line bindings."""
+
+    def __init__(self, tool: MutableMapping[str, Any]) -> None:
+        """Make the bindings that don't depend on the job."""
+        self.tool = tool
+        # All the bindings, in the order they are added to a job's.  None
+        # stands for an argument whose position is an expression, and
+        # dynamic holds the indexes of those arguments.
+        self.bindings = []  # type: List[Optional[CWLObjectType]]
+        self.dynamic = []  # type: List[int]
+        for index, command in enumerate(aslist(tool.get("baseCommand"))):
+            self.bindings.append({"position": [-1000000, index], "datum": command})
+
+        arguments = tool.get("arguments") or CommentedSeq()  # type: CommentedSeq
+        for i, arg in enumerate(arguments):
+            if isinstance(arg, MutableMapping):
+                if arg.get("position") and isinstance(arg["position"], str):
+                    self.bindings.append(None)
+                    self.dynamic.append(i)
+                    continue
+                binding = plain_copy(arg)
+                binding["position"] = [arg.get("position") or 0, i]
+            else:
+                lc = arguments.lc.data[i]
+                filename = arguments.lc.filename
+                if ("$(" in arg) or ("${" in arg):
+                    binding = plain_map(filename, lc, position=[0, i], valueFrom=arg)
+                else:
+                    binding = plain_map(filename, lc, position=[0, i], datum=arg)
+            self.bindings.append(binding)
+
+        # The bindings made here, sorted, unless some position needs
+        # cmp_like_py2.
+        self.static = None  # type: Optional[List[Tuple[PositionKey, CWLObjectType]]]
+        static = []  # type: List[Tuple[PositionKey, CWLObjectType]]
+        for binding in self.bindings:
+            if binding is not None:
+                key = position_key(cast(List[Any], binding["position"]))
+                if key is None:
+                    break
+                static.append((key, binding))
+        else:
+            self.static = sorted(static, key=_first)
+
+    def _argument(self, builder: "Builder", i: int) -> CWLObjectType:
+        """Bind an argument whose position is an expression."""
+        arg = plain_copy(self.tool["arguments"][i])  # type: CWLObjectType
+        position = builder.do_eval(arg["position"])
+        if position is None:
+            position = 0
+        arg["position"] = [position, i]
+        return arg
+
+    def add_bindings(self, builder: "Builder", bindings: List[CWLObjectType]) -> None:
+        """
+        Add the tool's command line bindings to the job's input bindings.
+
+        Sorts them all by position, in place.
+        """
+        dynamic = [self._argument(builder, i) for i in self.dynamic]
+        if self.static is not None:
+            keyed = []  # type: List[Tuple[PositionKey, CWLObjectType]]
+            for binding in bindings + dynamic:
+                key = position_key(cast(List[Any], binding["position"]))
+                if key is None:
+                    break
+                keyed.append((key, binding))
+            else:
+                keyed.sort(key=_first)
+                bindings[:] = [
+                    binding
+                    for _, binding in heapq.merge(keyed, self.static, key=_first)
+                ]
+                return
+
+        dynamic.reverse()
+        for static_binding in self.bindings:
+            if static_binding is None:
+                bindings.append(dynamic.pop())
+            else:
+                bindings.append(static_binding)
+        # use python2 like sorting of heterogeneous lists
+        # (containing str and int types),
+        bindings.sort(key=functools.cmp_to_key(cmp_like_py2))
@@ -8,6 +8,7 @@ import logging
 import os
 import re
 import shutil
+import sqlite3
 import threading
 import urllib
 import urllib.parse
@@ -26,6 +27,7 @@ from typing import (
     Pattern,
     Set,
     TextIO,
+    Tuple,
     Union,
     cast,
 )
@@ -35,20 +37,23 @@ from ruamel.yaml.comments import CommentedMap, CommentedSeq
 from schema_salad.avro.schema import Schema
 from schema_salad.exceptions import ValidationException
 from schema_salad.ref_resolver import file_uri, uri_file_path
-from schema_salad.sourceline import SourceLine
 from schema_salad.utils import json_dumps
 from schema_salad.validate import validate_ex
 from typing_extensions import TYPE_CHECKING, Type
 
 from .builder import Builder, content_limit_respected_read_bytes, substitute
+from .cache_backends import cache_backend
 from .context import LoadingContext, RuntimeContext, getdefault
 from .docker import DockerCommandLineJob
+from .dry_run import PlannedJob, manifest_size, predict
 from .errors import UnsupportedRequirement, WorkflowException
+from .fingerprints import file_checksum, local_path
 from .flatten import flatten
 from .job import CommandLineJob, JobBase
+from .job_cache import job_cache
 from .loghandler import _logger
 from .mpi import MPIRequirementName
-from .mutation import MutationManager
+from .mutation import MutationManager, reader_state
 from .pathmapper import PathMapper
 from .process import (
     Process,
@@ -58,8 +63,8 @@ from .process import (
     uniquename,
 )
 from .singularity import SingularityCommandLineJob
-from .stdfsaccess import StdFsAccess
-from .udocker import UDockerCommandLineJob
+from .sourceline import SourceLine
+from .stdfsaccess import DirectoryIndex, StdFsAccess
 from .update import ORDERED_VERSIONS
 from .utils import (
     CWLObjectType,
@@ -73,7 +78,6 @@ from .utils import (
     get_listing,
     normalizeFilesDirs,
     random_outdir,
-    shared_file_lock,
     trim_listing,
     upgrade_lock,
     visit_class,
@@ -390,6 +394,8 @@ class CommandLineTool(Process):
             if runtimeContext.singularity:
                 return SingularityCommandLineJob
             elif runtimeContext.user_space_docker_cmd:
+                from .udocker import UDockerCommandLineJob
+
                 return UDockerCommandLineJob
             if mpiReq is not None:
                 if mpiRequired:
@@ -673,128 +679,187 @@ class CommandLineTool(Process):
                 partial(check_adjust, self.path_check_mode.value, builder),
             )
 
+    def cache_key(
+        self, job_order: CWLObjectType, runtimeContext: RuntimeContext, jobname: str
+    ) -> Tuple[str, Builder]:
+        """
+        Give the key of the outputs of a job in the job cache.
+
+        Also gives the builder of the job as it is run for the cache, with
+        its outputs in /out.
+        """
+        cachecontext = runtimeContext.copy()
+        cachecontext.outdir = "/out"
+        cachecontext.tmpdir = "/tmp"  # nosec
+        cachecontext.stagedir = "/stage"
+        cachebuilder = self._init_job(job_order, cachecontext)
+        cachebuilder.pathmapper = PathMapper(
+            cachebuilder.files,
+            runtimeContext.basedir,
+            cachebuilder.stagedir,
+            separateDirs=False,
+        )
+        _check_adjust = partial(check_adjust, self.path_check_mode.value, cachebuilder)
+        visit_class(
+            [cachebuilder.files, cachebuilder.bindings],
+            ("File", "Directory"),
+            _check_adjust,
+        )
+
+        cmdline = flatten(list(map(cachebuilder.generate_arg, cachebuilder.bindings)))
+        docker_req, _ = self.get_requirement("DockerRequirement")
+        if docker_req is not None and runtimeContext.use_container:
+            dockerimg = docker_req.get("dockerImageId") or docker_req.get("dockerPull")
+        elif (
+            runtimeContext.default_container is not None
+            and runtimeContext.use_container
+        ):
+            dockerimg = runtimeContext.default_container
+        else:
+            dockerimg = None
+
+        if dockerimg is not None:
+            cmdline = ["docker", "run", dockerimg] + cmdline
+            # not really run using docker, just for hashing purposes
+
+        keydict = {
+            "cmdline": cmdline
+        }  # type: Dict[str, Union[MutableSequence[Union[str, int]], CWLObjectType]]
+
+        for shortcut in ["stdin", "stdout", "stderr"]:
+            if shortcut in self.tool:
+                keydict[shortcut] = self.tool[shortcut]
+
+        checksums = {}  # type: Dict[str, str]
+        for e in cachebuilder.files:
+            if "location" in e and "checksum" in e and e["checksum"] != "sha1$hash":
+                checksums.setdefault(cast(str, e["location"]), cast(str, e["checksum"]))
+
+        for location, fobj in cachebuilder.pathmapper.items():
+            if fobj.type == "File":
+                checksum = checksums.get(location)
+                fobj_stat = os.stat(fobj.resolved)
+                if checksum is not None:
+                    # Outputs of cached jobs are in a new directory each time,
+                    # so files whose contents are known go by where they are
+                    # staged.
+                    name = fobj.target if fobj.target not in keydict else fobj.resolved
+                    keydict[name] = [fobj_stat.st_size, checksum]
+                else:
+                    keydict[fobj.resolved] = [
+                        fobj_stat.st_size,
+                        int(fobj_stat.st_mtime * 1000),
+                    ]
+
+        interesting = {
+            "DockerRequirement",
+            "EnvVarRequirement",
+            "InitialWorkDirRequirement",
+            "ShellCommandRequirement",
+            "NetworkAccess",
+        }
+        for rh in (self.original_requirements, self.original_hints):
+            for r in reversed(rh):
+                cls = cast(str, r["class"])
+                if cls in interesting and cls not in keydict:
+                    keydict[cls] = r
+
+        keydictstr = json_dumps(keydict, separators=(",", ":"), sort_keys=True)
+        cachekey = hashlib.md5(keydictstr.encode("utf-8")).hexdigest()  # nosec
+
+        _logger.debug("[job %s] keydictstr is %s -> %s", jobname, keydictstr, cachekey)
+        return cachekey, cachebuilder
+
+    def _outdir_request(self, builder: Builder) -> Optional[int]:
+        """Give the bytes the tool asks for its output directory, if it does."""
+        resourceReq, _ = self.get_requirement("ResourceRequirement")
+        if resourceReq is None or not {"outdirMin", "outdirMax"} & set(resourceReq):
+            return None
+        return int(cast(int, builder.resources["outdirSize"]) * 1024 * 1024)
+
+    def _plan(
+        self,
+        job_order: CWLObjectType,
+        runtimeContext: RuntimeContext,
+        jobname: str,
+        enableReuse: bool,
+    ) -> PlannedJob:
+        """Tell whether the job would be run, for --dry-run."""
+        if not runtimeContext.cachedir or not enableReuse:
+            builder = self._init_job(job_order, runtimeContext)
+            return PlannedJob(jobname, "miss", None, self._outdir_request(builder))
+        cachekey, cachebuilder = self.cache_key(job_order, runtimeContext, jobname)
+        status, manifest = predict(cachekey, runtimeContext)
+        if manifest is not None:
+            return PlannedJob(jobname, status, cachekey, manifest_size(manifest))
+        return PlannedJob(jobname, "miss", cachekey, self._outdir_request(cachebuilder))
+
     def job(
         self,
         job_order: CWLObjectType,
         output_callbacks: Optional[OutputCallbackType],
         runtimeContext: RuntimeContext,
-    ) -> Generator[Union[JobBase, CallbackJob], None, None]:
+    ) -> Generator[Union[JobBase, CallbackJob, PlannedJob], None, None]:
 
         workReuse, _ = self.get_requirement("WorkReuse")
-        enableReuse = workReuse.get("enableReuse", True) if workReuse else True
+        enableReuse = bool(workReuse.get("enableReuse", True)) if workReuse else True
 
         jobname = uniquename(
             runtimeContext.name or shortname(self.tool.get("id", "job"))
         )
+        if runtimeContext.dry_run:
+            yield self._plan(job_order, runtimeContext, jobname, enableReuse)
+            return
         if runtimeContext.cachedir and enableReuse:
-            cachecontext = runtimeContext.copy()
-            cachecontext.outdir = "/out"
-            cachecontext.tmpdir = "/tmp"  # nosec
-            cachecontext.stagedir = "/stage"
-            cachebuilder = self._init_job(job_order, cachecontext)
-            cachebuilder.pathmapper = PathMapper(
-                cachebuilder.files,
-                runtimeContext.basedir,
-                cachebuilder.stagedir,
-                separateDirs=False,
-            )
-            _check_adjust = partial(
-                check_adjust, self.path_check_mode.value, cachebuilder
-            )
-            visit_class(
-                [cachebuilder.files, cachebuilder.bindings],
-                ("File", "Directory"),
-                _check_adjust,
-            )
-
-            cmdline = flatten(
-                list(map(cachebuilder.generate_arg, cachebuilder.bindings))
-            )
+            cachekey, cachebuilder = self.cache_key(job_order, runtimeContext, jobname)
             docker_req, _ = self.get_requirement("DockerRequirement")
-            if docker_req is not None and runtimeContext.use_container:
-                dockerimg = docker_req.get("dockerImageId") or docker_req.get(
-                    "dockerPull"
-                )
-            elif (
-                runtimeContext.default_container is not None
-                and runtimeContext.use_container
-            ):
-                dockerimg = runtimeContext.default_container
-            else:
-                dockerimg = None
-
-            if dockerimg is not None:
-                cmdline = ["docker", "run", dockerimg] + cmdline
-                # not really run using docker, just for hashing purposes
-
-            keydict = {
-                "cmdline": cmdline
-            }  # type: Dict[str, Union[MutableSequence[Union[str, int]], CWLObjectType]]
-
-            for shortcut in ["stdin", "stdout", "stderr"]:
-                if shortcut in self.tool:
-                    keydict[shortcut] = self.tool[shortcut]
-
-            def calc_checksum(location: str) -> Optional[str]:
-                for e in cachebuilder.files:
-                    if (
-                        "location" in e
-                        and e["location"] == location
-                        and "checksum" in e
-                        and e["checksum"] != "sha1$hash"
-                    ):
-                        return cast(Optional[str], e["checksum"])
-                return None
-
-            for location, fobj in cachebuilder.pathmapper.items():
-                if fobj.type == "File":
-                    checksum = calc_checksum(location)
-                    fobj_stat = os.stat(fobj.resolved)
-                    if checksum is not None:
-                        keydict[fobj.resolved] = [fobj_stat.st_size, checksum]
-                    else:
-                        keydict[fobj.resolved] = [
-                            fobj_stat.st_size,
-                            int(fobj_stat.st_mtime * 1000),
-                        ]
-
-            interesting = {
-                "DockerRequirement",
-                "EnvVarRequirement",
-                "InitialWorkDirRequirement",
-                "ShellCommandRequirement",
-                "NetworkAccess",
-            }
-            for rh in (self.original_requirements, self.original_hints):
-                for r in reversed(rh):
-                    cls = cast(str, r["class"])
-                    if cls in interesting and cls not in keydict:
-                        keydict[cls] = r
-
-            keydictstr = json_dumps(keydict, separators=(",", ":"), sort_keys=True)
-            cachekey = hashlib.md5(keydictstr.encode("utf-8")).hexdigest()  # nosec
-
-            _logger.debug(
-                "[job %s] keydictstr is %s -> %s", jobname, keydictstr, cachekey
-            )
 
-            jobcache = os.path.join(runtimeContext.cachedir, cachekey)
+            cache = job_cache(runtimeContext.cachedir)
+            remote = None
+            if runtimeContext.remote_cache:
+                remote = cache_backend(runtimeContext.remote_cache)
 
-            # Create a lockfile to manage cache status.
-            jobcachepending = f"{jobcache}.status"
-            jobcachelock = None
-            jobstatus = None
-
-            # Opens the file for read/write, or creates an empty file.
-            jobcachelock = open(jobcachepending, "a+")
+            # Another process running the same job holds an exclusive lock
+            # until it has stored the outputs.
+            jobcachelock = cache.lock(cachekey)
+            manifest = cache.lookup(cachekey)
+            if manifest is None:
+                # turn shared lock into an exclusive lock since we'll
+                # be running the job
+                upgrade_lock(jobcachelock)
+                manifest = cache.lookup(cachekey)
+                if manifest is None and remote is not None:
+                    try:
+                        manifest = cache.fetch(cachekey, remote)
+                    except (OSError, ValueError, sqlite3.Error) as err:
+                        _logger.warning(
+                            "[job %s] Could not fetch output from the remote "
+                            "cache: %s",
+                            jobname,
+                            err,
+                        )
+                    if manifest is not None:
+                        _logger.info(
+                            "[job %s] Fetched output from the remote cache", jobname
+                        )
 
-            # get the shared lock to ensure no other process is trying
-            # to write to this cache
-            shared_file_lock(jobcachelock)
-            jobcachelock.seek(0)
-            jobstatus = jobcachelock.read()
+            jobcache = cache.mkdtemp(cachekey)
+            if manifest is not None:
+                try:
+                    cache.materialize(manifest, jobcache)
+                except OSError as err:
+                    _logger.warning(
+                        "[job %s] Cached output is incomplete, rerunning: %s",
+                        jobname,
+                        err,
+                    )
+                    upgrade_lock(jobcachelock)
+                    cache.remove(cachekey)
+                    shutil.rmtree(jobcache, True)
+                    os.makedirs(jobcache)
+                    manifest = None
 
-            if os.path.isdir(jobcache) and jobstatus == "success":
+            if manifest is not None:
                 if docker_req and runtimeContext.use_container:
                     cachebuilder.outdir = (
                         runtimeContext.docker_outdir or random_outdir()
@@ -803,21 +868,15 @@ class CommandLineTool(Process):
                     cachebuilder.outdir = jobcache
 
                 _logger.info("[job %s] Using cached output in %s", jobname, jobcache)
-                yield CallbackJob(self, output_callbacks, cachebuilder, jobcache)
                 # we're done with the cache so release lock
                 jobcachelock.close()
+                yield CallbackJob(self, output_callbacks, cachebuilder, jobcache)
                 return
             else:
                 _logger.info(
                     "[job %s] Output of job will be cached in %s", jobname, jobcache
                 )
 
-                # turn shared lock into an exclusive lock since we'll
-                # be writing the cache directory
-                upgrade_lock(jobcachelock)
-
-                shutil.rmtree(jobcache, True)
-                os.makedirs(jobcache)
                 runtimeContext = runtimeContext.copy()
                 runtimeContext.outdir = jobcache
 
@@ -827,11 +886,28 @@ class CommandLineTool(Process):
                     outputs: Optional[CWLObjectType],
                     processStatus: str,
                 ) -> None:
-                    # save status to the lockfile then release the lock
-                    jobcachelock.seek(0)
-                    jobcachelock.truncate()
-                    jobcachelock.write(processStatus)
-                    jobcachelock.close()
+                    # store the outputs then release the lock
+                    try:
+                        if processStatus == "success":
+                            stored = cache.store(cachekey, jobcache)
+                            if remote is not None:
+                                cache.publish(cachekey, stored, remote)
+                            # This job's own entry is still locked, so is kept.
+                            if (
+                                runtimeContext.cache_max_size is not None
+                                or runtimeContext.cache_max_age is not None
+                            ):
+                                cache.evict(
+                                    runtimeContext.cache_max_size,
+                                    runtimeContext.cache_max_age,
+                                    runtimeContext.cache_eviction,
+                                )
+                    except (OSError, ValueError, sqlite3.Error) as err:
+                        _logger.warning(
+                            "[job %s] Could not cache output: %s", jobname, err
+                        )
+                    finally:
+                        jobcachelock.close()
                     output_callbacks(outputs, processStatus)
 
                 output_callbacks = partial(
@@ -840,7 +916,8 @@ class CommandLineTool(Process):
 
         builder = self._init_job(job_order, runtimeContext)
 
-        reffiles = copy.deepcopy(builder.files)
+        # The path mapper only reads the Files, so they are shared.
+        reffiles = list(builder.files)
 
         j = self.make_job_runner(runtimeContext)(
             builder,
@@ -938,6 +1015,7 @@ class CommandLineTool(Process):
         inplaceUpdateReq, _ = self.get_requirement("InplaceUpdateRequirement")
         if inplaceUpdateReq is not None:
             j.inplace_update = cast(bool, inplaceUpdateReq["inplaceUpdate"])
+        j.writable_staging = runtimeContext.writable_staging
         normalizeFilesDirs(j.generatefiles)
 
         readers = {}  # type: Dict[str, CWLObjectType]
@@ -954,7 +1032,7 @@ class CommandLineTool(Process):
                 mm = cast(MutationManager, builder.mutation_manager)
                 if cast(str, f["location"]) not in muts:
                     mm.register_reader(j.name, f)
-                    readers[cast(str, f["location"])] = copy.deepcopy(f)
+                    readers[cast(str, f["location"])] = reader_state(f)
 
             for li in j.generatefiles["listing"]:
                 if li.get("writable") and j.inplace_update:
@@ -1222,15 +1300,19 @@ class CommandLineTool(Process):
                                     f
                                 ).decode("utf-8")
                         if compute_checksum:
-                            with fs_access.open(
-                                cast(str, rfile["location"]), "rb"
-                            ) as f:
-                                checksum = hashlib.sha1()  # nosec
-                                contents = f.read(1024 * 1024)
-                                while contents != b"":
-                                    checksum.update(contents)
+                            path = local_path(fs_access, cast(str, rfile["location"]))
+                            if path is not None:
+                                files["checksum"] = "sha1$%s" % file_checksum(path)
+                            else:
+                                with fs_access.open(
+                                    cast(str, rfile["location"]), "rb"
+                                ) as f:
+                                    checksum = hashlib.sha1()  # nosec
                                     contents = f.read(1024 * 1024)
-                                files["checksum"] = "sha1$%s" % checksum.hexdigest()
+                                    while contents != b"":
+                                        checksum.update(contents)
+                                        contents = f.read(1024 * 1024)
+                                    files["checksum"] = "sha1$%s" % checksum.hexdigest()
                         files["size"] = fs_access.size(cast(str, rfile["location"]))
 
             optional = False
@@ -1271,6 +1353,9 @@ class CommandLineTool(Process):
 
             if "secondaryFiles" in schema:
                 with SourceLine(schema, "secondaryFiles", WorkflowException, debug):
+                    # The outputs are all written by now, so their
+                    # directories can be listed rather than checked per file.
+                    index = DirectoryIndex()
                     for primary in aslist(result):
                         if isinstance(primary, MutableMapping):
                             primary.setdefault("secondaryFiles", [])
@@ -1300,7 +1385,7 @@ class CommandLineTool(Process):
                                     if isinstance(sfitem, str):
                                         sfitem = {"path": pathprefix + sfitem}
                                     if (
-                                        not fs_access.exists(sfitem["path"])
+                                        not index.exists(fs_access, sfitem["path"])
                                         and sf_required
                                     ):
                                         raise WorkflowException(
@@ -1309,10 +1394,10 @@ class CommandLineTool(Process):
                                         )
                                     if "path" in sfitem and "location" not in sfitem:
                                         revmap(sfitem)
-                                    if fs_access.isfile(sfitem["location"]):
+                                    if index.isfile(fs_access, sfitem["location"]):
                                         sfitem["class"] = "File"
                                         primary["secondaryFiles"].append(sfitem)
-                                    elif fs_access.isdir(sfitem["location"]):
+                                    elif index.isdir(fs_access, sfitem["location"]):
                                         sfitem["class"] = "Directory"
                                         primary["secondaryFiles"].append(sfitem)
 
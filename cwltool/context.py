@@ -13,18 +13,20 @@ from schema_salad.utils import FetcherCallableType
 from typing_extensions import TYPE_CHECKING
 
 from .builder import Builder, HasReqsHints
+from .file_copy import DEFAULT_STRATEGY
 from .mpi import MpiConfig
 from .mutation import MutationManager
 from .pathmapper import PathMapper
 from .secrets import SecretStore
-from .software_requirements import DependenciesConfiguration
-from .stdfsaccess import StdFsAccess
+from .stdfsaccess import DirectoryIndex, StdFsAccess
 from .utils import DEFAULT_TMP_PREFIX, CWLObjectType, ResolverType
 
 if TYPE_CHECKING:
+    from .incremental import IncrementalState
     from .process import Process
     from .provenance import ResearchObject  # pylint: disable=unused-import
     from .provenance_profile import ProvenanceProfile
+    from .software_requirements import DependenciesConfiguration
 
 
 class ContextBase:
@@ -74,6 +76,8 @@ class LoadingContext(ContextBase):
         self.do_update = None  # type: Optional[bool]
         self.jobdefaults = None  # type: Optional[CommentedMap]
         self.doc_cache = True  # type: bool
+        self.load_cache = None  # type: Optional[str]
+        self.parallel_fetch = 0  # type: int
         self.relax_path_checks = False  # type: bool
 
         super().__init__(kwargs)
@@ -117,6 +121,15 @@ class RuntimeContext(ContextBase):
             None
         )  # type: Optional[Callable[[HasReqsHints], Optional[str]]]
         self.cachedir = None  # type: Optional[str]
+        self.cache_max_size = None  # type: Optional[int]
+        self.cache_max_age = None  # type: Optional[float]
+        self.cache_eviction = "lru"  # type: str
+        self.remote_cache = None  # type: Optional[str]
+        self.copy_strategy = DEFAULT_STRATEGY  # type: str
+        self.dry_run = False  # type: bool
+        self.incremental_state = None  # type: Optional[IncrementalState]
+        self.staging_workers = 8  # type: int
+        self.writable_staging = "reflink"  # type: str
         self.outdir = None  # type: Optional[str]
         self.stagedir = ""  # type: str
         self.part_of = ""  # type: str
@@ -124,6 +137,7 @@ class RuntimeContext(ContextBase):
         self.toplevel = False  # type: bool
         self.mutation_manager = None  # type: Optional[MutationManager]
         self.make_fs_access = StdFsAccess  # type: Callable[[str], StdFsAccess]
+        self.directory_index = None  # type: Optional[DirectoryIndex]
         self.path_mapper = PathMapper
         self.builder = None  # type: Optional[Builder]
         self.docker_outdir = ""  # type: str
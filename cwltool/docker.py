@@ -17,10 +17,11 @@ from .builder import Builder
 from .context import RuntimeContext
 from .docker_id import docker_vm_id
 from .errors import WorkflowException
+from .file_copy import writable_copy
 from .job import ContainerCommandLineJob
 from .loghandler import _logger
 from .pathmapper import MapperEnt, PathMapper
-from .utils import CWLObjectType, create_tmp_dir, ensure_writable
+from .utils import CWLObjectType, create_tmp_dir
 
 _IMAGES = set()  # type: Set[str]
 _IMAGES_LOCK = threading.Lock()
@@ -253,6 +254,37 @@ class DockerCommandLineJob(ContainerCommandLineJob):
         if not os.path.exists(source):
             os.makedirs(source)
 
+    @staticmethod
+    def append_overlay_volume(
+        runtime: List[str], source: str, target: str, tmpdir_prefix: str
+    ) -> bool:
+        """
+        Mount a directory writable, behind an overlay; tell if that was done.
+
+        The overlay is a volume of the local driver, whose upper layer is a
+        new temporary directory, so nothing is copied up front and what the
+        job writes never reaches the source.
+        """
+        layers = create_tmp_dir(tmpdir_prefix)
+        upper = os.path.join(layers, "upper")
+        work = os.path.join(layers, "work")
+        os.mkdir(upper)
+        os.mkdir(work)
+        options = [
+            "type=volume",
+            "target=" + target,
+            "volume-driver=local",
+            "volume-opt=type=overlay",
+            "volume-opt=device=overlay",
+            "volume-opt=o=lowerdir={},upperdir={},workdir={}".format(
+                os.path.realpath(source), upper, work
+            ),
+        ]
+        output = StringIO()
+        csv.writer(output).writerow(options)
+        runtime.append("--mount=%s" % output.getvalue().strip())
+        return True
+
     def add_file_or_directory_volume(
         self, runtime: List[str], volume: MapperEnt, host_outdir_tgt: Optional[str]
     ) -> None:
@@ -277,13 +309,14 @@ class DockerCommandLineJob(ContainerCommandLineJob):
                 # which is already going to be mounted
                 if not os.path.exists(os.path.dirname(host_outdir_tgt)):
                     os.makedirs(os.path.dirname(host_outdir_tgt))
-                shutil.copy(volume.resolved, host_outdir_tgt)
+                writable_copy(
+                    volume.resolved, host_outdir_tgt, self.writable_copy_strategy
+                )
             else:
                 tmpdir = create_tmp_dir(tmpdir_prefix)
                 file_copy = os.path.join(tmpdir, os.path.basename(volume.resolved))
-                shutil.copy(volume.resolved, file_copy)
+                writable_copy(volume.resolved, file_copy, self.writable_copy_strategy)
                 self.append_volume(runtime, file_copy, volume.target, writable=True)
-            ensure_writable(host_outdir_tgt or file_copy)
 
     def add_writable_directory_volume(
         self,
@@ -308,15 +341,21 @@ class DockerCommandLineJob(ContainerCommandLineJob):
                 self.append_volume(
                     runtime, volume.resolved, volume.target, writable=True
                 )
-            else:
-                if not host_outdir_tgt:
+            elif not host_outdir_tgt:
+                if (
+                    self.writable_staging != "overlay"
+                    or not self.append_overlay_volume(
+                        runtime, volume.resolved, volume.target, tmpdir_prefix
+                    )
+                ):
                     tmpdir = create_tmp_dir(tmpdir_prefix)
                     new_dir = os.path.join(tmpdir, os.path.basename(volume.resolved))
-                    shutil.copytree(volume.resolved, new_dir)
+                    writable_copy(volume.resolved, new_dir, self.writable_copy_strategy)
                     self.append_volume(runtime, new_dir, volume.target, writable=True)
-                else:
-                    shutil.copytree(volume.resolved, host_outdir_tgt)
-                ensure_writable(host_outdir_tgt or new_dir)
+            else:
+                writable_copy(
+                    volume.resolved, host_outdir_tgt, self.writable_copy_strategy
+                )
 
     def _required_env(self) -> Dict[str, str]:
         # spec currently says "HOME must be set to the designated output
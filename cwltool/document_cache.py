@@ -0,0 +1,207 @@
+"""Persistent cache of resolved, validated and updated CWL documents."""
+
+import hashlib
+import json
+import os
+import pickle  # nosec
+import sys
+import tempfile
+import urllib
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, cast
+
+from rdflib import Graph
+from schema_salad.ref_resolver import Loader, uri_file_path
+from schema_salad.utils import ResolveType
+
+from .loghandler import _logger
+from .utils import CWLObjectType, versionstring
+
+# Bump whenever the layout of a cache entry changes.
+CACHE_FORMAT = 1
+
+# (path, size, mtime_ns, sha256)
+DependencyType = Tuple[str, int, int, str]
+
+
+def file_digest(path: str) -> str:
+    """Compute the SHA-256 of the contents of a file."""
+    checksum = hashlib.sha256()
+    with open(path, "rb") as handle:
+        contents = handle.read(1024 * 1024)
+        while contents:
+            checksum.update(contents)
+            contents = handle.read(1024 * 1024)
+    return checksum.hexdigest()
+
+
+def fingerprint(path: str) -> Optional[DependencyType]:
+    """Record size, modification time and content hash of a file."""
+    try:
+        st = os.stat(path)
+        return (path, st.st_size, st.st_mtime_ns, file_digest(path))
+    except OSError:
+        return None
+
+
+def dependency_unchanged(dep: DependencyType) -> bool:
+    """
+    Check that a recorded dependency still has the same content.
+
+    Files whose size and modification time are unchanged are trusted
+    without being read again.
+    """
+    path, size, mtime_ns, digest = dep
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if st.st_size != size:
+        return False
+    if st.st_mtime_ns == mtime_ns:
+        return True
+    try:
+        return file_digest(path) == digest
+    except OSError:
+        return False
+
+
+def record_fetches(loader: Loader) -> Set[str]:
+    """Make the loader remember every URL it fetches the text of."""
+    fetched = set()  # type: Set[str]
+    fetch_text = loader.fetch_text
+
+    def recording_fetch_text(
+        url: str, content_types: Optional[List[str]] = None
+    ) -> str:
+        fetched.add(urllib.parse.urldefrag(url)[0])
+        return fetch_text(url, content_types=content_types)
+
+    loader.fetch_text = recording_fetch_text
+    return fetched
+
+
+class DocumentCache:
+    """
+    Directory of pickled document graphs.
+
+    Each entry holds the loader index produced by resolving, validating
+    and updating one document, together with the fingerprints of every
+    file that was read to produce it.  An entry is only used if all those
+    files still have the same content.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Use (and create if needed) the given cache directory."""
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, uri: str, options: Dict[str, Any]) -> str:
+        """Compute the cache key for loading a document with some options."""
+        keydata = {
+            "format": CACHE_FORMAT,
+            "version": versionstring().split()[-1],
+            "python": list(sys.version_info[:2]),
+            "uri": uri,
+            "options": options,
+        }
+        return hashlib.sha256(
+            json.dumps(keydata, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".pickle")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the entry for key, if there is one and it is still valid."""
+        try:
+            with open(self._path(key), "rb") as handle:
+                entry = cast(Dict[str, Any], pickle.load(handle))  # nosec
+        except FileNotFoundError:
+            return None
+        except Exception as err:  # pylint: disable=broad-except
+            _logger.debug("Ignoring unreadable document cache entry %s: %s", key, err)
+            return None
+        if entry.get("format") != CACHE_FORMAT:
+            return None
+        for dep in cast(List[DependencyType], entry["dependencies"]):
+            if not dependency_unchanged(dep):
+                _logger.debug("Document cache entry %s is stale: %s", key, dep[0])
+                return None
+        return entry
+
+    def store(self, key: str, entry: Dict[str, Any]) -> None:
+        """Atomically write an entry."""
+        entry["format"] = CACHE_FORMAT
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as handle:
+                pickle.dump(entry, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except Exception as err:  # pylint: disable=broad-except
+            _logger.debug("Could not write document cache entry %s: %s", key, err)
+
+
+def dependencies(urls: Iterable[str]) -> Optional[List[DependencyType]]:
+    """
+    Fingerprint the files behind a set of document URLs.
+
+    Returns None if any of them is not a local file, since those can't be
+    cheaply revalidated.
+    """
+    deps = []  # type: List[DependencyType]
+    for url in sorted(set(urls)):
+        scheme = urllib.parse.urlsplit(url).scheme
+        if scheme != "file":
+            return None
+        path = uri_file_path(url)
+        if not os.path.isfile(path):
+            continue
+        dep = fingerprint(path)
+        if dep is None:
+            return None
+        deps.append(dep)
+    return deps
+
+
+def make_entry(
+    document_loader: Loader,
+    processobj: ResolveType,
+    metadata: CWLObjectType,
+    uri: str,
+    fetched: Iterable[str],
+) -> Optional[Dict[str, Any]]:
+    """Capture the loader state needed to skip resolving a document."""
+    documents = set(fetched)
+    documents.update(k for k in document_loader.idx if "#" not in k)
+    deps = dependencies(documents)
+    if deps is None:
+        return None
+    graph = None  # type: Optional[str]
+    if len(document_loader.graph) > 0:
+        graph = document_loader.graph.serialize(format="nt")
+        if isinstance(graph, bytes):
+            graph = graph.decode("utf-8")
+    return {
+        "dependencies": deps,
+        "idx": dict(document_loader.idx),
+        "processobj": processobj,
+        "metadata": metadata,
+        "uri": uri,
+        "vocab": dict(document_loader.vocab),
+        "rvocab": dict(document_loader.rvocab),
+        "graph": graph,
+    }
+
+
+def restore_entry(
+    document_loader: Loader, entry: Dict[str, Any]
+) -> Tuple[ResolveType, CWLObjectType, str]:
+    """Load a cache entry into a document loader."""
+    document_loader.idx.update(entry["idx"])
+    document_loader.vocab.update(entry["vocab"])
+    document_loader.rvocab.update(entry["rvocab"])
+    if entry["graph"] is not None:
+        graph = Graph()
+        graph.parse(data=entry["graph"], format="nt")
+        document_loader.graph += graph
+    return entry["processobj"], entry["metadata"], entry["uri"]
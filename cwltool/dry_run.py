@@ -0,0 +1,83 @@
+"""
+Predicting what a run would take from --cachedir, for --dry-run.
+
+A dry run goes through the workflow like a real one, except that jobs are
+not run and nothing is written, neither to the output directory nor to
+the cache.  A job whose outputs are in the job cache is reported as a hit
+and one that would have to run as a miss; either way the steps waiting
+for its outputs are reported as unknown.  Expressions are cheap, and are
+evaluated.
+"""
+
+import sqlite3
+from typing import Any, Optional, Tuple, cast
+
+from .cache_backends import cache_backend
+from .context import RuntimeContext
+from .job_cache import ManifestType, job_cache
+from .loghandler import _logger
+from .utils import CWLObjectType
+
+STATUSES = ("hit", "remote", "miss", "unknown")
+
+
+def manifest_size(manifest: ManifestType) -> int:
+    """Give the number of bytes of the files listed in a manifest."""
+    return sum(int(entry.get("size", 0)) for entry in manifest)
+
+
+def predict(
+    key: str, runtime_context: RuntimeContext
+) -> Tuple[str, Optional[ManifestType]]:
+    """
+    Tell whether the outputs of key are in the cache, without using them.
+
+    Gives "hit" and the manifest of the outputs if they are in --cachedir,
+    "remote" if they would have to be fetched from --remote-cache, and
+    "miss" otherwise.
+    """
+    cache = job_cache(cast(str, runtime_context.cachedir))
+    manifest = cache.lookup(key, touch=False)
+    if manifest is not None:
+        return "hit", manifest
+    if runtime_context.remote_cache:
+        try:
+            manifest = cache_backend(runtime_context.remote_cache).get_manifest(key)
+        except (OSError, ValueError, sqlite3.Error) as err:
+            _logger.warning("Could not look up %s in the remote cache: %s", key, err)
+        if manifest is not None:
+            return "remote", manifest
+    return "miss", None
+
+
+class PlannedJob:
+    """
+    What a job would do in a real run.
+
+    Size is the number of bytes of the cached outputs, or for a miss what
+    the tool asks for its output directory, if it does.  Running it does
+    nothing.
+    """
+
+    def __init__(
+        self, name: str, status: str, key: Optional[str], size: Optional[int]
+    ) -> None:
+        """Record what was found for the job."""
+        self.name = name
+        self.status = status
+        self.key = key
+        self.size = size
+        self.outdir = None  # type: Optional[str]
+        self.prov_obj = None  # type: Optional[Any]
+
+    def run(self, runtimeContext: RuntimeContext, tmpdir_lock: Any = None) -> None:
+        """Run nothing."""
+
+    def report(self) -> CWLObjectType:
+        """Give the entry of the job in the dry run report."""
+        return {
+            "name": self.name,
+            "status": self.status,
+            "key": self.key,
+            "bytes": self.size,
+        }
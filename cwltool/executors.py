@@ -9,7 +9,6 @@ from abc import ABCMeta, abstractmethod
 from threading import Lock
 from typing import (
     Dict,
-    Iterable,
     List,
     MutableSequence,
     Optional,
@@ -22,20 +21,25 @@ from typing import (
 import psutil
 from schema_salad.exceptions import ValidationException
 from schema_salad.sourceline import SourceLine
+from typing_extensions import TYPE_CHECKING
 
 from .command_line_tool import CallbackJob, ExpressionJob
 from .context import RuntimeContext, getdefault
+from .dry_run import STATUSES, PlannedJob
 from .errors import WorkflowException
 from .job import JobBase
 from .loghandler import _logger
 from .mutation import MutationManager
-from .process import Process, cleanIntermediate, relocateOutputs
-from .provenance_profile import ProvenanceProfile
+from .process import Process, cleanIntermediate, relocateOutputs, shortname
+from .stdfsaccess import DirectoryIndex
 from .task_queue import TaskQueue
-from .utils import CWLObjectType, JobsType
+from .utils import CWLObjectType, CWLOutputAtomType, JobsType
 from .workflow import Workflow
 from .workflow_job import WorkflowJob, WorkflowJobStep
 
+if TYPE_CHECKING:
+    from .provenance_profile import ProvenanceProfile  # pylint: disable=unused-import
+
 TMPDIR_LOCK = Lock()
 
 
@@ -103,6 +107,7 @@ class JobExecutor(metaclass=ABCMeta):
         self.output_dirs.add(outdir)
         runtime_context.outdir = outdir
         runtime_context.mutation_manager = MutationManager()
+        runtime_context.directory_index = DirectoryIndex()
         runtime_context.toplevel = True
         runtime_context.workflow_eval_lock = threading.Condition(threading.RLock())
 
@@ -160,17 +165,13 @@ class JobExecutor(metaclass=ABCMeta):
                 runtime_context.make_fs_access(""),
                 getdefault(runtime_context.compute_checksum, True),
                 path_mapper=runtime_context.path_mapper,
+                copy_strategy=runtime_context.copy_strategy,
             )
 
         if runtime_context.rm_tmpdir:
-            if runtime_context.cachedir is None:
-                output_dirs = self.output_dirs  # type: Iterable[str]
-            else:
-                output_dirs = filter(
-                    lambda x: not x.startswith(runtime_context.cachedir),  # type: ignore
-                    self.output_dirs,
-                )
-            cleanIntermediate(output_dirs)
+            # Cached outputs are kept in the job cache's own store, so the
+            # output directories of cached jobs can go too.
+            cleanIntermediate(self.output_dirs)
 
         if self.final_output and self.final_status:
 
@@ -215,6 +216,8 @@ class SingleJobExecutor(JobExecutor):
             not isinstance(process, Workflow)
             and runtime_context.research_obj is not None
         ):
+            from .provenance_profile import ProvenanceProfile
+
             process.provenance_object = ProvenanceProfile(
                 runtime_context.research_obj,
                 full_name=runtime_context.cwl_full_name,
@@ -454,8 +457,11 @@ class MultithreadedJobExecutor(JobExecutor):
                 if job is not None:
                     if isinstance(job, JobBase):
                         job.builder = runtime_context.builder or job.builder
-                        if job.outdir is not None:
-                            self.output_dirs.add(job.outdir)
+                    # Cache hits give their outputs in directories of their
+                    # own, which go with the other intermediate outputs.
+                    outdir = getattr(job, "outdir", None)  # type: Optional[str]
+                    if outdir is not None:
+                        self.output_dirs.add(outdir)
 
                 self.run_job(job, runtime_context)
 
@@ -497,3 +503,78 @@ class NoopJobExecutor(JobExecutor):
         logger: Optional[logging.Logger] = None,
     ) -> Tuple[Optional[CWLObjectType], str]:
         return {}, "success"
+
+
+class DryRunExecutor(JobExecutor):
+    """
+    Plan the jobs of a process instead of running them, for --dry-run.
+
+    Like the NoopJobExecutor, runs nothing.  The output is a report of the
+    jobs that would use cached outputs, those that would run, and the steps
+    that can't be told before the outputs of the latter are made.
+    """
+
+    def run_jobs(
+        self,
+        process: Process,
+        job_order_object: CWLObjectType,
+        logger: logging.Logger,
+        runtime_context: RuntimeContext,
+    ) -> None:
+        planned = []  # type: List[PlannedJob]
+        workflows = []  # type: List[WorkflowJob]
+        status = ["success"]
+
+        def output_callback(out: Optional[CWLObjectType], process_status: str) -> None:
+            status[0] = process_status
+
+        for job in process.job(job_order_object, output_callback, runtime_context):
+            if job is None:
+                break
+            if job.outdir is not None:
+                self.output_dirs.add(job.outdir)
+            if isinstance(job, PlannedJob):
+                planned.append(job)
+            elif isinstance(job, WorkflowJob):
+                workflows.append(job)
+            job.run(runtime_context)
+
+        steps = [job.report() for job in planned]
+        for workflow in workflows:
+            for step in workflow.steps:
+                if not step.submitted:
+                    steps.append(
+                        {
+                            "name": shortname(step.id),
+                            "status": "unknown",
+                            "key": None,
+                            "bytes": None,
+                        }
+                    )
+        summary = {
+            status: sum(1 for step in steps if step["status"] == status)
+            for status in STATUSES
+        }  # type: CWLObjectType
+        summary["cached_bytes"] = sum(
+            cast(int, job.size) for job in planned if job.status in ("hit", "remote")
+        )
+        summary["estimated_bytes"] = sum(
+            job.size for job in planned if job.status == "miss" and job.size is not None
+        )
+        self.final_output.append(
+            {"steps": cast(List[CWLOutputAtomType], steps), "summary": summary}
+        )
+        self.final_status.append(status[0])
+
+    def execute(
+        self,
+        process: Process,
+        job_order_object: CWLObjectType,
+        runtime_context: RuntimeContext,
+        logger: logging.Logger = _logger,
+    ) -> Tuple[Optional[CWLObjectType], str]:
+        runtime_context = runtime_context.copy()
+        runtime_context.dry_run = True
+        # The report is not moved anywhere.
+        runtime_context.outdir = None
+        return super().execute(process, job_order_object, runtime_context, logger)
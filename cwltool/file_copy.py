@@ -0,0 +1,199 @@
+"""
+Copying files without copying their contents where possible.
+
+Outputs are copied out of --cachedir, and out of job directories whenever
+they can't be moved.  A hardlink or a reflink (a copy-on-write clone, on
+filesystems such as Btrfs and XFS) takes the same time whatever the size
+of the file, and copy_file_range at least keeps the copy in the kernel,
+and lets network filesystems copy on the server.
+
+The strategy picks the first of these to try:
+
+link
+    Hardlink where possible.  The copy is the same file as the original,
+    so writing to one changes the other.
+reflink
+    Clone, or copy in the kernel, where possible.  The default.
+copy
+    Always copy the contents.
+
+Writable inputs are copied with writable_copy, which never hardlinks, so
+that what a job writes doesn't change the original.
+"""
+
+import errno
+import os
+import shutil
+import stat
+import sys
+from typing import IO, Any, Callable, Dict, Tuple
+
+from .loghandler import _logger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore
+
+# From linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+STRATEGIES = {
+    "link": ("link", "reflink", "copy_file_range"),
+    "reflink": ("reflink", "copy_file_range"),
+    "copy": (),
+}  # type: Dict[str, Tuple[str, ...]]
+
+DEFAULT_STRATEGY = "reflink"
+
+# What a filesystem or kernel that can't link, clone or copy_file_range
+# answers.
+_UNSUPPORTED = {
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EACCES,
+    errno.EMLINK,
+    errno.ENOTTY,
+    errno.EINVAL,
+    errno.EBADF,
+    errno.ENOSYS,
+    errno.EOPNOTSUPP,
+    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+}
+
+
+def _reflink(src: IO[Any], dst: IO[Any]) -> None:
+    if fcntl is None or not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported")
+    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def _copy_file_range(src: IO[Any], dst: IO[Any]) -> None:
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range is not supported")
+    remaining = os.fstat(src.fileno()).st_size
+    while remaining > 0:
+        copied = os.copy_file_range(  # type: ignore
+            src.fileno(), dst.fileno(), min(remaining, 1 << 30)
+        )
+        if copied == 0:
+            break
+        remaining -= copied
+
+
+_CLONERS = {
+    "reflink": _reflink,
+    "copy_file_range": _copy_file_range,
+}  # type: Dict[str, Callable[[IO[Any], IO[Any]], None]]
+
+
+def copy_file(src: str, dst: str, strategy: str = DEFAULT_STRATEGY) -> str:
+    """
+    Copy the contents of src to dst, replacing it; give the method used.
+
+    Like shutil.copyfile, dst is a file name, and symlinks are followed.
+    """
+    methods = STRATEGIES[strategy]
+    if "link" in methods:
+        try:
+            os.link(src, dst)
+            return "link"
+        except FileExistsError:
+            if os.path.samefile(src, dst):
+                return "link"
+        except OSError as err:
+            if err.errno not in _UNSUPPORTED:
+                raise
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        for method in methods:
+            if method not in _CLONERS:
+                continue
+            try:
+                _CLONERS[method](fsrc, fdst)
+                return method
+            except OSError as err:
+                if err.errno not in _UNSUPPORTED:
+                    raise
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+def copy2(src: str, dst: str, strategy: str = DEFAULT_STRATEGY) -> str:
+    """
+    Copy a file like shutil.copy2, with the given strategy.
+
+    Unlike shutil.copy2, there is nothing to do if dst is already src, as
+    with a hardlink to it.
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return dst
+    method = copy_file(src, dst, strategy)
+    if method != "link":
+        shutil.copystat(src, dst)
+    _logger.debug("Copied %s to %s (%s)", src, dst, method)
+    return dst
+
+
+def _copy_function(strategy: str) -> Callable[[str, str], None]:
+    """Give a copy_function for shutil, copying files with the given strategy."""
+
+    def copy_function(src: str, dst: str) -> None:
+        copy2(src, dst, strategy)
+
+    return copy_function
+
+
+def copytree(src: str, dst: str, strategy: str = DEFAULT_STRATEGY) -> None:
+    """Copy a directory like shutil.copytree, with the given strategy."""
+    shutil.copytree(src, dst, copy_function=_copy_function(strategy))
+
+
+def move(src: str, dst: str, strategy: str = DEFAULT_STRATEGY) -> None:
+    """Move a file or directory like shutil.move, with the given strategy."""
+    shutil.move(src, dst, copy_function=_copy_function(strategy))
+
+
+def _writable_tree(src: str, dst: str, strategy: str) -> None:
+    os.mkdir(dst)
+    with os.scandir(src) as entries:
+        for entry in entries:
+            target = os.path.join(dst, entry.name)
+            if entry.is_dir():
+                _writable_tree(entry.path, target, strategy)
+            else:
+                copy_file(entry.path, target, strategy)
+                status = entry.stat()
+                os.chmod(target, stat.S_IMODE(status.st_mode) | stat.S_IWUSR)
+                os.utime(target, ns=(status.st_atime_ns, status.st_mtime_ns))
+    status = os.stat(src)
+    os.chmod(dst, stat.S_IMODE(status.st_mode) | stat.S_IWUSR)
+    os.utime(dst, ns=(status.st_atime_ns, status.st_mtime_ns))
+
+
+def writable_copy(src: str, dst: str, strategy: str = DEFAULT_STRATEGY) -> str:
+    """
+    Copy a file or directory for a job to write to; give the path of the copy.
+
+    Files are copied like shutil.copy, and directories like shutil.copytree,
+    following symlinks.  A hardlink would share the contents with the
+    original, so "link" clones like "reflink".  Each file is made writable
+    by the user as it is copied, rather than in a second walk of the copy.
+    """
+    if strategy == "link":
+        strategy = "reflink"
+    if os.path.isdir(src):
+        _writable_tree(src, dst, strategy)
+        return dst
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    method = copy_file(src, dst, strategy)
+    os.chmod(dst, stat.S_IMODE(os.stat(src).st_mode) | stat.S_IWUSR)
+    _logger.debug("Copied %s to %s for writing (%s)", src, dst, method)
+    return dst
@@ -0,0 +1,180 @@
+"""
+Checksums of local files, remembered across runs.
+
+The same input files, often large reference data, are hashed by every run
+that uses them, and outputs are hashed again when they are collected,
+cached, relocated and added to a research object.  A checksum is
+remembered along with the device, inode, size and modification time of
+the file it was computed from, and reused for as long as those stay the
+same.
+
+Checksums are kept in $XDG_CACHE_HOME/cwltool/fingerprints.sqlite.  Set
+CWLTOOL_FINGERPRINTS to use another file, or to an empty string to only
+remember checksums for the duration of a run.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .loghandler import _logger
+from .stdfsaccess import StdFsAccess
+
+# Files modified this recently (in seconds) before being hashed could be
+# modified again without their modification time changing, so their
+# checksums are only remembered for the current run.
+RACY = 2.0
+
+KeyType = Tuple[int, int, str]
+FingerprintType = Tuple[int, int, str]
+
+
+def default_path() -> Optional[str]:
+    """Give the file to keep checksums in, or None to not keep them."""
+    path = os.environ.get("CWLTOOL_FINGERPRINTS")
+    if path is None:
+        path = os.path.join(
+            os.environ.get(
+                "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+            ),
+            "cwltool",
+            "fingerprints.sqlite",
+        )
+    return path or None
+
+
+class FingerprintStore:
+    """Checksums of files, by device, inode, size and modification time."""
+
+    def __init__(self, path: Optional[str]) -> None:
+        """Keep checksums in an SQLite database at path, or only in memory."""
+        self.path = path
+        self.memory = {}  # type: Dict[KeyType, FingerprintType]
+        self.lock = threading.Lock()
+        self.db = None  # type: Optional[sqlite3.Connection]
+        if path is not None:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                db = sqlite3.connect(
+                    path, timeout=60, isolation_level=None, check_same_thread=False
+                )
+                db.execute("PRAGMA journal_mode = WAL")
+                db.execute("PRAGMA synchronous = NORMAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS fingerprints ("
+                    "dev INTEGER NOT NULL, ino INTEGER NOT NULL, "
+                    "algorithm TEXT NOT NULL, size INTEGER NOT NULL, "
+                    "mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL, "
+                    "PRIMARY KEY (dev, ino, algorithm))"
+                )
+                self.db = db
+            except (OSError, sqlite3.Error) as err:
+                _logger.debug("Not keeping file checksums in %s: %s", path, err)
+
+    def lookup(self, st: os.stat_result, algorithm: str) -> Optional[str]:
+        """Give the known checksum of the file st describes, if there is one."""
+        if not st.st_ino:
+            return None
+        key = (st.st_dev, st.st_ino, algorithm)
+        with self.lock:
+            fingerprint = self.memory.get(key)
+            if fingerprint is None and self.db is not None:
+                try:
+                    fingerprint = self.db.execute(
+                        "SELECT size, mtime_ns, digest FROM fingerprints "
+                        "WHERE dev = ? AND ino = ? AND algorithm = ?",
+                        key,
+                    ).fetchone()
+                except sqlite3.Error as err:
+                    _logger.debug("Could not read file checksums: %s", err)
+                if fingerprint is not None:
+                    self.memory[key] = fingerprint
+        if fingerprint is None:
+            return None
+        size, mtime_ns, digest = fingerprint
+        if (size, mtime_ns) != (st.st_size, st.st_mtime_ns):
+            return None
+        return digest
+
+    def known(self, path: str, algorithm: str = "sha1") -> Optional[str]:
+        """Give the known checksum of a file, without reading it."""
+        try:
+            return self.lookup(os.stat(path), algorithm)
+        except OSError:
+            return None
+
+    def record(
+        self, st: os.stat_result, algorithm: str, digest: str, hashed_at: float
+    ) -> None:
+        """Remember the checksum of a file whose hashing started at hashed_at."""
+        if not st.st_ino:
+            return
+        key = (st.st_dev, st.st_ino, algorithm)
+        fingerprint = (st.st_size, st.st_mtime_ns, digest)
+        with self.lock:
+            self.memory[key] = fingerprint
+            if self.db is None or hashed_at - st.st_mtime < RACY:
+                return
+            try:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO fingerprints "
+                    "(dev, ino, algorithm, size, mtime_ns, digest) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    key + fingerprint,
+                )
+            except sqlite3.Error as err:
+                _logger.debug("Could not write file checksums: %s", err)
+
+    def checksum(self, path: str, algorithm: str = "sha1") -> str:
+        """Give the hex digest of a file, hashing it only if it is not known."""
+        digest = self.known(path, algorithm)
+        if digest is not None:
+            return digest
+        with open(path, "rb") as handle:
+            st = os.fstat(handle.fileno())
+            digest = self.lookup(st, algorithm)
+            if digest is not None:
+                return digest
+            hashed_at = time.time()
+            checksum = hashlib.new(algorithm)
+            contents = handle.read(1024 * 1024)
+            while contents:
+                checksum.update(contents)
+                contents = handle.read(1024 * 1024)
+            digest = checksum.hexdigest()
+            after = os.fstat(handle.fileno())
+        if (after.st_size, after.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+            self.record(st, algorithm, digest, hashed_at)
+        return digest
+
+
+_store = None  # type: Optional[FingerprintStore]
+_store_lock = threading.Lock()
+
+
+def fingerprints() -> FingerprintStore:
+    """Open the store of checksums once per process."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FingerprintStore(default_path())
+        return _store
+
+
+def file_checksum(path: str, algorithm: str = "sha1") -> str:
+    """Give the hex digest of a local file."""
+    return fingerprints().checksum(path, algorithm)
+
+
+def local_path(fs_access: StdFsAccess, location: str) -> Optional[str]:
+    """Give the local path of a location, if fs_access reads local files."""
+    for method in ("open", "_abs"):
+        if getattr(type(fs_access), method) is not getattr(StdFsAccess, method):
+            return None
+    path = fs_access._abs(location)
+    if "://" in path:
+        return None
+    return path
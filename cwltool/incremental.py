@@ -0,0 +1,204 @@
+"""
+Rerunning only the steps of a workflow that changed, for --incremental.
+
+The state directory records, for each step, a digest of what it runs and,
+for the inputs it was run on, a digest of those along with its outputs.
+The output files are linked into the directory, so that they outlive the
+run.  A step whose digests are the same as in the last run is not run
+again, nor looked up in the job cache: its recorded outputs are used
+straight away.  Only the steps that changed are run, and then the steps
+after them whose inputs changed as a result.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Set, Tuple
+
+from schema_salad.ref_resolver import uri_file_path
+from schema_salad.utils import json_dumps
+from typing_extensions import TYPE_CHECKING
+
+from .context import RuntimeContext
+from .fingerprints import file_checksum
+from .loghandler import _logger
+from .memo import (
+    effective_digest,
+    inputs_digest,
+    process_digest,
+    restore_outputs,
+    stage_outputs,
+)
+from .utils import CWLObjectType, OutputCallbackType, visit_class
+
+if TYPE_CHECKING:
+    from .workflow import WorkflowStep
+
+# Bump whenever the layout of the state directory changes.
+STATE_FORMAT = 1
+
+# The digest of what a step runs, and that of its inputs.
+StepDigests = Tuple[str, str]
+
+
+def _check(obj: CWLObjectType) -> None:
+    location = obj.get("location")
+    if not isinstance(location, str) or not location.startswith("file://"):
+        return
+    path = uri_file_path(location)
+    if obj["class"] == "Directory":
+        if not os.path.isdir(path):
+            raise ValueError("%s is gone" % path)
+    elif "checksum" in obj:
+        if "sha1$" + file_checksum(path) != obj["checksum"]:
+            raise ValueError("%s has changed" % path)
+    elif not os.path.isfile(path):
+        raise ValueError("%s is gone" % path)
+
+
+class IncrementalState:
+    """
+    The steps recorded in a state directory, and the outputs they made.
+
+    The state is saved after each step, so that an interrupted run is
+    picked up where it stopped.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Use (and create if needed) the given state directory."""
+        self.directory = os.path.abspath(directory)
+        self.outputs = os.path.join(self.directory, "outputs")
+        self.path = os.path.join(self.directory, "state.json")
+        os.makedirs(self.outputs, exist_ok=True)
+        self.steps = self._load()  # type: Dict[str, Dict[str, Any]]
+        self.used = set()  # type: Set[Tuple[str, str]]
+        self.lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path) as handle:
+                state = json.load(handle)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as err:
+            _logger.warning("Ignoring the incremental state in %s: %s", self.path, err)
+            return {}
+        if not isinstance(state, dict) or state.get("format") != STATE_FORMAT:
+            return {}
+        return dict(state["steps"])
+
+    def _save(self) -> None:
+        handle = tempfile.NamedTemporaryFile(
+            "w", dir=self.directory, prefix="state-", delete=False
+        )
+        with handle:
+            json.dump({"format": STATE_FORMAT, "steps": self.steps}, handle)
+        os.replace(handle.name, self.path)
+
+    def _outside(self, path: str) -> bool:
+        return not path.startswith(os.path.realpath(self.outputs) + os.sep)
+
+    def digests(
+        self,
+        step: "WorkflowStep",
+        job_order: CWLObjectType,
+        runtime_context: RuntimeContext,
+    ) -> Optional[StepDigests]:
+        """Give the digests of a step, unless its work may not be reused."""
+        if (
+            runtime_context.research_obj is not None
+            or not process_digest(step)[1]
+            or not process_digest(step.embedded_tool)[1]
+        ):
+            return None
+        tool = json_dumps(
+            [effective_digest(step.embedded_tool, runtime_context), step.tool],
+            sort_keys=True,
+        )
+        return (
+            hashlib.sha1(tool.encode("utf-8")).hexdigest(),  # nosec
+            inputs_digest(job_order),
+        )
+
+    def lookup(
+        self, step_id: str, digests: StepDigests, name: str
+    ) -> Optional[CWLObjectType]:
+        """Give the outputs of the last run of a step, if it is unchanged."""
+        tool, inputs = digests
+        with self.lock:
+            entry = self.steps.get(step_id)
+            run = entry["runs"].get(inputs) if entry is not None else None
+        if entry is None:
+            return None
+        if entry["tool"] != tool:
+            _logger.info("[%s] changed since the last run", name)
+            return None
+        if run is None:
+            _logger.info("[%s] inputs changed since the last run", name)
+            return None
+        outputs = copy.deepcopy(run["outputs"])  # type: CWLObjectType
+        try:
+            restore_outputs(os.path.join(self.outputs, run["dir"]), outputs)
+            visit_class(outputs, ("File", "Directory"), _check)
+        except (OSError, ValueError) as err:
+            _logger.info("[%s] outputs changed since the last run: %s", name, err)
+            return None
+        with self.lock:
+            self.used.add((step_id, inputs))
+        _logger.info("[%s] up to date, using the outputs of the last run", name)
+        return outputs
+
+    def record(
+        self,
+        step_id: str,
+        digests: StepDigests,
+        name: str,
+        output_callback: OutputCallbackType,
+        outputs: Optional[CWLObjectType],
+        process_status: str,
+    ) -> None:
+        """Record the outputs of a step that succeeded, then pass them on."""
+        if process_status == "success" and outputs is not None:
+            tool, inputs = digests
+            staging = tempfile.mkdtemp(prefix="step-", dir=self.outputs)
+            try:
+                staged = stage_outputs(outputs, staging, self._outside)
+                with self.lock:
+                    entry = self.steps.get(step_id)
+                    if entry is None or entry["tool"] != tool:
+                        entry = self.steps[step_id] = {"tool": tool, "runs": {}}
+                    entry["runs"][inputs] = {
+                        "dir": os.path.basename(staging),
+                        "outputs": staged,
+                    }
+                    self.used.add((step_id, inputs))
+                    self._save()
+            except (OSError, ValueError) as err:
+                shutil.rmtree(staging, True)
+                _logger.warning("[%s] Could not record outputs: %s", name, err)
+        output_callback(outputs, process_status)
+
+    def prune(self) -> None:
+        """Forget the steps, and remove the outputs, that the run didn't use."""
+        with self.lock:
+            for step_id, entry in list(self.steps.items()):
+                entry["runs"] = {
+                    inputs: run
+                    for inputs, run in entry["runs"].items()
+                    if (step_id, inputs) in self.used
+                }
+                if not entry["runs"]:
+                    del self.steps[step_id]
+            self._save()
+            kept = {
+                run["dir"]
+                for entry in self.steps.values()
+                for run in entry["runs"].values()
+            }
+        for name in os.listdir(self.outputs):
+            if name not in kept:
+                shutil.rmtree(os.path.join(self.outputs, name), True)
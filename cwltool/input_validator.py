@@ -0,0 +1,258 @@
+"""
+Validation of job orders against a process's input record schema.
+
+schema-salad's validate_ex interprets the schema for every value it checks,
+which dominates job construction for inputs with many Files, and scatters
+validate the same unscattered inputs again for every element.  Processes
+instead compile their input record schema once into plain Python checks,
+and remember the input values those have already accepted.
+"""
+
+import collections.abc
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, MutableMapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+from schema_salad.avro.schema import (
+    ArraySchema,
+    EnumSchema,
+    RecordSchema,
+    Schema,
+    UnionSchema,
+)
+from schema_salad.validate import (
+    INT_MAX_VALUE,
+    INT_MIN_VALUE,
+    LONG_MAX_VALUE,
+    LONG_MIN_VALUE,
+    validate_ex,
+)
+
+CheckType = Callable[[Any], bool]
+
+# How many accepted input values each validator remembers.
+ACCEPTED_VALUES = 64
+
+
+def _never(datum: Any) -> bool:
+    return False
+
+
+def _is_null(datum: Any) -> bool:
+    return datum is None
+
+
+def _is_boolean(datum: Any) -> bool:
+    return isinstance(datum, bool)
+
+
+def _is_string(datum: Any) -> bool:
+    return isinstance(datum, (str, bytes))
+
+
+def _is_int(datum: Any) -> bool:
+    return isinstance(datum, int) and INT_MIN_VALUE <= datum <= INT_MAX_VALUE
+
+
+def _is_long(datum: Any) -> bool:
+    return isinstance(datum, int) and LONG_MIN_VALUE <= datum <= LONG_MAX_VALUE
+
+
+def _is_number(datum: Any) -> bool:
+    return isinstance(datum, (int, float))
+
+
+PRIMITIVE_CHECKS = {
+    "null": _is_null,
+    "boolean": _is_boolean,
+    "string": _is_string,
+    "int": _is_int,
+    "long": _is_long,
+    "float": _is_number,
+    "double": _is_number,
+}  # type: Dict[str, CheckType]
+
+
+def _ignored_key(key: Any) -> bool:
+    """Check if validate_ex silently accepts an unknown field of this name."""
+    if not isinstance(key, str) or not key:
+        return False
+    return key[0] in ("@", "$") or bool(urlsplit(key).scheme)
+
+
+def compile_schema(schema: Schema, compiled: Dict[int, CheckType]) -> CheckType:
+    """
+    Compile an Avro schema into a function checking values against it.
+
+    The function returns True only for values which validate_ex, with
+    strict=False, accepts without logging a warning.  For anything else it
+    returns False, and the caller should ask validate_ex for the verdict and
+    error message.  compiled holds the checks of named schemas, so
+    recursive types can refer to themselves.
+    """
+    key = id(schema)
+    if key in compiled:
+        return compiled[key]
+
+    check = PRIMITIVE_CHECKS.get(schema.type, _never)
+    if isinstance(schema, EnumSchema):
+        check = _compile_enum(schema)
+    elif isinstance(schema, ArraySchema):
+        check = _compile_array(schema, compiled)
+    elif isinstance(schema, UnionSchema):
+        check = _compile_union(schema, compiled)
+    elif isinstance(schema, RecordSchema):
+        return _compile_record(schema, compiled)
+    compiled[key] = check
+    return check
+
+
+def _compile_enum(schema: EnumSchema) -> CheckType:
+    name = schema.name
+    symbols = frozenset(schema.symbols)
+
+    def check(datum: Any) -> bool:
+        if name == "Any":
+            return datum is not None
+        if not isinstance(datum, str):
+            return False
+        if name == "Expression":
+            return "$(" in datum or "${" in datum
+        return datum in symbols
+
+    return check
+
+
+def _compile_array(schema: ArraySchema, compiled: Dict[int, CheckType]) -> CheckType:
+    items = compile_schema(schema.items, compiled)
+
+    def check(datum: Any) -> bool:
+        if not isinstance(datum, (list, collections.abc.MutableSequence)):
+            return False
+        for item in datum:
+            if not items(item):
+                return False
+        return True
+
+    return check
+
+
+def _compile_union(schema: UnionSchema, compiled: Dict[int, CheckType]) -> CheckType:
+    alternatives = [compile_schema(s, compiled) for s in schema.schemas]
+
+    def check(datum: Any) -> bool:
+        for alternative in alternatives:
+            if alternative(datum):
+                return True
+        return False
+
+    return check
+
+
+def _compile_record(schema: RecordSchema, compiled: Dict[int, CheckType]) -> CheckType:
+    # Register a forwarder first, so fields of this record's type can refer
+    # to it before it is complete.
+    compiled_record = []  # type: List[CheckType]
+    compiled[id(schema)] = lambda datum: compiled_record[0](datum)
+
+    classname = None  # type: Optional[str]
+    if any(f.name == "class" for f in schema.fields):
+        classname = schema.name
+    fields = [
+        (f.name, compile_schema(f.type, compiled), f.default)
+        for f in schema.fields
+        if f.name != "class"
+    ]
+    known = frozenset(f.name for f in schema.fields)
+
+    def check(datum: Any) -> bool:
+        if not isinstance(datum, (dict, collections.abc.MutableMapping)):
+            return False
+        if classname is not None:
+            cls = datum.get("class")
+            if not cls or cls != classname:
+                return False
+        for name, field_check, default in fields:
+            if not field_check(datum.get(name, default)):
+                return False
+        for key in datum:
+            if key not in known and not _ignored_key(key):
+                return False
+        return True
+
+    compiled_record.append(check)
+    compiled[id(schema)] = check
+    return check
+
+
+class InputValidator:
+    """
+    Validates job orders against one input record schema.
+
+    Remembers the container values (arrays, Files, records...) it has
+    accepted by identity, so the unscattered inputs shared by all the jobs
+    of a scatter are checked only once.
+    """
+
+    def __init__(self, schema: RecordSchema) -> None:
+        """Compile the checks for each input."""
+        self.schema = schema
+        compiled = {}  # type: Dict[int, CheckType]
+        self.fields = [
+            (f.name, compile_schema(f.type, compiled), f.default) for f in schema.fields
+        ]
+        self.names = frozenset(f.name for f in schema.fields)
+        self.accepted = OrderedDict()  # type: OrderedDict[Tuple[str, int], Any]
+        self.lock = threading.Lock()
+
+    def _seen(self, key: Tuple[str, int], original: Any) -> bool:
+        with self.lock:
+            if self.accepted.get(key) is original:
+                self.accepted.move_to_end(key)
+                return True
+        return False
+
+    def _remember(self, key: Tuple[str, int], original: Any) -> None:
+        with self.lock:
+            self.accepted[key] = original
+            while len(self.accepted) > ACCEPTED_VALUES:
+                self.accepted.popitem(last=False)
+
+    def _check(
+        self, job: MutableMapping[str, Any], originals: MutableMapping[str, Any]
+    ) -> bool:
+        if "class" in self.names:
+            return False
+        for key in job:
+            if key not in self.names and not _ignored_key(key):
+                return False
+        for name, check, default in self.fields:
+            original = originals.get(name)
+            remember = isinstance(original, (dict, list))
+            if remember and self._seen((name, id(original)), original):
+                continue
+            if not check(job.get(name, default)):
+                return False
+            if remember:
+                self._remember((name, id(original)), original)
+        return True
+
+    def validate(
+        self,
+        job: MutableMapping[str, Any],
+        originals: MutableMapping[str, Any],
+        logger: logging.Logger,
+    ) -> None:
+        """
+        Validate a job order, raising ValidationException if it is invalid.
+
+        job is the normalized copy of originals that is being validated.  Its
+        inputs whose original value is an object this validator accepted
+        before are not checked again.  Job orders the compiled checks don't
+        accept are validated with validate_ex, which gives the error
+        message, or logs the warnings for unknown fields.
+        """
+        if not self._check(job, originals):
+            validate_ex(self.schema, job, strict=False, logger=logger)
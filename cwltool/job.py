@@ -33,8 +33,6 @@ from typing import (
 
 import psutil
 import shellescape
-from prov.model import PROV
-from schema_salad.sourceline import SourceLine
 from schema_salad.utils import json_dump, json_dumps
 from typing_extensions import TYPE_CHECKING
 
@@ -46,6 +44,7 @@ from .loghandler import _logger
 from .pathmapper import MapperEnt, PathMapper
 from .process import stage_files
 from .secrets import SecretStore
+from .sourceline import SourceLine
 from .utils import (
     CWLObjectType,
     CWLOutputType,
@@ -153,6 +152,7 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
         }  # type: DirectoryType
         self.stagedir = None  # type: Optional[str]
         self.inplace_update = False
+        self.writable_staging = "reflink"  # type: str
         self.prov_obj = None  # type: Optional[ProvenanceProfile]
         self.parent_wf = None  # type: Optional[ProvenanceProfile]
         self.timelimit = None  # type: Optional[int]
@@ -163,6 +163,11 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
         """Represent this Job object."""
         return "CommandLineJob(%s)" % self.name
 
+    @property
+    def writable_copy_strategy(self) -> str:
+        """Give the strategy writable inputs are copied with, where they are."""
+        return "copy" if self.writable_staging == "copy" else "reflink"
+
     @abstractmethod
     def run(
         self,
@@ -414,6 +419,14 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
                 "runtimeContext.workflow_eval_lock must not be None"
             )
 
+        if runtimeContext.directory_index is not None:
+            # The steps after this one look for their inputs in what it wrote.
+            runtimeContext.directory_index.forget(self.outdir)
+            if self.inplace_update and self.generatemapper is not None:
+                for _, entry in self.generatemapper.items():
+                    if entry.type in ("WritableFile", "WritableDirectory"):
+                        runtimeContext.directory_index.forget(entry.resolved)
+
         if self.output_callback:
             with runtimeContext.workflow_eval_lock:
                 self.output_callback(outputs, processStatus)
@@ -542,6 +555,7 @@ class CommandLineJob(JobBase):
             ignore_writable=True,
             symlink=True,
             secret_store=runtimeContext.secret_store,
+            workers=runtimeContext.staging_workers,
         )
         if self.generatemapper is not None:
             stage_files(
@@ -549,6 +563,8 @@ class CommandLineJob(JobBase):
                 ignore_writable=self.inplace_update,
                 symlink=True,
                 secret_store=runtimeContext.secret_store,
+                workers=runtimeContext.staging_workers,
+                copy_strategy=self.writable_copy_strategy,
             )
             relink_initialworkdir(
                 self.generatemapper,
@@ -787,6 +803,8 @@ class ContainerCommandLineJob(JobBase, metaclass=ABCMeta):
                     and img_id is not None
                     and runtimeContext.process_run_id is not None
                 ):
+                    from prov.model import PROV
+
                     container_agent = self.prov_obj.document.agent(
                         uuid.uuid4().urn,
                         {
@@ -0,0 +1,586 @@
+"""
+Content-addressed store of CommandLineTool outputs, for --cachedir.
+
+The cache directory holds an SQLite index, which maps the key of each job
+to a manifest of the job's output directory, and the output files
+themselves, stored once under blobs/ and named by their SHA-1.  A hit
+rebuilds the output directory from the manifest, linking the files when
+possible.
+
+The index also records the size, last use and number of hits of each
+entry, so that the least recently (or least frequently) used entries can
+be evicted to keep the cache within a size or age limit.
+
+Runs work in directories of the cache directory, so that outputs can be
+linked to and from the blobs.  Their names start with the id of the
+process that made them, which holds locks/owner-<id> until it exits, so
+that the directories left over by processes that didn't finish can be
+told apart and reclaimed.
+"""
+
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple, cast
+
+from typing_extensions import TYPE_CHECKING
+
+from . import fingerprints
+from .file_copy import copy_file
+from .loghandler import _logger
+from .utils import shared_file_lock, try_exclusive_file_lock
+
+if TYPE_CHECKING:
+    from .cache_backends import CacheBackend
+
+# Bump whenever the layout of the index or of a manifest changes.
+CACHE_FORMAT = 2
+
+# What to evict first: the least recently used entries, or the least
+# frequently used ones.
+EVICTION_ORDER = {
+    "lru": "last_access, hits",
+    "lfu": "hits, last_access",
+}
+
+# Staging directories older than this are left over from crashed processes.
+STALE_STAGING = 24 * 60 * 60
+
+# The lock files held by the processes working in the cache directory.
+OWNER_PREFIX = "owner-"
+
+ManifestType = List[Dict[str, Any]]
+
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_size(text: str) -> int:
+    """Read a size in bytes, optionally with a K, M, G or T suffix."""
+    number = text.strip().upper()
+    if number.endswith("B"):
+        number = number[:-1]
+    unit = number[-1:] if number[-1:] in _SIZE_UNITS else ""
+    try:
+        size = float(number[: len(number) - len(unit)])
+    except ValueError:
+        raise ValueError("Invalid size %r" % text) from None
+    if size < 0:
+        raise ValueError("Invalid size %r" % text)
+    return int(size * _SIZE_UNITS[unit])
+
+
+_DIGEST = re.compile(r"^sha1\$[0-9a-f]{40}$")
+
+
+def check_manifest(manifest: Any) -> ManifestType:
+    """
+    Check that a manifest from elsewhere only describes its own directory.
+
+    Every path must be relative, normalized and not go up, nor through a
+    link, and every file must have a valid checksum; otherwise the whole
+    manifest is rejected with a ValueError.
+    """
+    if not isinstance(manifest, list):
+        raise ValueError("Invalid manifest: not a list")
+    links = set()
+    for entry in manifest:
+        if not isinstance(entry, dict) or entry.get("class") not in (
+            "File",
+            "Directory",
+            "Link",
+        ):
+            raise ValueError("Invalid manifest entry %r" % (entry,))
+        path = entry.get("path")
+        if (
+            not isinstance(path, str)
+            or os.path.isabs(path)
+            or os.path.normpath(path) != path
+            or path == os.curdir
+            or os.pardir in path.split(os.sep)
+        ):
+            raise ValueError("Invalid path in manifest: %r" % (path,))
+        if entry["class"] == "File":
+            if (
+                not isinstance(entry.get("checksum"), str)
+                or not _DIGEST.match(entry["checksum"])
+                or not isinstance(entry.get("size"), int)
+                or isinstance(entry["size"], bool)
+                or entry["size"] < 0
+                or not isinstance(entry.get("executable"), bool)
+            ):
+                raise ValueError("Invalid file in manifest: %r" % (entry,))
+        elif entry["class"] == "Link":
+            if not isinstance(entry.get("target"), str) or not entry["target"]:
+                raise ValueError("Invalid link in manifest: %r" % (entry,))
+            links.add(path)
+    for entry in manifest:
+        parent = os.path.dirname(entry["path"])
+        while parent:
+            if parent in links:
+                raise ValueError("Path through a link in manifest: %r" % entry["path"])
+            parent = os.path.dirname(parent)
+    return cast(ManifestType, manifest)
+
+
+def file_checksum(path: str) -> str:
+    """Give the SHA-1 of the contents of a file, as a CWL checksum."""
+    return "sha1$%s" % fingerprints.file_checksum(path)
+
+
+class JobCache:
+    """
+    Index and blob store of a --cachedir.
+
+    Entries are only ever added under the index's write lock, so they never
+    refer to blobs that are not there yet.  Jobs with the same key are run
+    one at a time: a lock file for each key is held while the job runs,
+    and shared while its outputs are read back.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Use (and create if needed) the given cache directory."""
+        self.directory = directory
+        self.blobs = os.path.join(directory, "blobs")
+        self.locks = os.path.join(directory, "locks")
+        self.index = os.path.join(directory, "index.sqlite")
+        self.owner = None  # type: Optional[str]
+        self._owner_lock = None  # type: Optional[TextIO]
+        self._owner_guard = threading.Lock()
+        for subdir in (self.blobs, self.locks):
+            os.makedirs(subdir, exist_ok=True)
+        with self._transaction() as db:
+            (version,) = db.execute("PRAGMA user_version").fetchone()
+            if version not in (0, 1, CACHE_FORMAT):
+                raise ValueError(
+                    "Job cache index %s has format %d, expected %d"
+                    % (self.index, version, CACHE_FORMAT)
+                )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "key TEXT PRIMARY KEY, manifest TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            if version < 2:
+                for column in ("size", "last_access", "hits"):
+                    db.execute(
+                        "ALTER TABLE jobs ADD COLUMN %s NOT NULL DEFAULT 0" % column
+                    )
+                db.execute(
+                    "CREATE TABLE blobs ("
+                    "checksum TEXT PRIMARY KEY, size INTEGER NOT NULL)"
+                )
+                db.execute(
+                    "CREATE TABLE job_blobs ("
+                    "key TEXT NOT NULL, checksum TEXT NOT NULL, "
+                    "PRIMARY KEY (key, checksum))"
+                )
+                db.execute("CREATE INDEX job_blobs_checksum ON job_blobs (checksum)")
+                rows = db.execute("SELECT key, manifest, created FROM jobs").fetchall()
+                for key, manifest, created in rows:
+                    self._add(db, key, json.loads(manifest), created)
+            db.execute("PRAGMA user_version = %d" % CACHE_FORMAT)
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Hold the write lock of the index, and commit what was done with it."""
+        db = sqlite3.connect(self.index, timeout=600, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def _blob(self, checksum: str) -> str:
+        digest = checksum.split("$", 1)[1]
+        return os.path.join(self.blobs, digest[:2], digest)
+
+    def lock(self, key: str) -> TextIO:
+        """Open the lock file of a key, and take a shared lock on it."""
+        lockfile = open(os.path.join(self.locks, key), "a+")
+        shared_file_lock(lockfile)
+        return lockfile
+
+    def work_prefix(self) -> str:
+        """
+        Give the path prefix of the directories this process works in.
+
+        The first call takes the owner lock of the process, which is kept
+        until it exits.
+        """
+        with self._owner_guard:
+            if self.owner is None:
+                owner = uuid.uuid4().hex[:16]
+                # Locked before it is in place, so that it is never taken
+                # for the lock of a process that exited.
+                lockfile = tempfile.NamedTemporaryFile(
+                    "a+", dir=self.locks, prefix="tmp", delete=False
+                )
+                shared_file_lock(lockfile)
+                os.replace(
+                    lockfile.name, os.path.join(self.locks, OWNER_PREFIX + owner)
+                )
+                self.owner, self._owner_lock = owner, cast(TextIO, lockfile)
+        return os.path.join(self.directory, self.owner + "-")
+
+    def mkdtemp(self, key: str) -> str:
+        """Make a directory of this process to restore or stage outputs in."""
+        prefix = os.path.basename(self.work_prefix()) + key + "-"
+        return tempfile.mkdtemp(prefix=prefix, dir=self.directory)
+
+    def _exited(self, owner: str) -> bool:
+        """Tell whether the process that made directories named owner-* exited."""
+        try:
+            lockfile = open(os.path.join(self.locks, OWNER_PREFIX + owner))
+        except FileNotFoundError:
+            return False
+        with lockfile:
+            return try_exclusive_file_lock(lockfile)
+
+    def reclaim(self) -> int:
+        """
+        Remove the directories left over by processes that exited.
+
+        Directories that no owner lock file was ever made for, from older
+        versions, are removed once they are STALE_STAGING old.  Gives the
+        bytes freed, which don't count files that are also blobs.
+        """
+        freed = 0
+        owners = {}  # type: Dict[str, bool]
+        for entry in os.scandir(self.directory):
+            if entry.name in ("blobs", "locks") or not entry.is_dir(
+                follow_symlinks=False
+            ):
+                continue
+            owner = entry.name.split("-", 1)[0]
+            if owner not in owners:
+                owners[owner] = self._exited(owner)
+            if not owners[owner] and (
+                os.path.exists(os.path.join(self.locks, OWNER_PREFIX + owner))
+                or entry.stat(follow_symlinks=False).st_mtime
+                > time.time() - STALE_STAGING
+            ):
+                continue
+            for root, _, files in os.walk(entry.path):
+                for name in files:
+                    st = os.lstat(os.path.join(root, name))
+                    if stat.S_ISREG(st.st_mode) and st.st_nlink == 1:
+                        freed += st.st_size
+            shutil.rmtree(entry.path, True)
+        return freed
+
+    def lookup(self, key: str, touch: bool = True) -> Optional[ManifestType]:
+        """
+        Give the manifest of the outputs of a job, if they were stored.
+
+        Unless touch is false, the entry counts as used.
+        """
+        db = sqlite3.connect(self.index, timeout=600, isolation_level=None)
+        try:
+            row = db.execute(
+                "SELECT manifest FROM jobs WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and touch:
+                db.execute(
+                    "UPDATE jobs SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                    (time.time(), key),
+                )
+        finally:
+            db.close()
+        if row is None:
+            return None
+        return cast(ManifestType, json.loads(row[0]))
+
+    def _add(
+        self, db: sqlite3.Connection, key: str, manifest: ManifestType, now: float
+    ) -> None:
+        self._drop(db, key)
+        files = {e["checksum"]: e["size"] for e in manifest if e["class"] == "File"}
+        db.executemany(
+            "INSERT OR IGNORE INTO blobs (checksum, size) VALUES (?, ?)", files.items()
+        )
+        db.executemany(
+            "INSERT INTO job_blobs (key, checksum) VALUES (?, ?)",
+            [(key, checksum) for checksum in files],
+        )
+        db.execute(
+            "INSERT INTO jobs (key, manifest, created, size, last_access, hits) "
+            "VALUES (?, ?, ?, ?, ?, 0)",
+            (key, json.dumps(manifest), now, sum(files.values()), now),
+        )
+
+    def _drop(self, db: sqlite3.Connection, key: str) -> Tuple[int, int]:
+        """
+        Forget a job, and delete the blobs only it used.
+
+        Gives the bytes of the blobs deleted, and the bytes that freed: a
+        blob still linked from a directory that a run works in stays on
+        disk until that directory goes.
+        """
+        checksums = [
+            checksum
+            for (checksum,) in db.execute(
+                "SELECT checksum FROM job_blobs WHERE key = ?", (key,)
+            )
+        ]
+        db.execute("DELETE FROM jobs WHERE key = ?", (key,))
+        db.execute("DELETE FROM job_blobs WHERE key = ?", (key,))
+        dropped = freed = 0
+        for checksum in checksums:
+            if db.execute(
+                "SELECT 1 FROM job_blobs WHERE checksum = ? LIMIT 1", (checksum,)
+            ).fetchone():
+                continue
+            (size,) = db.execute(
+                "SELECT size FROM blobs WHERE checksum = ?", (checksum,)
+            ).fetchone()
+            db.execute("DELETE FROM blobs WHERE checksum = ?", (checksum,))
+            with contextlib.suppress(FileNotFoundError):
+                blob = self._blob(checksum)
+                if os.stat(blob).st_nlink == 1:
+                    freed += size
+                os.unlink(blob)
+            dropped += size
+        return dropped, freed
+
+    def remove(self, key: str) -> None:
+        """Forget the outputs of a job."""
+        with self._transaction() as db:
+            self._drop(db, key)
+
+    def evict(
+        self,
+        max_size: Optional[int] = None,
+        max_age: Optional[float] = None,
+        order: str = "lru",
+    ) -> Dict[str, int]:
+        """
+        Remove entries until the cache is within the given limits.
+
+        max_size is in bytes, and max_age in days since the entry was last
+        used.  Entries being read or written by a job are skipped.  The
+        bytes freed are those that left the disk.
+        """
+        evicted = dropped = freed = 0
+        oldest = None  # type: Optional[float]
+        if max_age is not None:
+            oldest = time.time() - max_age * 24 * 60 * 60
+        with self._transaction() as db:
+            (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            rows = db.execute(
+                "SELECT key, last_access FROM jobs ORDER BY %s" % EVICTION_ORDER[order]
+            ).fetchall()
+            for key, last_access in rows:
+                if (max_size is None or total - dropped <= max_size) and (
+                    oldest is None or last_access >= oldest
+                ):
+                    continue
+                with open(os.path.join(self.locks, key), "a+") as lockfile:
+                    if not try_exclusive_file_lock(lockfile):
+                        continue
+                    sizes = self._drop(db, key)
+                    dropped += sizes[0]
+                    freed += sizes[1]
+                    evicted += 1
+            (entries,) = db.execute("SELECT COUNT(*) FROM jobs").fetchone()
+        if evicted:
+            _logger.info(
+                "Evicted %d entries (%d bytes) from the job cache in %s",
+                evicted,
+                freed,
+                self.directory,
+            )
+        return {
+            "evicted": evicted,
+            "freed": freed,
+            "entries": entries,
+            "size": total - dropped,
+        }
+
+    def collect_garbage(
+        self,
+        max_size: Optional[int] = None,
+        max_age: Optional[float] = None,
+        order: str = "lru",
+    ) -> Dict[str, int]:
+        """
+        Tidy up after processes that didn't finish, then evict entries.
+
+        Removes the directories that processes which exited left in the
+        cache directory, the blobs and lock files that no entry or process
+        uses any more, and stale staging directories.
+        """
+        reclaimed = self.reclaim()
+        stats = self.evict(max_size, max_age, order)
+        stats["freed"] += reclaimed
+        with self._transaction() as db:
+            known = {c for (c,) in db.execute("SELECT checksum FROM blobs")}
+            keys = {key for (key,) in db.execute("SELECT key FROM jobs")}
+            for entry in os.scandir(self.blobs):
+                if entry.name.startswith("tmp"):
+                    if entry.stat().st_mtime < time.time() - STALE_STAGING:
+                        shutil.rmtree(entry.path, True)
+                    continue
+                for blob in os.scandir(entry.path):
+                    if "sha1$" + blob.name not in known:
+                        stats["freed"] += blob.stat().st_size
+                        os.unlink(blob.path)
+            for entry in os.scandir(self.locks):
+                if entry.name in keys:
+                    continue
+                with open(entry.path, "a+") as lockfile:
+                    if try_exclusive_file_lock(lockfile):
+                        os.unlink(entry.path)
+        return stats
+
+    def _scan(self, outdir: str) -> Tuple[ManifestType, Dict[str, str]]:
+        """List an output directory, and the files to add to the blobs."""
+        manifest = []  # type: ManifestType
+        sources = {}  # type: Dict[str, str]
+        for root, dirs, files in os.walk(outdir):
+            dirs.sort()
+            for name in sorted(dirs + files):
+                path = os.path.join(root, name)
+                relpath = os.path.relpath(path, outdir)
+                st = os.lstat(path)
+                if stat.S_ISLNK(st.st_mode):
+                    target = os.readlink(path)
+                    if os.path.isabs(target) and (
+                        target == outdir or target.startswith(outdir + os.sep)
+                    ):
+                        target = os.path.relpath(target, root)
+                    manifest.append(
+                        {"path": relpath, "class": "Link", "target": target}
+                    )
+                    if name in dirs:
+                        dirs.remove(name)
+                elif stat.S_ISDIR(st.st_mode):
+                    manifest.append({"path": relpath, "class": "Directory"})
+                elif stat.S_ISREG(st.st_mode):
+                    checksum = file_checksum(path)
+                    manifest.append(
+                        {
+                            "path": relpath,
+                            "class": "File",
+                            "checksum": checksum,
+                            "size": st.st_size,
+                            "executable": bool(st.st_mode & stat.S_IXUSR),
+                        }
+                    )
+                    sources.setdefault(checksum, path)
+        return manifest, sources
+
+    def store(self, key: str, outdir: str) -> ManifestType:
+        """Add the outputs of a job to the cache."""
+        manifest, sources = self._scan(outdir)
+        staged = {}  # type: Dict[str, str]
+        tmpdir = tempfile.mkdtemp(prefix="tmp", dir=self.blobs)
+        try:
+            # Copying can take a while, so it is done before taking the
+            # write lock where possible.
+            for checksum, path in sources.items():
+                if not os.path.exists(self._blob(checksum)):
+                    staged[checksum] = os.path.join(tmpdir, checksum[5:])
+                    copy_file(path, staged[checksum], "link")
+            with self._transaction() as db:
+                for checksum, path in sources.items():
+                    blob = self._blob(checksum)
+                    if not os.path.exists(blob):
+                        if checksum not in staged:
+                            staged[checksum] = os.path.join(tmpdir, checksum[5:])
+                            copy_file(path, staged[checksum], "link")
+                        os.makedirs(os.path.dirname(blob), exist_ok=True)
+                        os.replace(staged[checksum], blob)
+                self._add(db, key, manifest, time.time())
+        finally:
+            shutil.rmtree(tmpdir, True)
+        return manifest
+
+    def _download(self, backend: "CacheBackend", checksum: str, path: str) -> bool:
+        """Fetch a file from a backend, checking that it is what was asked for."""
+        with open(path, "wb") as dst:
+            if not backend.get_blob(checksum, dst):
+                return False
+        digest = hashlib.sha1()  # nosec
+        with open(path, "rb") as src:
+            for contents in iter(lambda: src.read(1024 * 1024), b""):
+                digest.update(contents)
+        if "sha1$" + digest.hexdigest() != checksum:
+            raise OSError("Got corrupted %s from the remote cache" % checksum)
+        return True
+
+    def fetch(self, key: str, backend: "CacheBackend") -> Optional[ManifestType]:
+        """Add the entry of a job from a shared backend, if it has one."""
+        manifest = backend.get_manifest(key)
+        if manifest is None:
+            return None
+        check_manifest(manifest)
+        checksums = {e["checksum"] for e in manifest if e["class"] == "File"}
+        staged = {}  # type: Dict[str, str]
+        tmpdir = tempfile.mkdtemp(prefix="tmp", dir=self.blobs)
+        try:
+            for checksum in checksums:
+                if not os.path.exists(self._blob(checksum)):
+                    staged[checksum] = os.path.join(tmpdir, checksum[5:])
+                    if not self._download(backend, checksum, staged[checksum]):
+                        return None
+            with self._transaction() as db:
+                for checksum in checksums:
+                    blob = self._blob(checksum)
+                    if not os.path.exists(blob):
+                        if checksum not in staged:
+                            staged[checksum] = os.path.join(tmpdir, checksum[5:])
+                            if not self._download(backend, checksum, staged[checksum]):
+                                return None
+                        os.makedirs(os.path.dirname(blob), exist_ok=True)
+                        os.replace(staged[checksum], blob)
+                self._add(db, key, manifest, time.time())
+        finally:
+            shutil.rmtree(tmpdir, True)
+        return manifest
+
+    def publish(
+        self, key: str, manifest: ManifestType, backend: "CacheBackend"
+    ) -> None:
+        """Share the entry of a job through a backend, its files first."""
+        for checksum in sorted(
+            {e["checksum"] for e in manifest if e["class"] == "File"}
+        ):
+            if not backend.has_blob(checksum):
+                with open(self._blob(checksum), "rb") as src:
+                    backend.put_blob(checksum, src)
+        backend.put_manifest(key, manifest)
+
+    def materialize(self, manifest: ManifestType, outdir: str) -> None:
+        """Recreate the output directory of a job from its manifest."""
+        for entry in manifest:
+            path = os.path.join(outdir, entry["path"])
+            if entry["class"] == "Directory":
+                os.makedirs(path, exist_ok=True)
+            elif entry["class"] == "Link":
+                os.symlink(entry["target"], path)
+            else:
+                copy_file(self._blob(entry["checksum"]), path, "link")
+                if entry["executable"]:
+                    mode = os.stat(path).st_mode
+                    os.chmod(path, mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+@functools.lru_cache(maxsize=None)
+def job_cache(directory: str) -> JobCache:
+    """Open the cache in a directory once per process."""
+    _logger.debug("Using job cache in %s", directory)
+    return JobCache(directory)
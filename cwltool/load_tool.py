@@ -6,6 +6,8 @@ import os
 import re
 import urllib
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import (
     Any,
     Dict,
@@ -13,11 +15,14 @@ from typing import (
     MutableMapping,
     MutableSequence,
     Optional,
+    Set,
     Tuple,
     Union,
     cast,
 )
 
+import requests
+from cachecontrol.adapter import CacheControlAdapter
 from ruamel.yaml.comments import CommentedMap, CommentedSeq
 from schema_salad.exceptions import ValidationException
 from schema_salad.ref_resolver import Loader, file_uri
@@ -33,6 +38,7 @@ from schema_salad.utils import (
 
 from . import CWL_CONTENT_TYPES, process, update
 from .context import LoadingContext
+from .document_cache import DocumentCache, make_entry, record_fetches, restore_entry
 from .errors import WorkflowException
 from .loghandler import _logger
 from .process import Process, get_schema, shortname
@@ -357,7 +363,9 @@ def resolve_and_validate_document(
         )
         del jobobj["https://w3id.org/cwl/cwl#requirements"]
 
-    (sch_document_loader, avsc_names) = process.get_schema(cwlVersion)[:2]
+    (sch_document_loader, avsc_names) = process.get_schema(
+        cwlVersion, loadingContext.load_cache
+    )[:2]
 
     if isinstance(avsc_names, Exception):
         raise avsc_names
@@ -373,6 +381,41 @@ def resolve_and_validate_document(
         doc_cache=loadingContext.doc_cache,
     )
 
+    doc_cache = None  # type: Optional[DocumentCache]
+    cachekey = ""
+    if loadingContext.load_cache and not preprocess_only:
+        doc_cache = DocumentCache(loadingContext.load_cache)
+        cachekey = doc_cache.key(
+            uri,
+            {
+                "cwlVersion": cwlVersion,
+                "metadata": loadingContext.metadata,
+                "do_validate": loadingContext.do_validate,
+                "strict": loadingContext.strict,
+                "do_update": loadingContext.do_update,
+                "enable_dev": loadingContext.enable_dev,
+                "skip_schemas": skip_schemas,
+                "custom_schemas": process.custom_schemas.get(cwlVersion),
+            },
+        )
+        entry = doc_cache.load(cachekey)
+        if entry is not None:
+            _logger.debug("Loaded %s from the document cache", uri)
+            processobj, metadata, uri = restore_entry(document_loader, entry)
+            if isinstance(jobobj, CommentedMap):
+                loadingContext.jobdefaults = jobobj
+            loadingContext.loader = document_loader
+            loadingContext.avsc_names = avsc_names
+            loadingContext.metadata = metadata
+            return loadingContext, uri
+        fetched = record_fetches(document_loader)
+        fetched.add(fileuri)
+
+    if loadingContext.parallel_fetch > 1:
+        prefetch_documents(
+            document_loader, workflowobj, fileuri, loadingContext.parallel_fetch
+        )
+
     if cwlVersion == "v1.0":
         _add_blank_ids(workflowobj)
 
@@ -427,9 +470,89 @@ def resolve_and_validate_document(
             processobj, ("CommandLineTool", "Workflow", "ExpressionTool"), update_index
         )
 
+    if doc_cache is not None:
+        entry = make_entry(document_loader, processobj, metadata, uri, fetched)
+        if entry is not None:
+            doc_cache.store(cachekey, entry)
+
     return loadingContext, uri
 
 
+def _document_references(document: Any, base: str, loader: Loader) -> Set[str]:
+    """Find the documents referenced through run and $import."""
+    references = set()  # type: Set[str]
+
+    def walk(node: Any) -> None:
+        if isinstance(node, MutableMapping):
+            for key, value in node.items():
+                if key in ("run", "$import") and isinstance(value, str):
+                    references.add(
+                        urllib.parse.urldefrag(loader.fetcher.urljoin(base, value))[0]
+                    )
+                else:
+                    walk(value)
+        elif isinstance(node, MutableSequence):
+            for item in node:
+                walk(item)
+
+    walk(document)
+    return references
+
+
+def _pool_session(session: Optional[requests.Session], size: int) -> None:
+    """Allow size concurrent connections per host, keeping any HTTP cache."""
+    if session is None:
+        return
+    for prefix in ("http://", "https://"):
+        cache = getattr(session.adapters.get(prefix), "cache", None)
+        if cache is not None:
+            adapter = CacheControlAdapter(
+                cache=cache, pool_connections=size, pool_maxsize=size
+            )  # type: requests.adapters.HTTPAdapter
+        else:
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=size, pool_maxsize=size
+            )
+        session.mount(prefix, adapter)
+
+
+def _prefetch(loader: Loader, url: str) -> Optional[IdxResultType]:
+    if url in loader.idx:
+        return loader.idx[url]
+    try:
+        return loader.fetch(url, content_types=CWL_CONTENT_TYPES)
+    except Exception as err:  # pylint: disable=broad-except
+        # Reported (with context) when the document is actually resolved.
+        _logger.debug("Could not prefetch %s: %s", url, err)
+        return None
+
+
+def prefetch_documents(
+    loader: Loader, workflowobj: ResolveType, uri: str, workers: int
+) -> None:
+    """
+    Fetch every document reachable from workflowobj concurrently.
+
+    The reference graph is walked breadth first; each level is fetched
+    and parsed by a pool of workers into the loader index, so that the
+    (sequential) resolution that follows never waits on the network.
+    """
+    _pool_session(loader.session, workers)
+    seen = {urllib.parse.urldefrag(uri)[0]}
+    pending = _document_references(workflowobj, uri, loader) - seen
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending:
+            seen.update(pending)
+            urls = sorted(pending)
+            pending = set()
+            for url, document in zip(
+                urls, executor.map(partial(_prefetch, loader), urls)
+            ):
+                if document is not None:
+                    pending.update(_document_references(document, url, loader))
+            pending -= seen
+
+
 def make_tool(
     uri: Union[str, CommentedMap, CommentedSeq], loadingContext: LoadingContext
 ) -> Process:
@@ -5,8 +5,10 @@
 import argparse
 import functools
 import io
+import json
 import logging
 import os
+import re
 import signal
 import subprocess  # nosec
 import sys
@@ -32,8 +34,6 @@ from typing import (
     cast,
 )
 
-import argcomplete
-import coloredlogs
 import pkg_resources  # part of setuptools
 from ruamel import yaml
 from ruamel.yaml.comments import CommentedMap, CommentedSeq
@@ -46,9 +46,15 @@ from . import CWL_CONTENT_TYPES, workflow
 from .argparser import arg_parser, generate_parser, get_default_args
 from .builder import HasReqsHints
 from .context import LoadingContext, RuntimeContext, getdefault
-from .cwlrdf import printdot, printrdf
 from .errors import UnsupportedRequirement, WorkflowException
-from .executors import JobExecutor, MultithreadedJobExecutor, SingleJobExecutor
+from .executors import (
+    DryRunExecutor,
+    JobExecutor,
+    MultithreadedJobExecutor,
+    SingleJobExecutor,
+)
+from .incremental import IncrementalState
+from .job_cache import job_cache
 from .load_tool import (
     default_loader,
     fetch_document,
@@ -73,13 +79,8 @@ from .process import (
     use_standard_schema,
 )
 from .procgenerator import ProcessGenerator
-from .provenance import ResearchObject
 from .resolver import ga4gh_tool_registries, tool_resolver
 from .secrets import SecretStore
-from .software_requirements import (
-    DependenciesConfiguration,
-    get_container_from_software_requirements,
-)
 from .stdfsaccess import StdFsAccess
 from .subgraph import get_step, get_subgraph
 from .update import ALLUPDATES, UPDATES
@@ -88,8 +89,7 @@ from .utils import (
     CWLObjectType,
     CWLOutputAtomType,
     CWLOutputType,
-    adjustDirObjs,
-    normalizeFilesDirs,
+    normalizeFileDir,
     processes_to_kill,
     trim_listing,
     versionstring,
@@ -311,6 +311,89 @@ def generate_input_template(tool: Process) -> CWLObjectType:
     return template
 
 
+# Relative references that resolve to the base directory plus the reference.
+_SIMPLE_RELATIVE_REF = re.compile(r"^(?!.*(?://|/\.))[\w\-][\w\-./ +@=,~]*$")
+
+
+def _resolve_plain_job_order(job_order: Any, loader: Loader, base: str) -> bool:
+    """
+    Resolve the identifiers of a job order parsed without line tracking.
+
+    Does, in place, what resolving it with the job order loader would do to
+    a plain input object: expand prefixed keys and make path and location
+    fields absolute.  Returns False as soon as it finds something only the
+    full loader handles: ``$import``, ``$include``, ``$namespaces`` and
+    other directives, unknown prefixes, or nested identifiers.
+    """
+    base_dir = base.rsplit("/", 1)[0] + "/"
+    stack = [job_order]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            for key in list(value):
+                if key.startswith("$") or key == "id":
+                    return False
+                item = value[key]
+                if ":" in key:
+                    if key.split(":")[0] not in loader.vocab:
+                        return False
+                    del value[key]
+                    key = loader.expand_url(key, "", scoped_id=False, vocab_term=True)
+                    value[key] = item
+                if key in ("path", "location"):
+                    if not isinstance(item, str):
+                        return False
+                    if _SIMPLE_RELATIVE_REF.match(item):
+                        value[key] = base_dir + item
+                    else:
+                        value[key] = loader.expand_url(item, base)
+                elif isinstance(item, (dict, list)):
+                    stack.append(item)
+        elif isinstance(value, list):
+            stack.extend(v for v in value if isinstance(v, (dict, list)))
+    return True
+
+
+def load_plain_job_order(
+    job_order_file: str, loader: Loader
+) -> Optional[CWLObjectType]:
+    """
+    Load a local JSON or YAML job order without the full document loader.
+
+    Skips the line and comment tracking that makes very large input objects
+    slow to load.  Returns None if the file should be loaded by the full
+    loader instead, because it can't be parsed or uses any of the features
+    listed in :py:func:`_resolve_plain_job_order`.
+    """
+    if not os.path.isfile(job_order_file):
+        return None
+    uri = file_uri(os.path.abspath(job_order_file))
+    try:
+        with open(job_order_file, encoding="utf-8") as handle:
+            text = handle.read()
+        if text.lstrip().startswith("{"):
+            try:
+                parsed = json.loads(text)
+            except ValueError:
+                parsed = yaml.main.YAML(typ="safe").load(text)
+        else:
+            parsed = yaml.main.YAML(typ="safe").load(text)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    if not isinstance(parsed, MutableMapping):
+        return None
+    job_order_object = cast(CWLObjectType, parsed)
+    if not _resolve_plain_job_order(job_order_object, loader, uri):
+        return None
+    if "http://commonwl.org/cwltool#overrides" in job_order_object:
+        # Overrides are resolved by a loader that needs the line numbers.
+        return None
+    job_order_object["id"] = uri
+    # Like the documents it resolves itself, only read as a mapping.
+    loader.idx[uri] = cast(CommentedMap, job_order_object)
+    return job_order_object
+
+
 def load_job_order(
     args: argparse.Namespace,
     stdin: IO[Any],
@@ -343,11 +426,13 @@ def load_job_order(
             if args.basedir
             else os.path.abspath(os.path.dirname(job_order_file))
         )
-        job_order_object, _ = loader.resolve_ref(
-            job_order_file,
-            checklinks=False,
-            content_types=CWL_CONTENT_TYPES,
-        )
+        job_order_object = load_plain_job_order(job_order_file, loader)
+        if job_order_object is None:
+            job_order_object, _ = loader.resolve_ref(
+                job_order_file,
+                checklinks=False,
+                content_types=CWL_CONTENT_TYPES,
+            )
 
     if (
         job_order_object is not None
@@ -480,29 +565,26 @@ def init_job_order(
         )
         exit(0)
 
-    def path_to_loc(p: CWLObjectType) -> None:
-        if "location" not in p and "path" in p:
-            p["location"] = p["path"]
-            del p["path"]
-
     ns = {}  # type: ContextType
     ns.update(cast(ContextType, job_order_object.get("$namespaces", {})))
     ns.update(cast(ContextType, process.metadata.get("$namespaces", {})))
     ld = Loader(ns)
 
-    def expand_formats(p: CWLObjectType) -> None:
-        if "format" in p:
-            p["format"] = ld.expand_url(cast(str, p["format"]), "")
+    fs_access = make_fs_access(input_basedir)
 
-    visit_class(job_order_object, ("File", "Directory"), path_to_loc)
-    visit_class(
-        job_order_object,
-        ("File",),
-        functools.partial(add_sizes, make_fs_access(input_basedir)),
-    )
-    visit_class(job_order_object, ("File",), expand_formats)
-    adjustDirObjs(job_order_object, trim_listing)
-    normalizeFilesDirs(job_order_object)
+    def normalize(p: CWLObjectType) -> None:
+        if "location" not in p and "path" in p:
+            p["location"] = p["path"]
+            del p["path"]
+        if p["class"] == "File":
+            add_sizes(fs_access, p)
+            if "format" in p:
+                p["format"] = ld.expand_url(cast(str, p["format"]), "")
+        else:
+            trim_listing(cast(Dict[str, Any], p))
+        normalizeFileDir(cast(Dict[str, Any], p))
+
+    visit_class(job_order_object, ("File", "Directory"), normalize)
 
     if secret_store and secrets_req:
         secret_store.store(
@@ -638,7 +720,11 @@ def configure_logging(
         _logger.setLevel(logging.DEBUG)
         stderr_handler.setLevel(logging.DEBUG)
         rdflib_logger.setLevel(logging.DEBUG)
-    fmtclass = coloredlogs.ColoredFormatter if args.enable_color else logging.Formatter
+    fmtclass = logging.Formatter  # type: Callable[..., logging.Formatter]
+    if args.enable_color:
+        import coloredlogs
+
+        fmtclass = coloredlogs.ColoredFormatter
     formatter = fmtclass("%(levelname)s %(message)s")
     if args.timestamps:
         formatter = fmtclass(
@@ -695,6 +781,8 @@ def setup_provenance(
     if not args.compute_checksum:
         _logger.error("--provenance incompatible with --no-compute-checksum")
         return 1
+    from .provenance import ResearchObject
+
     ro = ResearchObject(
         getdefault(runtimeContext.make_fs_access, StdFsAccess)(""),
         temp_prefix_ro=args.tmpdir_prefix,
@@ -892,6 +980,8 @@ def main(
     if stderr_handler is not None:
         _logger.addHandler(stderr_handler)
     else:
+        import coloredlogs
+
         coloredlogs.install(logger=_logger, stream=stderr)
         stderr_handler = _logger.handlers[-1]
     workflowobj = None
@@ -904,7 +994,10 @@ def main(
             if "CWLTOOL_OPTIONS" in os.environ:
                 addl = os.environ["CWLTOOL_OPTIONS"].split(" ")
             parser = arg_parser()
-            argcomplete.autocomplete(parser)
+            if "_ARGCOMPLETE" in os.environ:
+                import argcomplete
+
+                argcomplete.autocomplete(parser)
             args = parser.parse_args(addl + argsl)
             if args.record_container_id:
                 if not args.cidfile_dir:
@@ -934,7 +1027,25 @@ def main(
             print("\n".join(supported_cwl_versions(args.enable_dev)))
             return 0
 
-        if not args.workflow:
+        if args.cache_gc:
+            if not args.cachedir:
+                _logger.error("--cache-gc needs --cachedir")
+                return 1
+            stats = job_cache(os.path.abspath(args.cachedir)).collect_garbage(
+                args.cache_max_size, args.cache_max_age, args.cache_eviction
+            )
+            stdout.write(json_dumps(stats, indent=4) + "\n")
+            return 0
+
+        if args.remote_cache and not args.cachedir:
+            _logger.error("--remote-cache needs --cachedir")
+            return 1
+
+        if args.dry_run and args.provenance:
+            _logger.error("--dry-run can't be used with --provenance")
+            return 1
+
+        if not args.workflow and not args.serve:
             if os.path.isfile("CWLFile"):
                 args.workflow = "CWLFile"
             else:
@@ -960,6 +1071,26 @@ def main(
 
         loadingContext = setup_loadingContext(loadingContext, runtimeContext, args)
 
+        if args.serve:
+            from .server import serve
+
+            runtimeContext.secret_store = getdefault(
+                runtimeContext.secret_store, SecretStore()
+            )
+            return serve(args, loadingContext, runtimeContext)
+
+        if args.validate:
+            from .bulk_validate import is_bulk_validation, validate_documents
+
+            paths = [args.workflow] + args.job_order
+            if is_bulk_validation(paths):
+                return validate_documents(
+                    paths,
+                    loadingContext,
+                    stdout,
+                    workers=(os.cpu_count() or 1) if args.parallel else 1,
+                )
+
         uri, tool_file_uri = resolve_tool_uri(
             args.workflow,
             resolver=loadingContext.resolver,
@@ -1034,12 +1165,16 @@ def main(
                 return 0
 
             if args.print_rdf:
+                from .cwlrdf import printrdf
+
                 stdout.write(
                     printrdf(tool, loadingContext.loader.ctx, args.rdf_serializer)
                 )
                 return 0
 
             if args.print_dot:
+                from .cwlrdf import printdot
+
                 printdot(tool, loadingContext.loader.ctx, stdout)
                 return 0
 
@@ -1118,7 +1253,10 @@ def main(
         if args.cachedir:
             if args.move_outputs == "move":
                 runtimeContext.move_outputs = "copy"
-            runtimeContext.tmp_outdir_prefix = args.cachedir
+            # Outputs are linked to and from the blobs of the job cache.
+            runtimeContext.tmp_outdir_prefix = job_cache(
+                cast(str, runtimeContext.cachedir)
+            ).work_prefix()
 
         runtimeContext.secret_store = getdefault(
             runtimeContext.secret_store, SecretStore()
@@ -1128,10 +1266,12 @@ def main(
         )
 
         if not executor:
-            if args.parallel:
+            if args.dry_run:
+                real_executor = DryRunExecutor()  # type: JobExecutor
+            elif args.parallel:
                 temp_executor = MultithreadedJobExecutor()
                 runtimeContext.select_resources = temp_executor.select_resources
-                real_executor = temp_executor  # type: JobExecutor
+                real_executor = temp_executor
             else:
                 real_executor = SingleJobExecutor()
         else:
@@ -1185,6 +1325,8 @@ def main(
             )  # str
 
             if conf_file or use_conda_dependencies:
+                from .software_requirements import DependenciesConfiguration
+
                 runtimeContext.job_script_provider = DependenciesConfiguration(args)
             else:
                 runtimeContext.find_default_container = functools.partial(
@@ -1193,10 +1335,16 @@ def main(
                     use_biocontainers=args.beta_use_biocontainers,
                 )
 
+            if args.incremental and not args.dry_run:
+                runtimeContext.incremental_state = IncrementalState(args.incremental)
+
             (out, status) = real_executor(
                 tool, initialized_job_order_object, runtimeContext, logger=_logger
             )
 
+            if runtimeContext.incremental_state is not None and status == "success":
+                runtimeContext.incremental_state.prune()
+
             if out is not None:
                 if runtimeContext.research_obj is not None:
                     runtimeContext.research_obj.create_job(out, True)
@@ -1318,6 +1466,8 @@ def find_default_container(
 ) -> Optional[str]:
     """Find a container."""
     if not default_container and use_biocontainers:
+        from .software_requirements import get_container_from_software_requirements
+
         default_container = get_container_from_software_requirements(
             use_biocontainers, builder
         )
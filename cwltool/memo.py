@@ -0,0 +1,339 @@
+"""
+Outputs of ExpressionTool and sub-Workflow steps, remembered in --cachedir.
+
+Only CommandLineTools have their outputs cached by themselves.  A step
+running an ExpressionTool or a Workflow is remembered as a whole, under a
+key made of the documents of the process and of everything it runs, its
+requirements, and its inputs with files reduced to their checksums.  A hit
+gives the outputs straight away, without evaluating the expression or
+expanding the sub-workflow.
+
+Output files in --cachedir, which is where the jobs of a run write theirs,
+are added to the job cache along with a cwl.output.json listing the
+outputs.  Other files, such as inputs an ExpressionTool passes through, are
+referred to where they are, and the entry is only used while they still
+have the same checksum.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple, cast
+
+from schema_salad.ref_resolver import file_uri, uri_file_path
+from schema_salad.utils import json_dumps
+
+from . import file_copy
+from .cache_backends import cache_backend
+from .context import RuntimeContext
+from .dry_run import PlannedJob, manifest_size, predict
+from .fingerprints import file_checksum
+from .job_cache import JobCache, ManifestType, job_cache
+from .loghandler import _logger
+from .process import Process
+from .utils import CWLObjectType, CWLOutputType, OutputCallbackType, visit_class
+
+# Bump whenever the key or the layout of an entry changes.
+MEMO_FORMAT = 2
+
+MEMOIZED = ("ExpressionTool", "Workflow")
+
+_digests = (
+    weakref.WeakKeyDictionary()
+)  # type: weakref.WeakKeyDictionary[Process, Tuple[str, bool]]
+
+
+def _reusable(process: Process) -> bool:
+    reuse, _ = process.get_requirement("WorkReuse")
+    return bool(reuse.get("enableReuse", True)) if reuse else True
+
+
+def process_digest(process: Process) -> Tuple[str, bool]:
+    """
+    Give a digest of a process and of everything it runs.
+
+    Also tells whether all of them allow their work to be reused.
+    """
+    if process not in _digests:
+        steps = {}  # type: Dict[str, str]
+        reusable = _reusable(process)
+        for step in getattr(process, "steps", []):
+            digest, step_reusable = process_digest(step.embedded_tool)
+            steps[step.id] = digest
+            reusable = reusable and step_reusable and _reusable(step)
+        digest = hashlib.sha1(  # nosec
+            json_dumps([process.tool, steps], sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        _digests[process] = (digest, reusable)
+    return _digests[process]
+
+
+def memoizable(process: Process, runtime_context: RuntimeContext) -> bool:
+    """Tell whether the outputs of a step running process may be remembered."""
+    return (
+        bool(runtime_context.cachedir)
+        and runtime_context.research_obj is None
+        and process.tool["class"] in MEMOIZED
+        and process_digest(process)[1]
+    )
+
+
+def _tree_digest(path: str) -> str:
+    entries = []  # type: List[Tuple[str, str]]
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            filepath = os.path.join(root, name)
+            entries.append((os.path.relpath(filepath, path), file_checksum(filepath)))
+    return hashlib.sha1(json.dumps(entries).encode("utf-8")).hexdigest()  # nosec
+
+
+def _local(location: Optional[CWLOutputType]) -> Optional[str]:
+    if isinstance(location, str) and location.startswith("file://"):
+        path = uri_file_path(location)  # type: str
+        return path
+    return None
+
+
+def _fingerprint(obj: CWLObjectType) -> None:
+    """Replace where a file is by what it holds."""
+    path = _local(obj.get("location"))
+    if path is not None:
+        if obj["class"] == "File":
+            obj["checksum"] = "sha1$" + file_checksum(path)
+        elif "listing" not in obj:
+            obj["tree"] = _tree_digest(path)
+        del obj["location"]
+    for field in ("path", "dirname"):
+        obj.pop(field, None)
+
+
+def effective_digest(process: Process, runtime_context: RuntimeContext) -> str:
+    """Give a digest of what process runs, with its requirements and container."""
+    keydict = {
+        "format": MEMO_FORMAT,
+        "process": process_digest(process)[0],
+        "requirements": process.requirements,
+        "hints": process.hints,
+        "container": runtime_context.default_container
+        if runtime_context.use_container
+        else None,
+    }
+    keydictstr = json_dumps(keydict, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha1(keydictstr.encode("utf-8")).hexdigest()  # nosec
+
+
+def inputs_digest(job_order: CWLObjectType) -> str:
+    """Give a digest of inputs, with files reduced to their checksums."""
+    inputs = copy.deepcopy(job_order)
+    visit_class(inputs, ("File", "Directory"), _fingerprint)
+    inputsstr = json_dumps(inputs, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha1(inputsstr.encode("utf-8")).hexdigest()  # nosec
+
+
+def memo_key(
+    process: Process, job_order: CWLObjectType, runtime_context: RuntimeContext
+) -> str:
+    """Give the key of the outputs of process run on job_order."""
+    keystr = json_dumps(
+        [effective_digest(process, runtime_context), inputs_digest(job_order)]
+    )
+    return hashlib.sha1(keystr.encode("utf-8")).hexdigest()  # nosec
+
+
+class MemoizedJob:
+    """Give the outputs of a step remembered from an earlier run."""
+
+    def __init__(
+        self,
+        name: str,
+        outputs: CWLObjectType,
+        output_callback: OutputCallbackType,
+        outdir: str,
+    ) -> None:
+        """Hold the outputs, restored in outdir."""
+        self.name = name
+        self.outputs = outputs
+        self.output_callback = output_callback
+        self.outdir = outdir
+        self.prov_obj = None  # type: Optional[Any]
+
+    def run(self, runtimeContext: RuntimeContext, tmpdir_lock: Any = None) -> None:
+        self.output_callback(self.outputs, "success")
+
+
+def _restore(outdir: str, obj: CWLObjectType) -> None:
+    location = obj.get("location")
+    if not isinstance(location, str) or location.startswith("_:"):
+        return
+    path = _local(location)
+    if path is None:
+        obj["location"] = file_uri(os.path.join(outdir, location))
+    elif obj["class"] == "File":
+        try:
+            changed = "sha1$" + file_checksum(path) != obj.get("checksum")
+        except OSError:
+            changed = True
+        if changed:
+            raise ValueError("%s has changed" % path)
+    elif not os.path.isdir(path):
+        raise ValueError("%s is gone" % path)
+
+
+def restore_outputs(outdir: str, outputs: CWLObjectType) -> None:
+    """
+    Make the locations of outputs stored in outdir absolute.
+
+    Raises ValueError if the files they refer to elsewhere have changed.
+    """
+    visit_class(outputs, ("File", "Directory"), lambda obj: _restore(outdir, obj))
+
+
+def _replay(
+    cache: JobCache,
+    key: str,
+    name: str,
+    manifest: ManifestType,
+    output_callback: OutputCallbackType,
+) -> MemoizedJob:
+    """Restore the outputs listed in a manifest."""
+    outdir = cache.mkdtemp(key)
+    try:
+        cache.materialize(manifest, outdir)
+        with open(os.path.join(outdir, "cwl.output.json")) as handle:
+            outputs = cast(CWLObjectType, json.load(handle))
+        restore_outputs(outdir, outputs)
+    except (OSError, ValueError):
+        shutil.rmtree(outdir, True)
+        raise
+    return MemoizedJob(name, outputs, output_callback, outdir)
+
+
+def recall(
+    key: str,
+    name: str,
+    output_callback: OutputCallbackType,
+    runtime_context: RuntimeContext,
+) -> Optional[MemoizedJob]:
+    """Give a job returning the remembered outputs of a step, if there are any."""
+    cache = job_cache(cast(str, runtime_context.cachedir))
+    manifest = cache.lookup(key)
+    if manifest is None and runtime_context.remote_cache:
+        try:
+            manifest = cache.fetch(key, cache_backend(runtime_context.remote_cache))
+        except (OSError, ValueError, sqlite3.Error) as err:
+            _logger.warning(
+                "[step %s] Could not fetch output from the remote cache: %s",
+                name,
+                err,
+            )
+    if manifest is None:
+        return None
+    try:
+        job = _replay(cache, key, name, manifest, output_callback)
+    except (OSError, ValueError) as err:
+        _logger.info("[step %s] Cached output is out of date, rerunning: %s", name, err)
+        cache.remove(key)
+        return None
+    _logger.info("[step %s] Using cached output in %s", name, job.outdir)
+    return job
+
+
+def plan(key: str, name: str, runtime_context: RuntimeContext) -> PlannedJob:
+    """Tell whether the outputs of a step are remembered, for --dry-run."""
+    status, manifest = predict(key, runtime_context)
+    if manifest is None:
+        return PlannedJob(name, status, key, None)
+    return PlannedJob(name, status, key, manifest_size(manifest))
+
+
+def stage_outputs(
+    outputs: CWLObjectType, staging: str, staged: Callable[[str], bool]
+) -> CWLObjectType:
+    """
+    Link the output files for which staged is true to staging.
+
+    Gives the outputs with the locations of those relative to staging, and
+    the others with their checksums.
+    """
+    outputs = copy.deepcopy(outputs)
+    roots = []  # type: List[Tuple[str, str]]
+
+    def _relocate(obj: CWLObjectType) -> None:
+        location = obj.get("location")
+        if not isinstance(location, str) or location.startswith("_:"):
+            return
+        path = _local(location)
+        if path is None:
+            raise ValueError("Can't cache outputs at %s" % location)
+        path = os.path.realpath(path)
+        for root, relpath in roots:
+            if path == root or path.startswith(root + os.sep):
+                obj["location"] = os.path.normpath(
+                    os.path.join(relpath, os.path.relpath(path, root))
+                )
+                break
+        else:
+            if staged(path):
+                relpath = os.path.join(str(len(roots)), os.path.basename(path))
+                dst = os.path.join(staging, relpath)
+                os.makedirs(os.path.dirname(dst))
+                if obj["class"] == "Directory":
+                    file_copy.copytree(path, dst, "link")
+                else:
+                    file_copy.copy2(path, dst, "link")
+                roots.append((path, relpath))
+                obj["location"] = relpath
+            else:
+                if obj["class"] == "File":
+                    obj["checksum"] = "sha1$" + file_checksum(path)
+                obj["location"] = file_uri(path)
+        for field in ("path", "dirname"):
+            obj.pop(field, None)
+
+    visit_class(outputs, ("File", "Directory"), _relocate)
+    return outputs
+
+
+def remember(
+    key: str,
+    name: str,
+    runtime_context: RuntimeContext,
+    output_callback: OutputCallbackType,
+    outputs: Optional[CWLObjectType],
+    process_status: str,
+) -> None:
+    """Store the outputs of a step that succeeded, then pass them on."""
+    if process_status == "success" and outputs is not None:
+        cache = job_cache(cast(str, runtime_context.cachedir))
+        staging = cache.mkdtemp(key)
+        try:
+            cachedir = os.path.realpath(cache.directory)
+            staged = stage_outputs(
+                outputs, staging, lambda path: path.startswith(cachedir + os.sep)
+            )
+            with open(os.path.join(staging, "cwl.output.json"), "w") as handle:
+                json.dump(staged, handle, indent=2, sort_keys=True)
+            manifest = cache.store(key, staging)
+            if runtime_context.remote_cache:
+                remote = cache_backend(runtime_context.remote_cache)
+                cache.publish(key, manifest, remote)
+            _logger.info("[step %s] Output cached", name)
+            if (
+                runtime_context.cache_max_size is not None
+                or runtime_context.cache_max_age is not None
+            ):
+                cache.evict(
+                    runtime_context.cache_max_size,
+                    runtime_context.cache_max_age,
+                    runtime_context.cache_eviction,
+                )
+        except (OSError, ValueError, sqlite3.Error) as err:
+            _logger.warning("[step %s] Could not cache output: %s", name, err)
+        finally:
+            shutil.rmtree(staging, True)
+    output_callback(outputs, process_status)
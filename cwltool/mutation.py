@@ -9,6 +9,14 @@ MutationState = namedtuple("MutationState", ["generation", "readers", "stepname"
 _generation = "http://commonwl.org/cwltool#generation"
 
 
+def reader_state(obj: CWLObjectType) -> CWLObjectType:
+    """Copy what release_reader needs to know of a File or Directory being read."""
+    state = {"location": obj["location"]}  # type: CWLObjectType
+    if _generation in obj:
+        state[_generation] = obj[_generation]
+    return state
+
+
 class MutationManager:
     """Lock manager for checking correctness of in-place update of files.
 
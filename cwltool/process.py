@@ -7,11 +7,15 @@ import json
 import logging
 import math
 import os
+import pickle  # nosec
 import shutil
 import stat
+import sys
+import tempfile
 import textwrap
 import urllib
 import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
 from os import scandir
 from typing import (
     Any,
@@ -31,11 +35,13 @@ from typing import (
     cast,
 )
 
+import pkg_resources
 from pkg_resources import resource_stream
 from rdflib import Graph
 from ruamel.yaml.comments import CommentedMap, CommentedSeq
 from schema_salad.avro.schema import (
     Names,
+    RecordSchema,
     Schema,
     SchemaParseException,
     make_avsc_object,
@@ -43,19 +49,26 @@ from schema_salad.avro.schema import (
 from schema_salad.exceptions import ValidationException
 from schema_salad.ref_resolver import Loader, file_uri, uri_file_path
 from schema_salad.schema import load_schema, make_avro_schema, make_valid_avro
-from schema_salad.sourceline import SourceLine, strip_dup_lineno
-from schema_salad.utils import convert_to_dict
+from schema_salad.sourceline import strip_dup_lineno
+from schema_salad.utils import convert_to_dict, json_dumps
 from schema_salad.validate import validate_ex
 from typing_extensions import TYPE_CHECKING
 
-from . import expression
+from . import file_copy
 from .builder import Builder, HasReqsHints
+from .command_line_template import CommandLineTemplate
 from .context import LoadingContext, RuntimeContext, getdefault
 from .errors import UnsupportedRequirement, WorkflowException
+from .file_copy import DEFAULT_STRATEGY
+from .fingerprints import file_checksum, local_path
+from .input_validator import InputValidator
 from .loghandler import _logger
 from .mpi import MPIRequirementName
 from .pathmapper import MapperEnt, PathMapper
+from .resource_request import ResourceTemplate
+from .resource_request import eval_resource as eval_resource  # for compatibility
 from .secrets import SecretStore
+from .sourceline import SourceLine, plain_copy
 from .stdfsaccess import StdFsAccess
 from .update import INTERNAL_VERSION
 from .utils import (
@@ -66,7 +79,6 @@ from .utils import (
     OutputCallbackType,
     adjustDirObjs,
     aslist,
-    cmp_like_py2,
     ensure_writable,
     get_listing,
     normalizeFilesDirs,
@@ -166,6 +178,23 @@ SCHEMA_ANY = None  # type: Optional[CWLObjectType]
 
 custom_schemas = {}  # type: Dict[str, Tuple[str, str]]
 
+# Avro names for File, Directory and Any, which every Process starts from.
+BASE_NAMES = None  # type: Optional[Names]
+
+# Schemas and requirement tuples shared between Process objects built from
+# the same tool with the same effective requirements and hints.
+INTERNED_PROCESSES = (
+    {}
+)  # type: Dict[str, Tuple[Names, MutableMapping[str, CWLObjectType], CWLObjectType, CWLObjectType, Tuple[CWLObjectType, ...], Tuple[CWLObjectType, ...]]]
+MAX_INTERNED_PROCESSES = 1024
+
+
+def copy_names(names: Names) -> Names:
+    """Copy a set of Avro names, so that new ones don't go in the original."""
+    copied = Names(names.default_namespace)
+    copied.names = dict(names.names)
+    return copied
+
 
 def use_standard_schema(version: str) -> None:
     if version in custom_schemas:
@@ -182,8 +211,15 @@ def use_custom_schema(version: str, name: str, text: str) -> None:
 
 def get_schema(
     version: str,
+    cachedir: Optional[str] = None,
 ) -> Tuple[Loader, Union[Names, SchemaParseException], CWLObjectType, Loader]:
+    """
+    Give the loader, names and metadata of the schema of a CWL version.
 
+    Compiled schemas are kept on disk only when asked to: in the "schemas"
+    directory of cachedir (the --load-cache directory), or else in
+    CWLTOOL_SCHEMA_CACHE_DIR, if either is set.
+    """
     if version in SCHEMA_CACHE:
         return SCHEMA_CACHE[version]
 
@@ -214,15 +250,121 @@ def get_schema(
 
     if version in custom_schemas:
         cache[custom_schemas[version][0]] = custom_schemas[version][1]
-        SCHEMA_CACHE[version] = load_schema(custom_schemas[version][0], cache=cache)
+        schema_ref = custom_schemas[version][0]
     else:
-        SCHEMA_CACHE[version] = load_schema(
-            "https://w3id.org/cwl/CommonWorkflowLanguage.yml", cache=cache
-        )
+        schema_ref = "https://w3id.org/cwl/CommonWorkflowLanguage.yml"
+
+    if cachedir:
+        directory = os.path.join(cachedir, "schemas")  # type: Optional[str]
+    else:
+        directory = os.environ.get("CWLTOOL_SCHEMA_CACHE_DIR")
+    cachefile = _schema_cache_file(directory, schema_ref, cache) if directory else None
+    schema = (
+        None
+    )  # type: Optional[Tuple[Loader, Union[Names, SchemaParseException], CWLObjectType, Loader]]
+    if cachefile is not None:
+        schema = _load_compiled_schema(cachefile, cache)
+    if schema is None:
+        schema = load_schema(schema_ref, cache=cache)
+        if cachefile is not None:
+            _store_compiled_schema(cachefile, schema)
+    SCHEMA_CACHE[version] = schema
 
     return SCHEMA_CACHE[version]
 
 
+def _schema_cache_file(
+    directory: str, schema_ref: str, cache: Dict[str, Union[str, Graph, bool]]
+) -> str:
+    """
+    Choose the file of directory a compiled schema is stored in.
+
+    The name is derived from the cwltool, schema-salad and Python versions
+    and the text of every schema document, so editing a schema or
+    upgrading either package never picks up a stale file.
+    """
+    checksum = hashlib.sha256()
+    for dist in ("cwltool", "schema-salad"):
+        try:
+            checksum.update(pkg_resources.get_distribution(dist).version.encode())
+        except pkg_resources.DistributionNotFound:
+            pass
+    checksum.update(repr(sys.version_info[:2]).encode())
+    checksum.update(schema_ref.encode("utf-8"))
+    for url in sorted(cache):
+        text = cache[url]
+        if isinstance(text, str):
+            checksum.update(url.encode("utf-8"))
+            checksum.update(text.encode("utf-8"))
+    return os.path.join(directory, checksum.hexdigest() + ".pickle")
+
+
+def _load_compiled_schema(
+    cachefile: str, cache: Dict[str, Union[str, Graph, bool]]
+) -> Optional[Tuple[Loader, Names, CWLObjectType, Loader]]:
+    """Rebuild the result of load_schema from a compiled schema file."""
+    try:
+        with open(cachefile, "rb") as handle:
+            ctx, avsc_names, metadata, meta_ctx, meta_idx = pickle.load(handle)  # nosec
+    except FileNotFoundError:
+        return None
+    except Exception as err:  # pylint: disable=broad-except
+        _logger.debug("Ignoring unreadable schema cache %s: %s", cachefile, err)
+        return None
+    document_loader = Loader(ctx, cache=cache)
+    metaschema_loader = Loader(meta_ctx, cache=dict(cache))
+    metaschema_loader.idx.update(meta_idx)
+    return document_loader, avsc_names, metadata, metaschema_loader
+
+
+def _store_compiled_schema(
+    cachefile: str,
+    schema: Tuple[Loader, Union[Names, SchemaParseException], CWLObjectType, Loader],
+) -> None:
+    document_loader, avsc_names, metadata, metaschema_loader = schema
+    if not isinstance(avsc_names, Names):
+        return
+    try:
+        os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(cachefile), suffix=".tmp")
+        with os.fdopen(fd, "wb") as handle:
+            pickle.dump(
+                (
+                    document_loader.ctx,
+                    avsc_names,
+                    metadata,
+                    metaschema_loader.ctx,
+                    dict(metaschema_loader.idx),
+                ),
+                handle,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp, cachefile)
+    except Exception as err:  # pylint: disable=broad-except
+        _logger.debug("Could not write schema cache %s: %s", cachefile, err)
+
+
+def _intern_key(
+    tool: CWLObjectType,
+    requirements: List[CWLObjectType],
+    hints: List[CWLObjectType],
+) -> str:
+    """Identify a tool and its effective requirements for interning."""
+    return hashlib.sha1(  # nosec
+        json_dumps(
+            [
+                tool["id"],
+                tool.get("inputs"),
+                tool.get("outputs"),
+                requirements,
+                hints,
+            ],
+            sort_keys=True,
+            default=str,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
 def shortname(inputid: str) -> str:
     d = urllib.parse.urlparse(inputid)
     if d.fragment:
@@ -251,6 +393,83 @@ def checkRequirements(
             checkRequirements(entry2, supported_process_requirements)
 
 
+def _stage_entry(
+    entry: MapperEnt,
+    stage_func: Optional[Callable[[str, str], None]],
+    ignore_writable: bool,
+    symlink: bool,
+    secret_store: Optional[SecretStore],
+    copy_strategy: str,
+) -> bool:
+    """Link, copy or create one file; tell whether it was created in place."""
+    if entry.type in ("File", "Directory") and os.path.exists(entry.resolved):
+        if symlink:  # Use symlink func if allowed
+            os.symlink(entry.resolved, entry.target)
+        elif stage_func is not None:
+            stage_func(entry.resolved, entry.target)
+    elif (
+        entry.type == "Directory"
+        and not os.path.exists(entry.target)
+        and entry.resolved.startswith("_:")
+    ):
+        os.makedirs(entry.target)
+    elif entry.type == "WritableFile" and not ignore_writable:
+        file_copy.writable_copy(entry.resolved, entry.target, copy_strategy)
+    elif entry.type == "WritableDirectory" and not ignore_writable:
+        if entry.resolved.startswith("_:"):
+            os.makedirs(entry.target)
+        else:
+            file_copy.writable_copy(entry.resolved, entry.target, copy_strategy)
+    elif entry.type == "CreateFile" or entry.type == "CreateWritableFile":
+        with open(entry.target, "wb") as new:
+            if secret_store is not None:
+                new.write(
+                    cast(str, secret_store.retrieve(entry.resolved)).encode("utf-8")
+                )
+            else:
+                new.write(entry.resolved.encode("utf-8"))
+        if entry.type == "CreateFile":
+            os.chmod(entry.target, stat.S_IRUSR)  # Read only
+        else:  # it is a "CreateWritableFile"
+            ensure_writable(entry.target)
+        return True
+    return False
+
+
+def _stage_run(
+    stage: Callable[[MapperEnt], bool], entries: List[Tuple[str, MapperEnt]]
+) -> List[bool]:
+    return [stage(entry) for _, entry in entries]
+
+
+def _staging_rounds(targets: List[str]) -> List[List[int]]:
+    """
+    Group the targets so that each comes after those it is staged into.
+
+    A target inside another, or the same as an earlier one, goes in a later
+    round; the targets of a round can be staged in any order.
+    """
+    indexes = {}  # type: Dict[str, List[int]]
+    for index, target in enumerate(targets):
+        indexes.setdefault(target, []).append(index)
+    rounds = [0] * len(targets)
+    # Targets with fewer components first, so that enclosing ones are done.
+    for index in sorted(
+        range(len(targets)), key=lambda i: (targets[i].count(os.sep), i)
+    ):
+        target = targets[index]
+        before = [i for i in indexes[target] if i < index]
+        parent = os.path.dirname(target)
+        while parent != target:
+            before.extend(indexes.get(parent, []))
+            target, parent = parent, os.path.dirname(parent)
+        rounds[index] = max((rounds[i] + 1 for i in before), default=0)
+    grouped = [[] for _ in range(max(rounds, default=-1) + 1)]  # type: List[List[int]]
+    for index, round_ in enumerate(rounds):
+        grouped[round_].append(index)
+    return grouped
+
+
 def stage_files(
     pathmapper: PathMapper,
     stage_func: Optional[Callable[[str, str], None]] = None,
@@ -258,8 +477,18 @@ def stage_files(
     symlink: bool = True,
     secret_store: Optional[SecretStore] = None,
     fix_conflicts: bool = False,
+    workers: int = 1,
+    copy_strategy: str = file_copy.DEFAULT_STRATEGY,
 ) -> None:
-    """Link or copy files to their targets. Create them as needed."""
+    """
+    Link or copy files to their targets. Create them as needed.
+
+    The directories the targets go in are made first, then up to workers
+    files are staged at a time.  Files staged inside others are staged
+    after them, and the first error in the order of the path mapper is the
+    one raised.  Writable files and directories are copied with the given
+    strategy, which never hardlinks.
+    """
     targets = {}  # type: Dict[str, MapperEnt]
     for key, entry in pathmapper.items():
         if "File" not in entry.type:
@@ -284,44 +513,36 @@ def stage_files(
                     % (targets[entry.target].resolved, entry.resolved, entry.target)
                 )
 
-    for key, entry in pathmapper.items():
-        if not entry.staged:
-            continue
-        if not os.path.exists(os.path.dirname(entry.target)):
-            os.makedirs(os.path.dirname(entry.target))
-        if entry.type in ("File", "Directory") and os.path.exists(entry.resolved):
-            if symlink:  # Use symlink func if allowed
-                os.symlink(entry.resolved, entry.target)
-            elif stage_func is not None:
-                stage_func(entry.resolved, entry.target)
-        elif (
-            entry.type == "Directory"
-            and not os.path.exists(entry.target)
-            and entry.resolved.startswith("_:")
-        ):
-            os.makedirs(entry.target)
-        elif entry.type == "WritableFile" and not ignore_writable:
-            shutil.copy(entry.resolved, entry.target)
-            ensure_writable(entry.target)
-        elif entry.type == "WritableDirectory" and not ignore_writable:
-            if entry.resolved.startswith("_:"):
-                os.makedirs(entry.target)
+    staged = [(key, entry) for key, entry in pathmapper.items() if entry.staged]
+    stage = functools.partial(
+        _stage_entry,
+        stage_func=stage_func,
+        ignore_writable=ignore_writable,
+        symlink=symlink,
+        secret_store=secret_store,
+        copy_strategy=copy_strategy,
+    )
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for round_ in _staging_rounds([entry.target for _, entry in staged]):
+            entries = [staged[i] for i in round_]
+            for dirname in sorted({os.path.dirname(e.target) for _, e in entries}):
+                if not os.path.exists(dirname):
+                    os.makedirs(dirname)
+            # Each worker stages a run of consecutive entries, so the first
+            # error of the first run that has one is the first error overall.
+            size = -(-len(entries) // max(workers, 1))
+            runs = [entries[i : i + size] for i in range(0, len(entries), size)]
+            if len(runs) > 1:
+                futures = [executor.submit(_stage_run, stage, run) for run in runs]
+                wait(futures)
+                created = [flag for future in futures for flag in future.result()]
             else:
-                shutil.copytree(entry.resolved, entry.target)
-                ensure_writable(entry.target)
-        elif entry.type == "CreateFile" or entry.type == "CreateWritableFile":
-            with open(entry.target, "wb") as new:
-                if secret_store is not None:
-                    new.write(
-                        cast(str, secret_store.retrieve(entry.resolved)).encode("utf-8")
+                created = [flag for run in runs for flag in _stage_run(stage, run)]
+            for (key, entry), in_place in zip(entries, created):
+                if in_place:
+                    pathmapper.update(
+                        key, entry.target, entry.target, entry.type, entry.staged
                     )
-                else:
-                    new.write(entry.resolved.encode("utf-8"))
-            if entry.type == "CreateFile":
-                os.chmod(entry.target, stat.S_IRUSR)  # Read only
-            else:  # it is a "CreateWritableFile"
-                ensure_writable(entry.target)
-            pathmapper.update(key, entry.target, entry.target, entry.type, entry.staged)
 
 
 def relocateOutputs(
@@ -332,6 +553,7 @@ def relocateOutputs(
     fs_access: StdFsAccess,
     compute_checksum: bool = True,
     path_mapper: Type[PathMapper] = PathMapper,
+    copy_strategy: str = DEFAULT_STRATEGY,
 ) -> CWLObjectType:
     adjustDirObjs(outputObj, functools.partial(get_listing, fs_access, recursive=True))
 
@@ -370,7 +592,7 @@ def relocateOutputs(
                 for dir_entry in scandir(src):
                     _relocate(dir_entry.path, fs_access.join(dst, dir_entry.name))
             else:
-                shutil.move(src, dst)
+                file_copy.move(src, dst, copy_strategy)
 
         elif _action == "copy":
             _logger.debug("Copying %s to %s", src, dst)
@@ -379,9 +601,9 @@ def relocateOutputs(
                     shutil.rmtree(dst)
                 elif os.path.isfile(dst):
                     os.unlink(dst)
-                shutil.copytree(src, dst)
+                file_copy.copytree(src, dst, copy_strategy)
             else:
-                shutil.copy2(src, dst)
+                file_copy.copy2(src, dst, copy_strategy)
 
     def _realpath(
         ob: CWLObjectType,
@@ -531,21 +753,6 @@ def var_spool_cwl_detector(
     return r
 
 
-def eval_resource(
-    builder: Builder, resource_req: Union[str, int, float]
-) -> Optional[Union[str, int, float]]:
-    if isinstance(resource_req, str) and expression.needs_parsing(resource_req):
-        result = builder.do_eval(resource_req)
-        if isinstance(result, (str, int)) or result is None:
-            return result
-        raise WorkflowException(
-            "Got incorrect return type {} from resource expression evaluation of {}.".format(
-                type(result), resource_req
-            )
-        )
-    return resource_req
-
-
 # Threshold where the "too many files" warning kicks in
 FILE_COUNT_WARNING = 5000
 
@@ -575,9 +782,8 @@ class Process(HasReqsHints, metaclass=abc.ABCMeta):
                 SCHEMA_CACHE["v1.0"][3].idx["https://w3id.org/cwl/cwl#Directory"],
             )
 
-        self.names = make_avro_schema([SCHEMA_FILE, SCHEMA_DIR, SCHEMA_ANY], Loader({}))
         self.tool = toolpath_object
-        self.requirements = copy.deepcopy(getdefault(loadingContext.requirements, []))
+        self.requirements = plain_copy(getdefault(loadingContext.requirements, []))
         tool_requirements = self.tool.get("requirements", [])
         if tool_requirements is None:
             raise ValidationException(
@@ -597,7 +803,7 @@ class Process(HasReqsHints, metaclass=abc.ABCMeta):
                 ).get("requirements", []),
             )
         )
-        self.hints = copy.deepcopy(getdefault(loadingContext.hints, []))
+        self.hints = plain_copy(getdefault(loadingContext.hints, []))
         tool_hints = self.tool.get("hints", [])
         if tool_hints is None:
             raise ValidationException(
@@ -607,13 +813,27 @@ class Process(HasReqsHints, metaclass=abc.ABCMeta):
                 )
             )
         self.hints.extend(tool_hints)
-        # Versions of requirements and hints which aren't mutated.
-        self.original_requirements = copy.deepcopy(self.requirements)
-        self.original_hints = copy.deepcopy(self.hints)
+        intern_key = _intern_key(self.tool, self.requirements, self.hints)
+        interned = INTERNED_PROCESSES.get(intern_key)
+        if interned is None:
+            # Versions of requirements and hints which aren't mutated, and
+            # as they may be shared with other Processes, can't be.
+            self.original_requirements = tuple(
+                plain_copy(self.requirements)
+            )  # type: Tuple[CWLObjectType, ...]
+            self.original_hints = tuple(
+                plain_copy(self.hints)
+            )  # type: Tuple[CWLObjectType, ...]
+        else:
+            self.original_requirements = interned[4]
+            self.original_hints = interned[5]
         self.doc_loader = loadingContext.loader
         self.doc_schema = loadingContext.avsc_names
 
         self.formatgraph = None  # type: Optional[Graph]
+        self.input_validator = None  # type: Optional[InputValidator]
+        self.command_line_template = None  # type: Optional[CommandLineTemplate]
+        self.resource_template = None  # type: Optional[ResourceTemplate]
         if self.doc_loader is not None:
             self.formatgraph = self.doc_loader.graph
 
@@ -624,7 +844,92 @@ class Process(HasReqsHints, metaclass=abc.ABCMeta):
             strict=getdefault(loadingContext.strict, False),
         )
 
-        self.schemaDefs = {}  # type: MutableMapping[str, CWLObjectType]
+        if interned is not None:
+            (
+                self.names,
+                self.schemaDefs,
+                self.inputs_record_schema,
+                self.outputs_record_schema,
+            ) = interned[:4]
+            sd, _ = self.get_requirement("SchemaDefRequirement")
+            if sd is not None:
+                avroize_type(cast(MutableSequence[CWLOutputType], sd["types"]))
+        else:
+            self._make_schemas(toolpath_object)
+            if len(INTERNED_PROCESSES) >= MAX_INTERNED_PROCESSES:
+                INTERNED_PROCESSES.clear()
+            INTERNED_PROCESSES[intern_key] = (
+                self.names,
+                self.schemaDefs,
+                self.inputs_record_schema,
+                self.outputs_record_schema,
+                self.original_requirements,
+                self.original_hints,
+            )
+
+        if toolpath_object.get("class") is not None and not getdefault(
+            loadingContext.disable_js_validation, False
+        ):
+            validate_js_options = (
+                None
+            )  # type: Optional[Dict[str, Union[List[str], str, int]]]
+            if loadingContext.js_hint_options_file is not None:
+                try:
+                    with open(loadingContext.js_hint_options_file) as options_file:
+                        validate_js_options = json.load(options_file)
+                except (OSError, ValueError):
+                    _logger.error(
+                        "Failed to read options file %s",
+                        loadingContext.js_hint_options_file,
+                    )
+                    raise
+            if self.doc_schema is not None:
+                validate_js_expressions(
+                    toolpath_object,
+                    self.doc_schema.names[toolpath_object["class"]],
+                    validate_js_options,
+                )
+
+        dockerReq, is_req = self.get_requirement("DockerRequirement")
+
+        if (
+            dockerReq is not None
+            and "dockerOutputDirectory" in dockerReq
+            and is_req is not None
+            and not is_req
+        ):
+            _logger.warning(
+                SourceLine(item=dockerReq, raise_type=str).makeError(
+                    "When 'dockerOutputDirectory' is declared, DockerRequirement "
+                    "should go in the 'requirements' section, not 'hints'."
+                    ""
+                )
+            )
+
+        if (
+            dockerReq is not None
+            and is_req is not None
+            and dockerReq.get("dockerOutputDirectory") == "/var/spool/cwl"
+        ):
+            if is_req:
+                # In this specific case, it is legal to have /var/spool/cwl, so skip the check.
+                pass
+            else:
+                # Must be a requirement
+                var_spool_cwl_detector(self.tool)
+        else:
+            var_spool_cwl_detector(self.tool)
+
+    def _make_schemas(self, toolpath_object: CommentedMap) -> None:
+        """Build the Avro schemas for the inputs, outputs and SchemaDefRequirement."""
+        global BASE_NAMES  # pylint: disable=global-statement
+        if BASE_NAMES is None:
+            BASE_NAMES = make_avro_schema(
+                [SCHEMA_FILE, SCHEMA_DIR, SCHEMA_ANY], Loader({})
+            )
+        self.names = copy_names(BASE_NAMES)
+
+        self.schemaDefs = {}
 
         sd, _ = self.get_requirement("SchemaDefRequirement")
 
@@ -636,8 +941,8 @@ class Process(HasReqsHints, metaclass=abc.ABCMeta):
                 {cast(str, t["name"]): cast(Dict[str, Any], t) for t in sdtypes},
                 set(),
             )
-            for i in av:
-                self.schemaDefs[i["name"]] = i  # type: ignore
+            for i in cast(List[CWLObjectType], av):
+                self.schemaDefs[cast(str, i["name"])] = i
             make_avsc_object(convert_to_dict(av), self.names)
 
         # Build record schema from inputs
@@ -645,16 +950,16 @@ class Process(HasReqsHints, metaclass=abc.ABCMeta):
             "name": "input_record_schema",
             "type": "record",
             "fields": [],
-        }  # type: CWLObjectType
+        }
         self.outputs_record_schema = {
             "name": "outputs_record_schema",
             "type": "record",
             "fields": [],
-        }  # type: CWLObjectType
+        }
 
         for key in ("inputs", "outputs"):
             for i in self.tool[key]:
-                c = copy.deepcopy(i)
+                c = plain_copy(i)
                 c["name"] = shortname(c["id"])
                 del c["id"]
 
@@ -692,59 +997,6 @@ class Process(HasReqsHints, metaclass=abc.ABCMeta):
             )
             make_avsc_object(convert_to_dict(self.outputs_record_schema), self.names)
 
-        if toolpath_object.get("class") is not None and not getdefault(
-            loadingContext.disable_js_validation, False
-        ):
-            validate_js_options = (
-                None
-            )  # type: Optional[Dict[str, Union[List[str], str, int]]]
-            if loadingContext.js_hint_options_file is not None:
-                try:
-                    with open(loadingContext.js_hint_options_file) as options_file:
-                        validate_js_options = json.load(options_file)
-                except (OSError, ValueError):
-                    _logger.error(
-                        "Failed to read options file %s",
-                        loadingContext.js_hint_options_file,
-                    )
-                    raise
-            if self.doc_schema is not None:
-                validate_js_expressions(
-                    toolpath_object,
-                    self.doc_schema.names[toolpath_object["class"]],
-                    validate_js_options,
-                )
-
-        dockerReq, is_req = self.get_requirement("DockerRequirement")
-
-        if (
-            dockerReq is not None
-            and "dockerOutputDirectory" in dockerReq
-            and is_req is not None
-            and not is_req
-        ):
-            _logger.warning(
-                SourceLine(item=dockerReq, raise_type=str).makeError(
-                    "When 'dockerOutputDirectory' is declared, DockerRequirement "
-                    "should go in the 'requirements' section, not 'hints'."
-                    ""
-                )
-            )
-
-        if (
-            dockerReq is not None
-            and is_req is not None
-            and dockerReq.get("dockerOutputDirectory") == "/var/spool/cwl"
-        ):
-            if is_req:
-                # In this specific case, it is legal to have /var/spool/cwl, so skip the check.
-                pass
-            else:
-                # Must be a requirement
-                var_spool_cwl_detector(self.tool)
-        else:
-            var_spool_cwl_detector(self.tool)
-
     def _init_job(
         self, joborder: CWLObjectType, runtime_context: RuntimeContext
     ) -> Builder:
@@ -755,7 +1007,7 @@ class Process(HasReqsHints, metaclass=abc.ABCMeta):
                 % (self.metadata.get("cwlVersion"), INTERNAL_VERSION)
             )
 
-        job = copy.deepcopy(joborder)
+        job = plain_copy(joborder)
 
         make_fs_access = getdefault(runtime_context.make_fs_access, StdFsAccess)
         fs_access = make_fs_access(runtime_context.basedir)
@@ -778,7 +1030,12 @@ class Process(HasReqsHints, metaclass=abc.ABCMeta):
                 raise WorkflowException(
                     "Missing input record schema: " "{}".format(self.names)
                 )
-            validate_ex(schema, job, strict=False, logger=_logger_validation_warnings)
+            if (
+                self.input_validator is None
+                or self.input_validator.schema is not schema
+            ):
+                self.input_validator = InputValidator(cast(RecordSchema, schema))
+            self.input_validator.validate(job, joborder, _logger_validation_warnings)
 
             if load_listing and load_listing != "no_listing":
                 get_listing(fs_access, job, recursive=(load_listing == "deep_listing"))
@@ -826,7 +1083,7 @@ hints:
             raise WorkflowException("Invalid job input record:\n" + str(err)) from err
 
         files = []  # type: List[CWLObjectType]
-        bindings = CommentedSeq()
+        bindings = []  # type: List[CWLObjectType]
         outdir = ""
         tmpdir = ""
         stagedir = ""
@@ -870,7 +1127,8 @@ hints:
             files,
             bindings,
             self.schemaDefs,
-            self.names,
+            # Shared with identical Processes; the builder adds to its own.
+            copy_names(self.names),
             self.requirements,
             self.hints,
             {},
@@ -889,61 +1147,22 @@ hints:
             stagedir,
             cwl_version,
         )
+        builder.directory_index = runtime_context.directory_index
 
         bindings.extend(
-            builder.bind_input(
-                self.inputs_record_schema,
-                job,
-                discover_secondaryFiles=getdefault(runtime_context.toplevel, False),
+            cast(
+                List[CWLObjectType],
+                builder.bind_input(
+                    self.inputs_record_schema,
+                    job,
+                    discover_secondaryFiles=getdefault(runtime_context.toplevel, False),
+                ),
             )
         )
 
-        if self.tool.get("baseCommand"):
-            for index, command in enumerate(aslist(self.tool["baseCommand"])):
-                bindings.append({"position": [-1000000, index], "datum": command})
-
-        if self.tool.get("arguments"):
-            for i, arg in enumerate(self.tool["arguments"]):
-                lc = self.tool["arguments"].lc.data[i]
-                filename = self.tool["arguments"].lc.filename
-                bindings.lc.add_kv_line_col(len(bindings), lc)
-                if isinstance(arg, MutableMapping):
-                    arg = copy.deepcopy(arg)
-                    if arg.get("position"):
-                        position = arg.get("position")
-                        if isinstance(position, str):  # no need to test the
-                            # CWLVersion as the v1.0
-                            # schema only allows ints
-                            position = builder.do_eval(position)
-                            if position is None:
-                                position = 0
-                        arg["position"] = [position, i]
-                    else:
-                        arg["position"] = [0, i]
-                    bindings.append(arg)
-                elif ("$(" in arg) or ("${" in arg):
-                    cm = CommentedMap((("position", [0, i]), ("valueFrom", arg)))
-                    cm.lc.add_kv_line_col("valueFrom", lc)
-                    cm.lc.filename = filename
-                    bindings.append(cm)
-                else:
-                    cm = CommentedMap((("position", [0, i]), ("datum", arg)))
-                    cm.lc.add_kv_line_col("datum", lc)
-                    cm.lc.filename = filename
-                    bindings.append(cm)
-
-        # use python2 like sorting of heterogeneous lists
-        # (containing str and int types),
-        key = functools.cmp_to_key(cmp_like_py2)
-
-        # This awkward construction replaces the contents of
-        # "bindings" in place (because Builder expects it to be
-        # mutated in place, sigh, I'm sorry) with its contents sorted,
-        # supporting different versions of Python and ruamel.yaml with
-        # different behaviors/bugs in CommentedSeq.
-        bindings_copy = copy.deepcopy(bindings)
-        del bindings[:]
-        bindings.extend(sorted(bindings_copy, key=key))
+        if self.command_line_template is None:
+            self.command_line_template = CommandLineTemplate(self.tool)
+        self.command_line_template.add_bindings(builder, bindings)
 
         if self.tool["class"] != "Workflow":
             builder.resources = self.evalResources(builder, runtime_context)
@@ -953,49 +1172,21 @@ hints:
         self, builder: Builder, runtimeContext: RuntimeContext
     ) -> Dict[str, Union[int, float, str]]:
         resourceReq, _ = self.get_requirement("ResourceRequirement")
-        if resourceReq is None:
-            resourceReq = {}
-        cwl_version = self.metadata.get(
-            "http://commonwl.org/cwltool#original_cwlVersion", None
-        )
-        if cwl_version == "v1.0":
-            ram = 1024
-        else:
-            ram = 256
-        request: Dict[str, Union[int, float, str]] = {
-            "coresMin": 1,
-            "coresMax": 1,
-            "ramMin": ram,
-            "ramMax": ram,
-            "tmpdirMin": 1024,
-            "tmpdirMax": 1024,
-            "outdirMin": 1024,
-            "outdirMax": 1024,
-        }
-        for a in ("cores", "ram", "tmpdir", "outdir"):
-            mn = mx = None  # type: Optional[Union[int, float]]
-            if resourceReq.get(a + "Min"):
-                mn = cast(
-                    Union[int, float],
-                    eval_resource(
-                        builder, cast(Union[str, int, float], resourceReq[a + "Min"])
-                    ),
-                )
-            if resourceReq.get(a + "Max"):
-                mx = cast(
-                    Union[int, float],
-                    eval_resource(
-                        builder, cast(Union[str, int, float], resourceReq[a + "Max"])
-                    ),
-                )
-            if mn is None:
-                mn = mx
-            elif mx is None:
-                mx = mn
-
-            if mn is not None:
-                request[a + "Min"] = mn
-                request[a + "Max"] = cast(Union[int, float], mx)
+        jsReq, _ = self.get_requirement("InlineJavascriptRequirement")
+        if (
+            self.resource_template is None
+            or self.resource_template.resource_req is not resourceReq
+            or self.resource_template.js_req is not jsReq
+        ):
+            cwl_version = self.metadata.get(
+                "http://commonwl.org/cwltool#original_cwlVersion", None
+            )
+            if cwl_version == "v1.0":
+                ram = 1024
+            else:
+                ram = 256
+            self.resource_template = ResourceTemplate(resourceReq, jsReq, ram)
+        request = self.resource_template.resources(builder)
 
         if runtimeContext.select_resources is not None:
             return runtimeContext.select_resources(request, runtimeContext)
@@ -1293,8 +1484,13 @@ def scandeps(
 
 def compute_checksums(fs_access: StdFsAccess, fileobj: CWLObjectType) -> None:
     if "checksum" not in fileobj:
-        checksum = hashlib.sha1()  # nosec
         location = cast(str, fileobj["location"])
+        path = local_path(fs_access, location)
+        if path is not None:
+            fileobj["checksum"] = "sha1$%s" % file_checksum(path)
+            fileobj["size"] = fs_access.size(location)
+            return
+        checksum = hashlib.sha1()  # nosec
         with fs_access.open(location, "rb") as f:
             contents = f.read(1024 * 1024)
             while contents != b"":
@@ -8,6 +8,7 @@ import pwd
 import re
 import shutil
 import tempfile
+import time
 import uuid
 from array import array
 from collections import OrderedDict
@@ -36,6 +37,7 @@ from prov.model import PROV, ProvDocument
 from schema_salad.utils import json_dumps
 from typing_extensions import TYPE_CHECKING, TypedDict
 
+from .fingerprints import fingerprints
 from .loghandler import _logger
 from .provenance_constants import (
     ACCOUNT_UUID,
@@ -1027,7 +1029,12 @@ def checksum_copy(
     """Compute checksums while copying a file."""
     # TODO: Use hashlib.new(Hasher_str) instead?
     checksum = hasher()
-    contents = src_file.read(buffersize)
+    try:
+        st = os.fstat(src_file.fileno())  # type: Optional[os.stat_result]
+        if src_file.tell() != 0:
+            st = None
+    except (AttributeError, OSError, ValueError):
+        st = None
     if dst_file and hasattr(dst_file, "name") and hasattr(src_file, "name"):
         temp_location = os.path.join(os.path.dirname(dst_file.name), str(uuid.uuid4()))
         try:
@@ -1039,6 +1046,12 @@ def checksum_copy(
             pass
         if os.path.exists(temp_location):
             os.rename(temp_location, dst_file.name)  # type: ignore
+    if dst_file is None and st is not None:
+        known = fingerprints().lookup(st, checksum.name)
+        if known is not None:
+            return known
+    hashed_at = time.time()
+    contents = src_file.read(buffersize)
     while contents != b"":
         if dst_file is not None:
             dst_file.write(contents)
@@ -1046,4 +1059,9 @@ def checksum_copy(
         contents = src_file.read(buffersize)
     if dst_file is not None:
         dst_file.flush()
-    return checksum.hexdigest().lower()
+    digest = checksum.hexdigest().lower()
+    if st is not None:
+        after = os.fstat(src_file.fileno())
+        if (after.st_size, after.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+            fingerprints().record(st, checksum.name, digest, hashed_at)
+    return digest
@@ -14,6 +14,7 @@ from schema_salad.sourceline import SourceLine
 from typing_extensions import TYPE_CHECKING
 
 from .errors import WorkflowException
+from .fingerprints import fingerprints, local_path
 from .job import CommandLineJob, JobBase
 from .loghandler import _logger
 from .process import Process, shortname
@@ -310,6 +311,15 @@ class ProvenanceProfile:
             if method == SHA1 and self.research_object.has_data_file(checksum):
                 entity = self.document.entity("data:" + checksum)
 
+        if not entity and "checksum" not in value and "location" in value:
+            # A local file hashed before may already be in the RO
+            path = local_path(self.fsaccess, str(value["location"]))
+            known = fingerprints().known(path) if path is not None else None
+            if known is not None and self.research_object.has_data_file(known):
+                checksum = known
+                entity = self.document.entity("data:" + checksum)
+                value["checksum"] = f"{SHA1}${checksum}"
+
         if not entity and "location" in value:
             location = str(value["location"])
             # If we made it here, we'll have to add it to the RO
@@ -0,0 +1,175 @@
+"""
+The resources a tool requests for each of its jobs.
+
+A ResourceRequirement is usually made of literals, or of expressions that
+only look at a few inputs, which a scatter passes unchanged to every job.
+The literals are read once per tool, and the result of each expression is
+remembered along with the values of the inputs it refers to, so that it is
+only evaluated again when those change.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
+
+from schema_salad.utils import json_dumps
+from typing_extensions import TYPE_CHECKING
+
+from . import expression
+from .errors import WorkflowException
+from .utils import CWLObjectType
+
+if TYPE_CHECKING:
+    from .builder import Builder
+
+# How many evaluated expressions each tool remembers.
+EVALUATED_RESOURCES = 64
+
+RESOURCES = ("cores", "ram", "tmpdir", "outdir")
+
+# References to a single input, as inputs.name, inputs['name'] or inputs["name"].
+_INPUT_REFERENCE = re.compile(
+    r"""\binputs(?:\s*\.\s*([A-Za-z_$][\w$]*)|\s*\[\s*(['"])([^'"\\]*)\2\s*\])"""
+)
+_INPUTS = re.compile(r"\binputs\b")
+# Anything else an expression may depend on that differs between jobs.
+_NOT_REMEMBERED = re.compile(r"\b(?:runtime|this|eval|Function|Date)\b|Math\.random")
+
+
+def eval_resource(
+    builder: "Builder", resource_req: Union[str, int, float]
+) -> Optional[Union[str, int, float]]:
+    if isinstance(resource_req, str) and expression.needs_parsing(resource_req):
+        result = builder.do_eval(resource_req)
+        if isinstance(result, (str, int)) or result is None:
+            return result
+        raise WorkflowException(
+            "Got incorrect return type {} from resource expression evaluation of {}.".format(
+                type(result), resource_req
+            )
+        )
+    return resource_req
+
+
+def referenced_inputs(expr: str) -> Optional[Tuple[str, ...]]:
+    """
+    List the inputs an expression refers to.
+
+    Returns None if its result may depend on anything else.
+    """
+    if _NOT_REMEMBERED.search(expr):
+        return None
+    references = _INPUT_REFERENCE.findall(expr)
+    if len(references) != len(_INPUTS.findall(expr)):
+        return None
+    return tuple(sorted({name or quoted for name, _, quoted in references}))
+
+
+class ResourceTemplate:
+    """The analysed ResourceRequirement of a tool."""
+
+    def __init__(
+        self,
+        resource_req: Optional[CWLObjectType],
+        js_req: Optional[CWLObjectType],
+        ram: int,
+    ) -> None:
+        """Read the literal requests, and find the inputs expressions refer to."""
+        self.resource_req = resource_req
+        self.js_req = js_req
+        self.request = {
+            "coresMin": 1,
+            "coresMax": 1,
+            "ramMin": ram,
+            "ramMax": ram,
+            "tmpdirMin": 1024,
+            "tmpdirMax": 1024,
+            "outdirMin": 1024,
+            "outdirMax": 1024,
+        }  # type: Dict[str, Union[int, float, str]]
+        # The literal values, and the expressions with the inputs they refer
+        # to, or None if they can't be remembered.
+        self.static = {}  # type: Dict[str, Union[int, float, str]]
+        self.dynamic = []  # type: List[Tuple[str, str, Optional[Tuple[str, ...]]]]
+        remember = not (js_req and js_req.get("expressionLib"))
+        for a in RESOURCES:
+            for key in (a + "Min", a + "Max"):
+                value = (resource_req or {}).get(key)
+                if not value:
+                    continue
+                if isinstance(value, str) and expression.needs_parsing(value):
+                    references = referenced_inputs(value) if remember else None
+                    self.dynamic.append((key, value, references))
+                else:
+                    self.static[key] = cast(Union[int, float, str], value)
+        if not self.dynamic:
+            self.request = self._clamped(self.static)
+        self.evaluated = (
+            OrderedDict()
+        )  # type: OrderedDict[Tuple[str, str], Optional[Union[str, int, float]]]
+        self.lock = threading.Lock()
+
+    def _clamped(
+        self, values: MutableMapping[str, Any]
+    ) -> Dict[str, Union[int, float, str]]:
+        request = dict(self.request)
+        for a in RESOURCES:
+            mn = values.get(a + "Min")  # type: Optional[Union[int, float]]
+            mx = values.get(a + "Max")  # type: Optional[Union[int, float]]
+            if mn is None:
+                mn = mx
+            elif mx is None:
+                mx = mn
+
+            if mn is not None:
+                request[a + "Min"] = mn
+                request[a + "Max"] = cast(Union[int, float], mx)
+        return request
+
+    def _evaluate(
+        self, builder: "Builder", expr: str, references: Optional[Tuple[str, ...]]
+    ) -> Optional[Union[str, int, float]]:
+        if references is None:
+            return eval_resource(builder, expr)
+        try:
+            key = (
+                expr,
+                json_dumps(
+                    [
+                        [name in builder.job, builder.job.get(name)]
+                        for name in references
+                    ],
+                    sort_keys=True,
+                ),
+            )
+        except (TypeError, ValueError):
+            return eval_resource(builder, expr)
+        with self.lock:
+            if key in self.evaluated:
+                self.evaluated.move_to_end(key)
+                return self.evaluated[key]
+        result = eval_resource(builder, expr)
+        with self.lock:
+            self.evaluated[key] = result
+            while len(self.evaluated) > EVALUATED_RESOURCES:
+                self.evaluated.popitem(last=False)
+        return result
+
+    def resources(self, builder: "Builder") -> Dict[str, Union[int, float, str]]:
+        """Give the minimum and maximum of each resource requested by a job."""
+        if not self.dynamic:
+            return dict(self.request)
+        values = dict(self.static)  # type: Dict[str, Any]
+        for key, expr, references in self.dynamic:
+            values[key] = self._evaluate(builder, expr, references)
+        return self._clamped(values)
@@ -0,0 +1,434 @@
+"""
+Long-lived cwltool server.
+
+Keeps one warm process, with compiled schemas, loaded tools and the
+per-thread Node.js processes used for expressions, and accepts run
+submissions over a small JSON HTTP API, on TCP or a Unix socket.
+
+Anyone who can submit runs can run any command as the server's user, so
+the server listens on localhost unless told otherwise, and every request
+must carry ``Authorization: Bearer <token>``.  The token is taken from
+CWLTOOL_SERVE_TOKEN, or made up and logged when the server starts.
+
+``POST /runs``
+    Submit ``{"tool": URI or path, "job_order": {...}}``, optionally with
+    ``"basedir"`` (for relative input paths) and ``"outdir"``, which must
+    both be inside ``--serve-root``.  Replies ``202 {"id": ...}``.
+    Without ``"outdir"``, the outputs go in a directory named after the
+    id, inside ``--outdir``.
+
+``GET /runs/<id>``
+    The run's current state: ``{"id", "status", "output", "error"}``.
+
+``GET /runs/<id>/events``
+    Streams the run's state changes as JSON lines until it finishes.
+
+Finished runs are forgotten after ``--serve-run-ttl`` seconds, and the
+oldest of them as soon as there are more than ``--serve-max-runs``.
+"""
+
+import argparse
+import hmac
+import json
+import os
+import secrets
+import socketserver
+import sys
+import threading
+import time
+import urllib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, List, Optional, Tuple, cast
+
+from schema_salad.ref_resolver import Loader, file_uri
+from schema_salad.sourceline import cmap
+from schema_salad.utils import json_dumps
+
+from .context import LoadingContext, RuntimeContext
+from .document_cache import DependencyType, dependencies, dependency_unchanged
+from .executors import SingleJobExecutor
+from .load_tool import (
+    default_loader,
+    fetch_document,
+    jobloaderctx,
+    make_tool,
+    resolve_and_validate_document,
+    resolve_tool_uri,
+)
+from .loghandler import _logger
+from .process import Process
+from .utils import CWLObjectType
+
+FINISHED = ("success", "permanentFail", "temporaryFail", "error")
+
+
+class Run:
+    """One submitted run and its state changes."""
+
+    def __init__(self, tool: str, job_order: CWLObjectType, basedir: str) -> None:
+        """Record a new submission."""
+        self.id = str(uuid.uuid4())
+        self.tool = tool
+        self.job_order = job_order
+        self.basedir = basedir
+        self.outdir = None  # type: Optional[str]
+        self.status = "queued"
+        self.finished = None  # type: Optional[float]
+        self.output = None  # type: Optional[CWLObjectType]
+        self.error = None  # type: Optional[str]
+        self.events = []  # type: List[Dict[str, Any]]
+        self.changed = threading.Condition()
+        self._event()
+
+    def state(self) -> Dict[str, Any]:
+        """Give the state reported to clients."""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "output": self.output,
+            "error": self.error,
+        }
+
+    def _event(self) -> None:
+        with self.changed:
+            self.events.append(self.state())
+            self.changed.notify_all()
+
+    def update(
+        self,
+        status: str,
+        output: Optional[CWLObjectType] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Change the status of the run, and tell those waiting for it."""
+        self.status = status
+        self.output = output
+        self.error = error
+        if status in FINISHED:
+            self.finished = time.monotonic()
+        self._event()
+
+
+class CWLServer:
+    """Loads tools once and runs submitted jobs on a shared thread pool."""
+
+    def __init__(
+        self,
+        loadingContext: LoadingContext,
+        runtimeContext: RuntimeContext,
+        workers: int,
+        run_ttl: float = 3600.0,
+        max_runs: int = 1000,
+        root: Optional[str] = None,
+    ) -> None:
+        """Prepare an idle server, for runs in root (the current directory)."""
+        self.loadingContext = loadingContext
+        self.runtimeContext = runtimeContext
+        self.root = os.path.realpath(root or os.getcwd())
+        self.run_ttl = run_ttl
+        self.max_runs = max_runs
+        # Threads are reused between runs, and with them the Node.js
+        # processes that cwltool.sandboxjs keeps per thread.
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.tools = (
+            {}
+        )  # type: Dict[str, Tuple[Optional[List[DependencyType]], Process]]
+        self.tools_lock = threading.Lock()
+        self.runs = {}  # type: Dict[str, Run]
+        self.runs_lock = threading.Lock()
+
+    def load(self, tool: str) -> Process:
+        """
+        Load a tool, reusing an earlier load while its files are unchanged.
+
+        Tools loaded from anywhere but local files are loaded only once.
+        Different tools are loaded concurrently.
+        """
+        requested, _ = resolve_tool_uri(
+            tool,
+            resolver=self.loadingContext.resolver,
+            fetcher_constructor=self.loadingContext.fetcher_constructor,
+        )
+        with self.tools_lock:
+            cached = self.tools.get(requested)
+        if cached is not None and all(
+            dependency_unchanged(dep) for dep in cached[0] or []
+        ):
+            return cached[1]
+        loadingContext = self.loadingContext.copy()
+        loadingContext.loader = default_loader(
+            loadingContext.fetcher_constructor,
+            enable_dev=loadingContext.enable_dev,
+            doc_cache=loadingContext.doc_cache,
+        )
+        loadingContext.overrides_list = list(loadingContext.overrides_list)
+        loadingContext, workflowobj, uri = fetch_document(requested, loadingContext)
+        loadingContext, uri = resolve_and_validate_document(
+            loadingContext, workflowobj, uri
+        )
+        process = make_tool(uri, loadingContext)
+        if loadingContext.loader is not None:
+            deps = dependencies(k for k in loadingContext.loader.idx if "#" not in k)
+            with self.tools_lock:
+                self.tools[requested] = (deps, process)
+        return process
+
+    def prune(self) -> None:
+        """Forget the runs that finished too long ago, or above the limit."""
+        now = time.monotonic()
+        with self.runs_lock:
+            finished = sorted(
+                (run for run in self.runs.values() if run.finished is not None),
+                key=lambda run: cast(float, run.finished),
+            )
+            excess = len(self.runs) - self.max_runs
+            for index, run in enumerate(finished):
+                if index < excess or now - cast(float, run.finished) > self.run_ttl:
+                    del self.runs[run.id]
+
+    def confine(self, path: str) -> str:
+        """
+        Resolve a path given by a client, relative to the root.
+
+        Raises ValueError if it is outside of the root.
+        """
+        resolved = os.path.realpath(os.path.join(self.root, path))
+        if resolved != self.root and not resolved.startswith(
+            os.path.join(self.root, "")
+        ):
+            raise ValueError(f"{path} is outside of {self.root}")
+        return resolved
+
+    def submit(
+        self,
+        tool: str,
+        job_order: CWLObjectType,
+        basedir: Optional[str] = None,
+        outdir: Optional[str] = None,
+    ) -> Run:
+        """
+        Queue a run on the shared pool.
+
+        Raises ValueError if basedir or outdir are outside of the root.
+        """
+        run = Run(tool, job_order, self.confine(basedir or self.root))
+        run.outdir = self.confine(outdir) if outdir else None
+        with self.runs_lock:
+            self.runs[run.id] = run
+        self.prune()
+        self.pool.submit(self._execute, run)
+        return run
+
+    def _execute(self, run: Run) -> None:
+        from .main import init_job_order
+
+        try:
+            run.update("loading")
+            process = self.load(run.tool)
+            loader = Loader(jobloaderctx.copy())
+            job_order, _ = loader.resolve_all(
+                cmap(cast(Dict[str, Any], run.job_order)), file_uri(run.basedir) + "/"
+            )
+            runtimeContext = self.runtimeContext.copy()
+            runtimeContext.basedir = run.basedir
+            # Runs without an outdir of their own get one, so that runs
+            # with outputs of the same names don't overwrite each other's.
+            runtimeContext.outdir = run.outdir or os.path.join(
+                os.path.abspath(self.runtimeContext.outdir or ""), run.id
+            )
+            initialized = init_job_order(
+                cast(CWLObjectType, job_order),
+                argparse.Namespace(workflow=run.tool, job_order=[]),
+                process,
+                loader,
+                sys.stdout,
+                make_fs_access=runtimeContext.make_fs_access,
+                input_basedir=run.basedir,
+                secret_store=runtimeContext.secret_store,
+            )
+            run.update("running")
+            output, status = SingleJobExecutor()(
+                process, initialized, runtimeContext, logger=_logger
+            )
+            run.update(status, output=output)
+        except Exception as err:  # pylint: disable=broad-except
+            _logger.debug("Run %s failed", run.id, exc_info=True)
+            run.update("error", error=str(err))
+
+    def wait(self, run_id: str, timeout: Optional[float] = None) -> Run:
+        """Block until a run has finished."""
+        with self.runs_lock:
+            run = self.runs[run_id]
+        with run.changed:
+            run.changed.wait_for(lambda: run.status in FINISHED, timeout)
+        return run
+
+    def shutdown(self) -> None:
+        """Wait for the runs in progress, and stop the thread pool."""
+        self.pool.shutdown(wait=True)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """JSON API in front of a CWLServer."""
+
+    server_version = "cwltool"
+    cwl_server = None  # type: CWLServer
+    token = ""
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Log requests at the debug level rather than to stderr."""
+        _logger.debug("[server] " + format, *args)
+
+    def _reply(self, code: int, body: Any) -> None:
+        data = json_dumps(body, indent=4).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self) -> bool:
+        """Check the token of the request, and reply 401 if it is wrong."""
+        header = self.headers.get("Authorization", "")
+        if hmac.compare_digest(
+            header.encode("utf-8"), f"Bearer {self.token}".encode("utf-8")
+        ):
+            return True
+        self.send_response(401)
+        self.send_header("WWW-Authenticate", "Bearer")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return False
+
+    def _run(self, run_id: str) -> Optional[Run]:
+        with self.cwl_server.runs_lock:
+            run = self.cwl_server.runs.get(run_id)
+        if run is None:
+            self._reply(404, {"error": f"No such run {run_id}"})
+        return run
+
+    def do_POST(self) -> None:
+        """Submit a run."""
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") != "/runs":
+            self._reply(404, {"error": f"Not found: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length).decode("utf-8"))
+            tool = body["tool"]
+            job_order = body.get("job_order", {})
+        except (ValueError, KeyError, TypeError) as err:
+            self._reply(400, {"error": f"Invalid submission: {err}"})
+            return
+        try:
+            run = self.cwl_server.submit(
+                tool, job_order, body.get("basedir"), body.get("outdir")
+            )
+        except ValueError as err:
+            self._reply(403, {"error": str(err)})
+            return
+        self._reply(202, {"id": run.id})
+
+    def do_GET(self) -> None:
+        """Give the state or the events of a run."""
+        if not self._authorized():
+            return
+        parts = [p for p in urllib.parse.urlsplit(self.path).path.split("/") if p]
+        if len(parts) == 2 and parts[0] == "runs":
+            run = self._run(parts[1])
+            if run is not None:
+                self._reply(200, run.state())
+        elif len(parts) == 3 and parts[0] == "runs" and parts[2] == "events":
+            run = self._run(parts[1])
+            if run is not None:
+                self._stream(run)
+        else:
+            self._reply(404, {"error": f"Not found: {self.path}"})
+
+    def _stream(self, run: Run) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        sent = 0
+        while True:
+            with run.changed:
+                while len(run.events) <= sent:
+                    run.changed.wait()
+                events = run.events[sent:]
+            for event in events:
+                self.wfile.write((json_dumps(event) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            sent += len(events)
+            if events[-1]["status"] in FINISHED:
+                return
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """HTTP server handling each request in a thread of its own."""
+
+    daemon_threads = True
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ThreadingHTTPServer on a Unix socket."""
+
+    daemon_threads = True
+
+
+def make_http_server(
+    address: str, cwl_server: CWLServer, token: str
+) -> socketserver.BaseServer:
+    """
+    Bind the API to an address, for clients with the given token.
+
+    address is either ``unix:PATH`` or ``HOST:PORT``; without a host, the
+    server only listens on localhost.
+    """
+    if not token:
+        raise ValueError("The server needs a token")
+    handler = type(
+        "CWLRequestHandler",
+        (RequestHandler,),
+        {"cwl_server": cwl_server, "token": token},
+    )
+    if address.startswith("unix:"):
+        path = address[len("unix:") :]
+        if os.path.exists(path):
+            os.unlink(path)
+        return UnixHTTPServer(path, handler)
+    host, _, port = address.rpartition(":")
+    return ThreadingHTTPServer((host or "127.0.0.1", int(port)), handler)
+
+
+def serve(
+    args: argparse.Namespace,
+    loadingContext: LoadingContext,
+    runtimeContext: RuntimeContext,
+) -> int:
+    """Run the server until interrupted."""
+    cwl_server = CWLServer(
+        loadingContext,
+        runtimeContext,
+        args.serve_workers,
+        run_ttl=args.serve_run_ttl,
+        max_runs=args.serve_max_runs,
+        root=args.serve_root,
+    )
+    token = os.environ.get("CWLTOOL_SERVE_TOKEN")
+    if not token:
+        token = secrets.token_urlsafe(32)
+        _logger.info("Clients must send 'Authorization: Bearer %s'", token)
+    httpd = make_http_server(args.serve, cwl_server, token)
+    _logger.info("Serving on %s for runs in %s", args.serve, cwl_server.root)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        cwl_server.shutdown()
+    return 0
@@ -20,6 +20,7 @@ from schema_salad.sourceline import SourceLine
 from .builder import Builder
 from .context import RuntimeContext
 from .errors import WorkflowException
+from .file_copy import writable_copy
 from .job import ContainerCommandLineJob
 from .loghandler import _logger
 from .pathmapper import MapperEnt, PathMapper
@@ -315,9 +316,11 @@ class SingularityCommandLineJob(ContainerCommandLineJob):
                     os.link(os.path.realpath(volume.resolved), host_outdir_tgt)
                 except os.error:
                     shutil.copy(volume.resolved, host_outdir_tgt)
+                ensure_writable(host_outdir_tgt)
             else:
-                shutil.copy(volume.resolved, host_outdir_tgt)
-            ensure_writable(host_outdir_tgt)
+                writable_copy(
+                    volume.resolved, host_outdir_tgt, self.writable_copy_strategy
+                )
         elif self.inplace_update:
             self.append_volume(runtime, volume.resolved, volume.target, writable=True)
             ensure_writable(volume.resolved)
@@ -326,10 +329,9 @@ class SingularityCommandLineJob(ContainerCommandLineJob):
                 create_tmp_dir(tmpdir_prefix),
                 os.path.basename(volume.resolved),
             )
-            shutil.copy(volume.resolved, file_copy)
+            writable_copy(volume.resolved, file_copy, self.writable_copy_strategy)
             # volume.resolved = file_copy
             self.append_volume(runtime, file_copy, volume.target, writable=True)
-            ensure_writable(file_copy)
 
     def add_writable_directory_volume(
         self,
@@ -353,21 +355,24 @@ class SingularityCommandLineJob(ContainerCommandLineJob):
                 # revert to daa923d5b0be3819b6ed0e6440e7193e65141052
                 # once https://github.com/sylabs/singularity/issues/1607
                 # is fixed
-                shutil.copytree(volume.resolved, host_outdir_tgt)
-                ensure_writable(host_outdir_tgt)
+                writable_copy(
+                    volume.resolved, host_outdir_tgt, self.writable_copy_strategy
+                )
             else:
                 if not self.inplace_update:
                     dir_copy = os.path.join(
                         create_tmp_dir(tmpdir_prefix),
                         os.path.basename(volume.resolved),
                     )
-                    shutil.copytree(volume.resolved, dir_copy)
+                    writable_copy(
+                        volume.resolved, dir_copy, self.writable_copy_strategy
+                    )
                     source = dir_copy
                     # volume.resolved = dir_copy
                 else:
                     source = volume.resolved
+                    ensure_writable(source)
                 self.append_volume(runtime, source, volume.target, writable=True)
-                ensure_writable(source)
 
     def _required_env(self) -> Dict[str, str]:
         return {
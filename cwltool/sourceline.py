@@ -0,0 +1,131 @@
+"""
+Plain copies of loaded documents that keep their source positions.
+
+ruamel.yaml's CommentedMap and CommentedSeq carry comments, anchors and
+line/column information, which makes them many times larger and slower to
+copy than dicts and lists.  The copies made of tool documents while
+building jobs are PlainMap and PlainSeq instead: a dict or list with a
+single reference to the LineCol of the node they were copied from, shared
+between all copies rather than copied with them, so error messages still
+point at the source.
+"""
+
+import copy
+from typing import Any, Dict, List
+
+import schema_salad.sourceline
+from ruamel.yaml.comments import LineCol
+from schema_salad.sourceline import lineno_re
+
+
+class PlainMap(Dict[str, Any]):
+    """A dict that remembers the source position of the node it was copied from."""
+
+    __slots__ = ("lc",)
+    lc: LineCol
+
+    def __copy__(self) -> "PlainMap":
+        result = PlainMap(self)
+        if hasattr(self, "lc"):
+            result.lc = self.lc
+        return result
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "PlainMap":
+        result = PlainMap()
+        memo[id(self)] = result
+        if hasattr(self, "lc"):
+            result.lc = self.lc
+        for key, value in self.items():
+            result[key] = copy.deepcopy(value, memo)
+        return result
+
+
+class PlainSeq(List[Any]):
+    """A list that remembers the source position of the node it was copied from."""
+
+    __slots__ = ("lc",)
+    lc: LineCol
+
+    def __copy__(self) -> "PlainSeq":
+        result = PlainSeq(self)
+        if hasattr(self, "lc"):
+            result.lc = self.lc
+        return result
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "PlainSeq":
+        result = PlainSeq()
+        memo[id(self)] = result
+        if hasattr(self, "lc"):
+            result.lc = self.lc
+        result.extend(copy.deepcopy(value, memo) for value in self)
+        return result
+
+
+def plain_copy(value: Any) -> Any:
+    """
+    Deep copy a document into PlainMap and PlainSeq nodes.
+
+    Scalars, which are immutable, are shared with the original.
+    """
+    if isinstance(value, dict):
+        result = PlainMap()
+        lc = getattr(value, "lc", None)
+        if lc is not None:
+            result.lc = lc
+        for key, item in value.items():
+            result[key] = plain_copy(item)
+        return result
+    if isinstance(value, list):
+        seq = PlainSeq(plain_copy(item) for item in value)
+        lc = getattr(value, "lc", None)
+        if lc is not None:
+            seq.lc = lc
+        return seq
+    return value
+
+
+def plain_shallow_copy(value: Any) -> Any:
+    """
+    Copy the top node of a document into a PlainMap or PlainSeq.
+
+    Its children are shared with the original, so the copy's fields may be
+    replaced but not modified in place.
+    """
+    if isinstance(value, dict):
+        result = PlainMap(value)  # type: Any
+    elif isinstance(value, list):
+        result = PlainSeq(value)
+    else:
+        return value
+    lc = getattr(value, "lc", None)
+    if lc is not None:
+        result.lc = lc
+    return result
+
+
+def plain_map(filename: str, line_col: List[int], **fields: Any) -> PlainMap:
+    """Make a PlainMap whose fields are all at the given source position."""
+    # LineCol has no filename field; schema_salad adds it to the instances.
+    lc = LineCol()  # type: Any
+    lc.filename = filename
+    for key in fields:
+        lc.add_kv_line_col(key, line_col)
+    result = PlainMap(fields)
+    result.lc = lc
+    return result
+
+
+class SourceLine(schema_salad.sourceline.SourceLine):
+    """SourceLine that also reports the positions of PlainMap and PlainSeq."""
+
+    def makeError(self, msg: str) -> Any:
+        if not isinstance(self.item, (PlainMap, PlainSeq)):
+            return super().makeError(msg)
+        lead = self.makeLead()
+        errs = []
+        for m in msg.splitlines():
+            if bool(lineno_re.match(m)):
+                errs.append(m)
+            else:
+                errs.append(f"{lead} {m}")
+        return self.raise_type("\n".join(errs))
@@ -2,8 +2,9 @@
 
 import glob
 import os
+import threading
 import urllib
-from typing import IO, Any, List
+from typing import IO, Any, Dict, List, Optional, Tuple
 
 from schema_salad.ref_resolver import file_uri, uri_file_path
 
@@ -62,3 +63,95 @@ class StdFsAccess:
 
     def realpath(self, path: str) -> str:
         return os.path.realpath(path)
+
+
+# How many files to look for in a directory before listing it.
+LIST_AFTER = 8
+
+
+class DirectoryIndex:
+    """
+    Find local files in listings of their directories.
+
+    Looking for many files in the same directory, such as the secondary
+    files of thousands of inputs, costs a metadata round trip per file on
+    network filesystems.  Once a directory has been asked about LIST_AFTER
+    times, it is listed with a single os.scandir, and the listing answers
+    exists(), isfile() and isdir() for the files in it.
+
+    Listings are kept until forgotten, so whatever creates or removes files
+    meanwhile, such as a job writing its outputs, must forget the
+    directories it wrote to.  An index can be shared by jobs running in
+    several threads.
+    """
+
+    def __init__(self) -> None:
+        """Start with no listings."""
+        self.lookups = {}  # type: Dict[str, int]
+        self.listings = {}  # type: Dict[str, Optional[Dict[str, os.DirEntry[str]]]]
+        self.lock = threading.Lock()
+
+    def _listing(
+        self, fs_access: StdFsAccess, fn: str
+    ) -> Tuple[bool, Optional["os.DirEntry[str]"]]:
+        """Look up a file in the listing of its directory, if there is one."""
+        for method in ("_abs", "exists", "isfile", "isdir"):
+            if getattr(type(fs_access), method) is not getattr(StdFsAccess, method):
+                return False, None
+        path = fs_access._abs(fn)
+        directory, name = os.path.split(path)
+        if not os.path.isabs(directory) or name in ("", ".", ".."):
+            return False, None
+        with self.lock:
+            listed = directory in self.listings
+            if listed:
+                listing = self.listings[directory]
+            else:
+                count = self.lookups.get(directory, 0) + 1
+                self.lookups[directory] = count
+                if count < LIST_AFTER:
+                    return False, None
+        if not listed:
+            # Listed without holding the lock, which is only needed to
+            # update the dictionaries; listings are never changed once made.
+            try:
+                with os.scandir(directory) as entries:
+                    listing = {entry.name: entry for entry in entries}
+            except OSError:
+                listing = None
+            with self.lock:
+                listing = self.listings.setdefault(directory, listing)
+        if listing is None:
+            return False, None
+        return True, listing.get(name)
+
+    def forget(self, path: str) -> None:
+        """Drop the listings of path, of what is inside it, and of its parent."""
+        path = os.path.abspath(path)
+        inside = path.rstrip(os.sep) + os.sep
+        stale = {os.path.dirname(path), path}
+        with self.lock:
+            for directory in list(self.listings) + list(self.lookups):
+                if directory in stale or directory.startswith(inside):
+                    self.listings.pop(directory, None)
+                    self.lookups.pop(directory, None)
+
+    def exists(self, fs_access: StdFsAccess, fn: str) -> bool:
+        listed, entry = self._listing(fs_access, fn)
+        if not listed:
+            return fs_access.exists(fn)
+        if entry is None:
+            return False
+        return not entry.is_symlink() or os.path.exists(entry.path)
+
+    def isfile(self, fs_access: StdFsAccess, fn: str) -> bool:
+        listed, entry = self._listing(fs_access, fn)
+        if not listed:
+            return fs_access.isfile(fn)
+        return entry is not None and entry.is_file()
+
+    def isdir(self, fs_access: StdFsAccess, fn: str) -> bool:
+        listed, entry = self._listing(fs_access, fn)
+        if not listed:
+            return fs_access.isdir(fn)
+        return entry is not None and entry.is_dir()
@@ -16,3 +16,10 @@ class UDockerCommandLineJob(DockerCommandLineJob):
         runtime.append(
             "--volume={}:{}:{}".format(source, target, "rw" if writable else "ro")
         )
+
+    @staticmethod
+    def append_overlay_volume(
+        runtime: List[str], source: str, target: str, tmpdir_prefix: str
+    ) -> bool:
+        """udocker has no volume drivers, so writable directories are copied."""
+        return False
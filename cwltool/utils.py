@@ -1,6 +1,8 @@
 """Shared functions and other definitions."""
 
 import collections
+import collections.abc
+import math
 import os
 import random
 import shutil
@@ -29,6 +31,7 @@ from typing import (
     NamedTuple,
     Optional,
     Set,
+    Tuple,
     Union,
     cast,
 )
@@ -44,7 +47,9 @@ from typing_extensions import TYPE_CHECKING, Deque
 
 if TYPE_CHECKING:
     from .command_line_tool import CallbackJob, ExpressionJob
+    from .dry_run import PlannedJob
     from .job import CommandLineJob, JobBase
+    from .memo import MemoizedJob
     from .stdfsaccess import StdFsAccess
     from .workflow_job import WorkflowJob
 
@@ -84,7 +89,13 @@ CWLOutputType = Union[
 ]
 CWLObjectType = MutableMapping[str, Optional[CWLOutputType]]
 JobsType = Union[
-    "CommandLineJob", "JobBase", "WorkflowJob", "ExpressionJob", "CallbackJob"
+    "CommandLineJob",
+    "JobBase",
+    "WorkflowJob",
+    "ExpressionJob",
+    "CallbackJob",
+    "PlannedJob",
+    "MemoizedJob",
 ]
 JobsGeneratorType = Generator[Optional[JobsType], None, None]
 OutputCallbackType = Callable[[Optional[CWLObjectType], str], None]
@@ -142,7 +153,9 @@ def copytree_with_merge(src: str, dst: str) -> None:
             shutil.copy2(spath, dpath)
 
 
-def cmp_like_py2(dict1: Dict[str, Any], dict2: Dict[str, Any]) -> int:
+def cmp_like_py2(
+    dict1: MutableMapping[str, Any], dict2: MutableMapping[str, Any]
+) -> int:
     """
     Compare in the same manner as Python2.
 
@@ -176,6 +189,31 @@ def cmp_like_py2(dict1: Dict[str, Any], dict2: Dict[str, Any]) -> int:
     return 0
 
 
+PositionKey = Tuple[Tuple[int, Union[float, str]], ...]
+
+
+def position_key(position: Iterable[Any]) -> Optional[PositionKey]:
+    """
+    Make a sort key that orders binding positions as cmp_like_py2 does.
+
+    Numbers sort before strings.  cmp_like_py2 compares a number and a string
+    as strings, which orders them the same way as long as the string starts
+    with a character after the digits, as field names do.  Returns None for
+    positions holding anything else; those must be sorted with cmp_like_py2.
+    """
+    key = []  # type: List[Tuple[int, Union[float, str]]]
+    for item in position:
+        if isinstance(item, str):
+            if item[:1] <= "9":
+                return None
+            key.append((1, item))
+        elif type(item) is int or (type(item) is float and math.isfinite(item)):
+            key.append((0, item))
+        else:
+            return None
+    return tuple(key)
+
+
 def bytes2str_in_dicts(
     inp: Union[MutableMapping[str, Any], MutableSequence[Any], Any],
 ):
@@ -208,12 +246,14 @@ def bytes2str_in_dicts(
 
 def visit_class(rec: Any, cls: Iterable[Any], op: Callable[..., Any]) -> None:
     """Apply a function to with "class" in cls."""
-    if isinstance(rec, MutableMapping):
+    # The collections.abc classes, as isinstance() on the typing aliases is
+    # several times slower, which adds up on large job orders.
+    if isinstance(rec, collections.abc.MutableMapping):
         if "class" in rec and rec.get("class") in cls:
             op(rec)
         for d in rec:
             visit_class(rec[d], cls, op)
-    if isinstance(rec, MutableSequence):
+    if isinstance(rec, collections.abc.MutableSequence):
         for d in rec:
             visit_class(d, cls, op)
 
@@ -266,6 +306,18 @@ def upgrade_lock(fd: IO[Any]) -> None:
         pass
 
 
+def try_exclusive_file_lock(fd: IO[Any]) -> bool:
+    """Take an exclusive lock if nobody else holds one, without waiting."""
+    try:
+        if fcntl:
+            fcntl.flock(fd.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)  # type: ignore
+        elif msvcrt:
+            msvcrt.locking(fd.fileno(), msvcrt.LK_NBLCK, 1024)  # type: ignore
+    except OSError:
+        return False
+    return True
+
+
 def adjustFileObjs(
     rec, op
 ):  # type: (Any, Union[Callable[..., Any], partial[Any]]) -> None
@@ -405,6 +457,55 @@ def ensure_non_writable(path):  # type: (str) -> None
         os.chmod(path, mode & ~stat.S_IWUSR & ~stat.S_IWGRP & ~stat.S_IWOTH)
 
 
+def normalizeFileDir(d):  # type: (Dict[str, Any]) -> None
+    """Fill in the location, basename, nameroot and nameext of a File or Directory."""
+    if "location" not in d:
+        if d["class"] == "File" and ("contents" not in d):
+            raise ValidationException(
+                "Anonymous file object must have 'contents' and 'basename' fields."
+            )
+        if d["class"] == "Directory" and ("listing" not in d or "basename" not in d):
+            raise ValidationException(
+                "Anonymous directory object must have 'listing' and 'basename' fields."
+            )
+        d["location"] = "_:" + str(uuid.uuid4())
+        if "basename" not in d:
+            d["basename"] = d["location"][2:]
+
+    parse = urllib.parse.urlparse(d["location"])
+    path = parse.path
+    # strip trailing slash
+    if path.endswith("/"):
+        if d["class"] != "Directory":
+            raise ValidationException(
+                "location '%s' ends with '/' but is not a Directory" % d["location"]
+            )
+        path = path.rstrip("/")
+        d["location"] = urllib.parse.urlunparse(
+            (
+                parse.scheme,
+                parse.netloc,
+                path,
+                parse.params,
+                parse.query,
+                parse.fragment,
+            )
+        )
+
+    if not d.get("basename"):
+        if path.startswith("_:"):
+            d["basename"] = str(path[2:])
+        else:
+            d["basename"] = str(os.path.basename(urllib.request.url2pathname(path)))
+
+    if d["class"] == "File":
+        nr, ne = os.path.splitext(d["basename"])
+        if d.get("nameroot") != nr:
+            d["nameroot"] = str(nr)
+        if d.get("nameext") != ne:
+            d["nameext"] = str(ne)
+
+
 def normalizeFilesDirs(
     job: Optional[
         Union[
@@ -414,56 +515,7 @@ def normalizeFilesDirs(
         ]
     ]
 ) -> None:
-    def addLocation(d):  # type: (Dict[str, Any]) -> None
-        if "location" not in d:
-            if d["class"] == "File" and ("contents" not in d):
-                raise ValidationException(
-                    "Anonymous file object must have 'contents' and 'basename' fields."
-                )
-            if d["class"] == "Directory" and (
-                "listing" not in d or "basename" not in d
-            ):
-                raise ValidationException(
-                    "Anonymous directory object must have 'listing' and 'basename' fields."
-                )
-            d["location"] = "_:" + str(uuid.uuid4())
-            if "basename" not in d:
-                d["basename"] = d["location"][2:]
-
-        parse = urllib.parse.urlparse(d["location"])
-        path = parse.path
-        # strip trailing slash
-        if path.endswith("/"):
-            if d["class"] != "Directory":
-                raise ValidationException(
-                    "location '%s' ends with '/' but is not a Directory" % d["location"]
-                )
-            path = path.rstrip("/")
-            d["location"] = urllib.parse.urlunparse(
-                (
-                    parse.scheme,
-                    parse.netloc,
-                    path,
-                    parse.params,
-                    parse.query,
-                    parse.fragment,
-                )
-            )
-
-        if not d.get("basename"):
-            if path.startswith("_:"):
-                d["basename"] = str(path[2:])
-            else:
-                d["basename"] = str(os.path.basename(urllib.request.url2pathname(path)))
-
-        if d["class"] == "File":
-            nr, ne = os.path.splitext(d["basename"])
-            if d.get("nameroot") != nr:
-                d["nameroot"] = str(nr)
-            if d.get("nameext") != ne:
-                d["nameext"] = str(ne)
-
-    visit_class(job, ("File", "Directory"), addLocation)
+    visit_class(job, ("File", "Directory"), normalizeFileDir)
 
 
 def posix_path(local_path: str) -> str:
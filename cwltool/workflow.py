@@ -18,15 +18,15 @@ from uuid import UUID
 from ruamel.yaml.comments import CommentedMap
 from schema_salad.exceptions import ValidationException
 from schema_salad.sourceline import SourceLine, indent
+from typing_extensions import TYPE_CHECKING
 
-from . import command_line_tool, context, procgenerator
+from . import command_line_tool, context, memo, procgenerator
 from .checker import static_checker
 from .context import LoadingContext, RuntimeContext, getdefault
 from .errors import WorkflowException
 from .load_tool import load_tool
 from .loghandler import _logger
 from .process import Process, get_overrides, shortname
-from .provenance_profile import ProvenanceProfile
 from .utils import (
     CWLObjectType,
     JobsGeneratorType,
@@ -36,6 +36,9 @@ from .utils import (
 )
 from .workflow_job import WorkflowJob
 
+if TYPE_CHECKING:
+    from .provenance_profile import ProvenanceProfile  # pylint: disable=unused-import
+
 
 def default_make_tool(
     toolpath_object: CommentedMap, loadingContext: LoadingContext
@@ -78,6 +81,7 @@ class Workflow(Process):
             is_main = not loadingContext.prov_obj  # Not yet set
             if is_main:
                 run_uuid = loadingContext.research_obj.ro_uuid
+            from .provenance_profile import ProvenanceProfile
 
             self.provenance_object = ProvenanceProfile(
                 loadingContext.research_obj,
@@ -145,7 +149,7 @@ class Workflow(Process):
         toolpath_object: CommentedMap,
         pos: int,
         loadingContext: LoadingContext,
-        parentworkflowProv: Optional[ProvenanceProfile] = None,
+        parentworkflowProv: Optional["ProvenanceProfile"] = None,
     ) -> "WorkflowStep":
         return WorkflowStep(toolpath_object, pos, loadingContext, parentworkflowProv)
 
@@ -195,7 +199,7 @@ class WorkflowStep(Process):
         toolpath_object: CommentedMap,
         pos: int,
         loadingContext: LoadingContext,
-        parentworkflowProv: Optional[ProvenanceProfile] = None,
+        parentworkflowProv: Optional["ProvenanceProfile"] = None,
     ) -> None:
         """Initialize this WorkflowStep."""
         if "id" in toolpath_object:
@@ -429,12 +433,28 @@ class WorkflowStep(Process):
             if not inp.get("not_connected"):
                 step_input[field] = job_order[inp["id"]]
 
+        callback = functools.partial(self.receive_output, output_callbacks)
+        if memo.memoizable(self.embedded_tool, runtimeContext):
+            name = shortname(self.id)
+            key = memo.memo_key(self.embedded_tool, step_input, runtimeContext)
+            _logger.debug("[step %s] cache key is %s", name, key)
+            if runtimeContext.dry_run:
+                # A miss is reported, then the step is planned as it would run.
+                planned = memo.plan(key, name, runtimeContext)
+                yield planned
+                if planned.status != "miss":
+                    return
+            else:
+                memoized = memo.recall(key, name, callback, runtimeContext)
+                if memoized is not None:
+                    yield memoized
+                    return
+                callback = functools.partial(
+                    memo.remember, key, name, runtimeContext, callback
+                )
+
         try:
-            yield from self.embedded_tool.job(
-                step_input,
-                functools.partial(self.receive_output, output_callbacks),
-                runtimeContext,
-            )
+            yield from self.embedded_tool.job(step_input, callback, runtimeContext)
         except WorkflowException:
             _logger.error("Exception on step '%s'", runtimeContext.name)
             raise
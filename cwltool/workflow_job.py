@@ -14,7 +14,6 @@ from typing import (
     cast,
 )
 
-from schema_salad.sourceline import SourceLine
 from schema_salad.utils import json_dumps
 from typing_extensions import TYPE_CHECKING
 
@@ -25,6 +24,7 @@ from .context import RuntimeContext, getdefault
 from .errors import WorkflowException
 from .loghandler import _logger
 from .process import shortname, uniquename
+from .sourceline import SourceLine
 from .stdfsaccess import StdFsAccess
 from .utils import (
     CWLObjectType,
@@ -629,6 +629,19 @@ class WorkflowJob:
                 self.receive_output, step, outputparms, final_output_callback
             )
 
+            state = runtimeContext.incremental_state
+            if state is not None and not runtimeContext.dry_run:
+                digests = state.digests(step.step, inputobj, runtimeContext)
+                if digests is not None:
+                    outputs = state.lookup(step.id, digests, step.name)
+                    if outputs is not None:
+                        step.submitted = True
+                        callback(outputs, "success")
+                        return
+                    callback = functools.partial(
+                        state.record, step.id, digests, step.name, callback
+                    )
+
             valueFrom = {
                 i["id"]: i["valueFrom"] for i in step.tool["inputs"] if "valueFrom" in i
             }
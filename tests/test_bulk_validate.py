@@ -0,0 +1,70 @@
+import io
+import json
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List
+
+from cwltool.bulk_validate import validate_documents
+from cwltool.context import LoadingContext
+
+from .util import get_data, get_main_output
+
+
+def validate(*args: str) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in get_main_output(list(args))[1].splitlines()]
+
+
+def test_bulk_validate(tmp_path: Path) -> None:
+    """--validate checks every document in a directory, skipping unchanged ones."""
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name in ("wc-tool.cwl", "parseInt-tool.cwl", "count-lines1-wf.cwl"):
+        shutil.copy(get_data("tests/wf/" + name), docs / name)
+    (docs / "broken.cwl").write_text("cwlVersion: v1.0\nclass: CommandLineTool\n")
+    cache = str(tmp_path / "cache")
+
+    rc, stdout, _ = get_main_output(["--validate", "--load-cache", cache, str(docs)])
+    results = {Path(r["path"]).name: r for r in map(json.loads, stdout.splitlines())}
+    assert rc == 1
+    assert sorted(results) == [
+        "broken.cwl",
+        "count-lines1-wf.cwl",
+        "parseInt-tool.cwl",
+        "wc-tool.cwl",
+    ]
+    assert not results["broken.cwl"]["valid"]
+    assert results["broken.cwl"]["error"]
+    assert results["wc-tool.cwl"]["valid"]
+    assert results["count-lines1-wf.cwl"]["valid"]
+    assert not any(r["cached"] for r in results.values())
+
+    second = validate("--validate", "--load-cache", cache, str(docs))
+    assert all(r["cached"] for r in second)
+
+    (docs / "broken.cwl").write_text(
+        "cwlVersion: v1.0\nclass: CommandLineTool\n"
+        "inputs: []\noutputs: []\nbaseCommand: 'true'\n"
+    )
+    third = {
+        Path(r["path"]).name: r
+        for r in validate("--validate", "--load-cache", cache, str(docs))
+    }
+    assert not third["broken.cwl"]["cached"]
+    assert third["broken.cwl"]["valid"]
+    assert third["wc-tool.cwl"]["cached"]
+
+
+def test_bulk_validate_parallel(tmp_path: Path) -> None:
+    """Documents validated in a pool of processes give the same results."""
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name in ("wc-tool.cwl", "parseInt-tool.cwl", "count-lines1-wf.cwl"):
+        shutil.copy(get_data("tests/wf/" + name), docs / name)
+    (docs / "broken.cwl").write_text("cwlVersion: v1.0\nclass: CommandLineTool\n")
+
+    serial = validate("--validate", str(docs))
+    assert validate("--validate", "--parallel", str(docs)) == serial
+
+    stdout = io.StringIO()
+    assert validate_documents([str(docs)], LoadingContext(), stdout, workers=2) == 1
+    assert [json.loads(line) for line in stdout.getvalue().splitlines()] == serial
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import threading
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple, Type
+
+import pytest
+import requests
+
+from cwltool.cache_backends import (
+    CacheBackend,
+    CacheServer,
+    DirectoryBackend,
+    HttpBackend,
+    cache_backend,
+)
+from cwltool.job_cache import CACHE_FORMAT, job_cache
+
+from .util import get_main_output
+
+TOOL = """\
+cwlVersion: v1.1
+class: CommandLineTool
+inputs:
+  message: string
+baseCommand: [sh, -c]
+arguments:
+  - >-
+    mkdir $(inputs.message) && echo $(inputs.message) > $(inputs.message)/a.txt &&
+    echo shared > $(inputs.message)/b.txt
+outputs:
+  result:
+    type: Directory
+    outputBinding: {glob: $(inputs.message)}
+"""
+
+WORKFLOW = """\
+cwlVersion: v1.1
+class: Workflow
+inputs: []
+outputs:
+  first: {type: Directory, outputSource: one/result}
+  second: {type: Directory, outputSource: two/result}
+steps:
+  one:
+    run: tool.cwl
+    in: {message: {default: one}}
+    out: [result]
+  two:
+    run: tool.cwl
+    in: {message: {default: two}}
+    out: [result]
+"""
+
+DATA = b"some data"
+CHECKSUM = "sha1$" + hashlib.sha1(DATA).hexdigest()  # nosec
+FILE = {
+    "class": "File",
+    "checksum": CHECKSUM,
+    "size": 9,
+    "executable": False,
+}  # type: Dict[str, Any]
+
+
+@pytest.fixture
+def server(tmp_path: Path) -> Iterator[CacheServer]:
+    """Run a cache server for the duration of a test."""
+    server = CacheServer(str(tmp_path / "server"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run(tmp_path: Path, node: str, remote: str) -> str:
+    error_code, stdout, stderr = get_main_output(
+        [
+            "--cachedir",
+            str(tmp_path / node / "cache"),
+            "--remote-cache",
+            remote,
+            "--outdir",
+            str(tmp_path / node / "out"),
+            str(tmp_path / "wf.cwl"),
+        ]
+    )
+    assert error_code == 0, stderr
+    return stderr
+
+
+def test_remote_cache(tmp_path: Path, server: CacheServer) -> None:
+    """Outputs cached on one machine are reused on another."""
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    (tmp_path / "wf.cwl").write_text(WORKFLOW)
+    stderr = run(tmp_path, "node1", server.url)
+    assert stderr.count("Output of job will be cached in") == 2
+    assert len(list((tmp_path / "server" / "manifests").iterdir())) == 2
+    assert len(list((tmp_path / "server" / "blobs").glob("*/*"))) == 3
+
+    stderr = run(tmp_path, "node2", server.url)
+    assert "Output of job will be cached in" not in stderr
+    assert stderr.count("Fetched output from the remote cache") == 2
+    assert stderr.count("Using cached output in") == 2
+    for name in ("one", "two"):
+        result = tmp_path / "node2" / "out" / name / "a.txt"
+        assert result.read_text() == f"{name}\n"
+
+    # The second machine now has its own copy.
+    stderr = run(tmp_path, "node2", "http://127.0.0.1:1")
+    assert stderr.count("Using cached output in") == 2
+    assert "remote cache" not in stderr
+
+
+def test_corrupted_remote_cache(tmp_path: Path, server: CacheServer) -> None:
+    """Files that don't match their checksum are not used."""
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    (tmp_path / "wf.cwl").write_text(WORKFLOW)
+    run(tmp_path, "node1", server.url)
+    for blob in (tmp_path / "server" / "blobs").glob("*/*"):
+        blob.write_text("corrupted\n")
+    stderr = run(tmp_path, "node2", server.url)
+    assert stderr.count("Got corrupted sha1$") == 2
+    assert stderr.count("Output of job will be cached in") == 2
+
+
+def test_remote_cache_needs_cachedir(tmp_path: Path) -> None:
+    error_code, _, stderr = get_main_output(
+        ["--remote-cache", str(tmp_path), str(tmp_path / "wf.cwl")]
+    )
+    assert error_code == 1
+    assert "--remote-cache needs --cachedir" in stderr
+
+
+@pytest.mark.parametrize("kind", ["directory", "http"])
+def test_backend(tmp_path: Path, server: CacheServer, kind: str) -> None:
+    """Both backends store manifests and files the same way."""
+    backend = (
+        cache_backend((tmp_path / "shared").as_uri())
+        if kind == "directory"
+        else cache_backend(server.url)
+    )  # type: CacheBackend
+    assert isinstance(backend, DirectoryBackend if kind == "directory" else HttpBackend)
+    assert backend.get_manifest("key") is None
+    assert not backend.has_blob(CHECKSUM)
+    assert not backend.get_blob(CHECKSUM, BytesIO())
+
+    backend.put_blob(CHECKSUM, BytesIO(DATA))
+    assert backend.has_blob(CHECKSUM)
+    dst = BytesIO()
+    assert backend.get_blob(CHECKSUM, dst)
+    assert dst.getvalue() == DATA
+    wrong = "sha1$" + "0" * 40
+    rejected = (ValueError, requests.HTTPError)  # type: Tuple[Type[Exception], ...]
+    with pytest.raises(rejected):
+        backend.put_blob(wrong, BytesIO(DATA))
+    assert not backend.has_blob(wrong)
+
+    manifest = [
+        {
+            "path": "data",
+            "class": "File",
+            "checksum": CHECKSUM,
+            "size": 9,
+            "executable": False,
+        }
+    ]
+    backend.put_manifest("key", manifest)
+    assert backend.get_manifest("key") == manifest
+    with pytest.raises(ValueError):
+        backend.get_manifest("../key")
+
+
+def test_other_format(tmp_path: Path) -> None:
+    """Manifests made for another layout of the cache are ignored."""
+    backend = DirectoryBackend(str(tmp_path))
+    (tmp_path / "manifests" / "key").write_text(
+        '{"format": %d, "manifest": []}' % (CACHE_FORMAT + 1)
+    )
+    assert backend.get_manifest("key") is None
+
+
+@pytest.mark.parametrize(
+    "manifest",
+    [
+        "data",
+        [{"path": "/tmp/data", **FILE}],
+        [{"path": "../data", **FILE}],
+        [{"path": "out/../../data", **FILE}],
+        [{"path": "./data", **FILE}],
+        [{"path": ".", "class": "Directory"}],
+        [{"path": "data", "class": "Socket"}],
+        [{"path": "data", **FILE, "checksum": "sha1$../../data"}],
+        [{"path": "data", **FILE, "size": -1}],
+        [{"path": "data", "class": "Link"}],
+        [
+            {"path": "link", "class": "Link", "target": "/tmp"},
+            {"path": "link/data", **FILE},
+        ],
+    ],
+)
+def test_unsafe_manifest(tmp_path: Path, manifest: object) -> None:
+    """Manifests that could write outside of the output directory are rejected."""
+    backend = DirectoryBackend(str(tmp_path / "shared"))
+    (tmp_path / "shared" / "manifests" / "key").write_text(
+        json.dumps({"format": CACHE_FORMAT, "manifest": manifest})
+    )
+    with pytest.raises(ValueError):
+        backend.get_manifest("key")
+    with pytest.raises(ValueError):
+        job_cache(str(tmp_path / "cache")).fetch("key", backend)
+
+
+def test_unsafe_remote_cache(tmp_path: Path, server: CacheServer) -> None:
+    """Jobs whose remote manifest is unsafe are run again."""
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    (tmp_path / "wf.cwl").write_text(WORKFLOW)
+    run(tmp_path, "node1", server.url)
+    for path in (tmp_path / "server" / "manifests").iterdir():
+        document = json.loads(path.read_text())
+        entry = {**document["manifest"][-1], "path": "../../escaped"}
+        document["manifest"].append(entry)
+        path.write_text(json.dumps(document))
+    stderr = run(tmp_path, "node2", server.url)
+    assert "Fetched output from the remote cache" not in stderr
+    assert stderr.count("Output of job will be cached in") == 2
+    assert not list(tmp_path.glob("**/escaped"))
@@ -0,0 +1,126 @@
+import functools
+import random
+from pathlib import Path
+from typing import Any, Dict, List, cast
+
+from cwltool.context import LoadingContext, RuntimeContext
+from cwltool.load_tool import load_tool
+from cwltool.utils import PositionKey, cmp_like_py2, position_key
+from cwltool.workflow import default_make_tool
+
+TOOL = """\
+cwlVersion: v1.1
+class: CommandLineTool
+requirements:
+  InlineJavascriptRequirement: {}
+inputs:
+  a:
+    type: int
+    inputBinding: {position: 2}
+  b:
+    type: string[]
+    inputBinding: {prefix: -b}
+  c:
+    type: boolean
+    inputBinding: {position: -1, prefix: --c}
+  d:
+    type: int
+    inputBinding: {position: $(inputs.a)}
+outputs: []
+baseCommand: [python, -c]
+arguments:
+  - "print('hello')"
+  - $(inputs.a + 1)
+  - {valueFrom: late, position: 3}
+  - {valueFrom: $(inputs.d), position: $(inputs.d)}
+  - {valueFrom: early, position: -2}
+  - {prefix: --first, valueFrom: x, position: $(inputs.a - 10)}
+"""
+
+
+def test_position_key() -> None:
+    """Positions sorted by key are in the same order as with cmp_like_py2."""
+    rand = random.Random(37)
+    items = [-2, 0, 1, 2, 10, 1.5, "a", "b", "ab", "Z", "_x"]
+    for _ in range(500):
+        positions = [
+            {"position": [rand.choice(items) for _ in range(rand.randint(1, 4))]}
+            for _ in range(8)
+        ]  # type: List[Dict[str, Any]]
+        keys = [position_key(p["position"]) for p in positions]
+        assert all(key is not None for key in keys)
+        by_key = sorted(
+            positions, key=lambda p: cast(PositionKey, position_key(p["position"]))
+        )
+        by_cmp = sorted(positions, key=functools.cmp_to_key(cmp_like_py2))
+        assert by_key == by_cmp
+
+    unkeyed = [
+        ["1a"],
+        [""],
+        [None],
+        [True],
+        [float("nan")],
+        [0, "-x"],
+    ]  # type: List[List[Any]]
+    for position in unkeyed:
+        assert position_key(position) is None
+
+
+def make_jobs(tmp_path: Path, job_orders: List[Any]) -> List[Any]:
+    tool_path = tmp_path / "tool.cwl"
+    tool_path.write_text(TOOL)
+    tool = load_tool(
+        str(tool_path), LoadingContext({"construct_tool_object": default_make_tool})
+    )
+    return [
+        tool._init_job(job_order, RuntimeContext({"outdir": str(tmp_path)}))
+        for job_order in job_orders
+    ]
+
+
+def test_command_line_order(tmp_path: Path) -> None:
+    """Bindings are in the order cmp_like_py2 sorts them in."""
+    for builder in make_jobs(
+        tmp_path,
+        [
+            {"a": 1, "b": ["x", "y"], "c": True, "d": 4},
+            {"a": 12, "b": [], "c": False, "d": -3},
+        ],
+    ):
+        expected = sorted(builder.bindings, key=functools.cmp_to_key(cmp_like_py2))
+        assert builder.bindings == expected
+    assert [builder.generate_arg(b) for b in builder.bindings] == [
+        ["python"],
+        ["-c"],
+        ["-3"],
+        ["early"],
+        [],
+        ["print('hello')"],
+        ["13"],
+        [],
+        ["--first", "x"],
+        ["12"],
+        ["late"],
+        ["-3"],
+    ]
+
+
+def test_static_bindings_shared(tmp_path: Path) -> None:
+    """The bindings that don't depend on the job are made once."""
+    first, second = make_jobs(
+        tmp_path,
+        [
+            {"a": 1, "b": [], "c": True, "d": 4},
+            {"a": 2, "b": ["x"], "c": True, "d": 5},
+        ],
+    )
+    shared = [b for b in first.bindings if any(b is c for c in second.bindings)]
+    assert [b.get("datum", b.get("valueFrom")) for b in shared] == [
+        "python",
+        "-c",
+        "early",
+        "print('hello')",
+        "$(inputs.a + 1)",
+        "late",
+    ]
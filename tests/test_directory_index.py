@@ -0,0 +1,153 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, List, MutableSequence, cast
+
+import pytest
+
+from cwltool.context import LoadingContext, RuntimeContext
+from cwltool.load_tool import load_tool
+from cwltool.stdfsaccess import LIST_AFTER, DirectoryIndex, StdFsAccess
+from cwltool.utils import CWLObjectType, CWLOutputAtomType
+from cwltool.workflow import default_make_tool
+
+
+@pytest.fixture
+def counted_scandir(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> List[str]:
+    """Record the directories under tmp_path that are listed."""
+    listed = []  # type: List[str]
+    scandir = os.scandir
+
+    def counting_scandir(path: Any) -> Any:
+        if str(path).startswith(str(tmp_path)):
+            listed.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr("cwltool.stdfsaccess.os.scandir", counting_scandir)
+    return listed
+
+
+def test_directory_index(tmp_path: Path, counted_scandir: List[str]) -> None:
+    """Listings give the same answers as checking each file."""
+    (tmp_path / "a.bam").touch()
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "link.bai").symlink_to(tmp_path / "a.bam")
+    (tmp_path / "dirlink").symlink_to(tmp_path / "sub")
+    (tmp_path / "broken.bai").symlink_to(tmp_path / "nowhere")
+    fs_access = StdFsAccess(str(tmp_path))
+    index = DirectoryIndex()
+    names = ["a.bam", "sub", "link.bai", "dirlink", "broken.bai", "missing", "sub/.."]
+    for _ in range(LIST_AFTER):
+        for name in names:
+            for fn in (name, (tmp_path / name).as_uri()):
+                assert index.exists(fs_access, fn) == fs_access.exists(fn), fn
+                assert index.isfile(fs_access, fn) == fs_access.isfile(fn), fn
+                assert index.isdir(fs_access, fn) == fs_access.isdir(fn), fn
+    assert counted_scandir == [str(tmp_path)]
+
+
+def test_directory_index_forget(tmp_path: Path) -> None:
+    """Directories a job wrote to are listed again."""
+    outdir = tmp_path / "out"
+    (outdir / "sub").mkdir(parents=True)
+    fs_access = StdFsAccess(str(tmp_path))
+    index = DirectoryIndex()
+    for directory in (tmp_path, outdir, outdir / "sub"):
+        for _ in range(LIST_AFTER):
+            assert not index.exists(fs_access, str(directory / "new"))
+    (tmp_path / "new").touch()
+    (outdir / "new").touch()
+    (outdir / "sub" / "new").touch()
+    (tmp_path / "other").mkdir()
+    for _ in range(LIST_AFTER):
+        assert not index.exists(fs_access, str(tmp_path / "other" / "new"))
+    (tmp_path / "other" / "new").touch()
+
+    index.forget(str(outdir))
+    for directory in (tmp_path, outdir, outdir / "sub"):
+        assert index.exists(fs_access, str(directory / "new"))
+    assert not index.exists(fs_access, str(tmp_path / "other" / "new"))
+
+
+def test_directory_index_threads(tmp_path: Path) -> None:
+    """An index shared by threads gives the same answers as checking each file."""
+    dirs = [tmp_path / str(i) for i in range(4)]
+    for directory in dirs:
+        directory.mkdir()
+        for i in range(0, 20, 2):
+            (directory / f"{i}.bai").touch()
+    fs_access = StdFsAccess(str(tmp_path))
+    index = DirectoryIndex()
+
+    def check(directory: Path) -> bool:
+        for _ in range(LIST_AFTER):
+            for i in range(20):
+                fn = str(directory / f"{i}.bai")
+                if index.exists(fs_access, fn) != (i % 2 == 0):
+                    return False
+            index.forget(str(directory / "0.bai"))
+        return True
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert all(executor.map(check, 4 * dirs))
+
+
+def test_directory_index_overridden(tmp_path: Path, counted_scandir: List[str]) -> None:
+    """Filesystems other than the local one are asked for each file."""
+
+    class RemoteFsAccess(StdFsAccess):
+        def exists(self, fn: str) -> bool:
+            return fn.endswith(".bai")
+
+    fs_access = RemoteFsAccess(str(tmp_path))
+    index = DirectoryIndex()
+    for i in range(2 * LIST_AFTER):
+        assert index.exists(fs_access, f"{i}.bai")
+        assert not index.exists(fs_access, f"{i}.crai")
+    assert counted_scandir == []
+
+
+def test_secondary_files_listed_once(
+    tmp_path: Path, counted_scandir: List[str]
+) -> None:
+    """Secondary files of inputs in the same directory come from one listing."""
+    tool = tmp_path / "tool.cwl"
+    tool.write_text(
+        "cwlVersion: v1.1\n"
+        "class: CommandLineTool\n"
+        "inputs:\n"
+        "  reads:\n"
+        "    type: File[]\n"
+        "    secondaryFiles: [.bai?, ^.crai?]\n"
+        "outputs: []\n"
+        "baseCommand: echo\n"
+    )
+    data = tmp_path / "data"
+    data.mkdir()
+    reads = []  # type: MutableSequence[CWLOutputAtomType]
+    for i in range(20):
+        (data / f"{i}.bam").touch()
+        if i % 2:
+            (data / f"{i}.bam.bai").touch()
+        else:
+            (data / f"{i}.crai").touch()
+        reads.append({"class": "File", "location": (data / f"{i}.bam").as_uri()})
+    process = load_tool(
+        str(tool), LoadingContext({"construct_tool_object": default_make_tool})
+    )
+    builder = process._init_job(
+        {"reads": reads},
+        RuntimeContext(
+            {
+                "outdir": str(tmp_path),
+                "toplevel": True,
+                "directory_index": DirectoryIndex(),
+            }
+        ),
+    )
+    found = [
+        [sf["basename"] for sf in cast(List[CWLObjectType], read["secondaryFiles"])]
+        for read in cast(List[CWLObjectType], builder.job["reads"])
+    ]
+    assert found == [[f"{i}.bam.bai"] if i % 2 else [f"{i}.crai"] for i in range(20)]
+    assert counted_scandir == [str(data)]
@@ -0,0 +1,119 @@
+import json
+import re
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .util import get_main_output
+
+TOOL = """\
+cwlVersion: v1.1
+class: CommandLineTool
+requirements:
+  ResourceRequirement: {outdirMin: 2}
+inputs:
+  message: string
+  infile: File?
+baseCommand: [sh, -c]
+arguments: ["echo $(inputs.message) > out.txt"]
+outputs:
+  out:
+    type: File
+    outputBinding: {glob: out.txt}
+"""
+
+WORKFLOW = """\
+cwlVersion: v1.1
+class: Workflow
+inputs:
+  message: string
+outputs:
+  first: {type: File, outputSource: one/out}
+  second: {type: File, outputSource: two/out}
+  third: {type: File, outputSource: three/out}
+steps:
+  one:
+    run: tool.cwl
+    in: {message: {default: one}}
+    out: [out]
+  two:
+    run: tool.cwl
+    in: {message: {default: two}, infile: one/out}
+    out: [out]
+  three:
+    run: tool.cwl
+    in: {message: message}
+    out: [out]
+"""
+
+
+def run(tmp_path: Path, message: str, *args: str, cache: str = "cache") -> Any:
+    error_code, stdout, stderr = get_main_output(
+        [
+            "--cachedir",
+            str(tmp_path / cache),
+            "--outdir",
+            str(tmp_path / "out"),
+            *args,
+            str(tmp_path / "wf.cwl"),
+            "--message",
+            message,
+        ]
+    )
+    assert error_code == 0, stderr
+    return json.loads(stdout)
+
+
+def statuses(report: Any) -> Dict[str, str]:
+    # Job names are made unique within the process, which runs all the tests.
+    return {
+        re.sub(r"_[0-9]+$", "", step["name"]): step["status"]
+        for step in report["steps"]
+    }
+
+
+def hits(tmp_path: Path) -> List[int]:
+    db = sqlite3.connect(str(tmp_path / "cache" / "index.sqlite"))
+    try:
+        return [row[0] for row in db.execute("SELECT hits FROM jobs ORDER BY key")]
+    finally:
+        db.close()
+
+
+def test_dry_run(tmp_path: Path) -> None:
+    """A dry run tells which steps would run, without running any."""
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    (tmp_path / "wf.cwl").write_text(WORKFLOW)
+
+    report = run(tmp_path, "three", "--dry-run")
+    assert statuses(report) == {"one": "miss", "two": "unknown", "three": "miss"}
+    assert report["summary"]["estimated_bytes"] == 2 * 2 * 1024 * 1024
+    assert not (tmp_path / "out").exists()
+    assert hits(tmp_path) == []
+
+    run(tmp_path, "three")
+    before = hits(tmp_path)
+    contents = sorted((tmp_path / "cache").iterdir())
+    report = run(tmp_path, "three", "--dry-run")
+    assert statuses(report) == {"one": "hit", "two": "unknown", "three": "hit"}
+    assert report["summary"]["cached_bytes"] == len("one\nthree\n")
+    assert all(step["key"] for step in report["steps"] if step["status"] == "hit")
+    assert hits(tmp_path) == before
+    assert sorted((tmp_path / "cache").iterdir()) == contents
+
+    report = run(tmp_path, "changed", "--dry-run")
+    assert statuses(report) == {"one": "hit", "two": "unknown", "three": "miss"}
+    assert report["summary"]["miss"] == 1
+    assert sorted((tmp_path / "cache").iterdir()) == contents
+
+
+def test_dry_run_remote(tmp_path: Path) -> None:
+    """Entries that would be fetched from the remote cache are told apart."""
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    (tmp_path / "wf.cwl").write_text(WORKFLOW)
+    remote = str(tmp_path / "shared")
+    run(tmp_path, "three", "--remote-cache", remote)
+    report = run(
+        tmp_path, "three", "--remote-cache", remote, "--dry-run", cache="other"
+    )
+    assert statuses(report) == {"one": "remote", "two": "unknown", "three": "remote"}
@@ -0,0 +1,123 @@
+import errno
+import os
+import shutil
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+import cwltool.file_copy
+from cwltool.file_copy import copy2, copy_file, copytree
+
+from .util import get_main_output
+
+TOOL = """\
+cwlVersion: v1.0
+class: CommandLineTool
+inputs: []
+outputs:
+  out: stdout
+stdout: out.txt
+baseCommand: [echo, output]
+"""
+
+
+def make_file(path: Path, contents: bytes = b"contents\n") -> str:
+    path.write_bytes(contents)
+    path.chmod(0o750)
+    return str(path)
+
+
+def test_strategies(tmp_path: Path) -> None:
+    """Only the link strategy makes copies that are the same file."""
+    src = make_file(tmp_path / "src")
+    assert copy_file(src, str(tmp_path / "link"), "link") == "link"
+    assert os.path.samefile(src, str(tmp_path / "link"))
+    assert copy_file(src, str(tmp_path / "link"), "link") == "link"
+    assert copy_file(src, str(tmp_path / "copy"), "copy") == "copy"
+    assert copy_file(src, str(tmp_path / "reflink"), "reflink") in (
+        "reflink",
+        "copy_file_range",
+        "copy",
+    )
+    for name in ("copy", "reflink"):
+        assert not os.path.samefile(src, str(tmp_path / name))
+        assert (tmp_path / name).read_bytes() == b"contents\n"
+    with pytest.raises(shutil.SameFileError):
+        copy_file(src, src, "copy")
+
+
+def test_fallbacks(tmp_path: Path, monkeypatch: Any) -> None:
+    """Each method falls back to the next, and a byte copy to end with."""
+    tried = []  # type: List[str]
+
+    def unsupported(name: str, code: int) -> Any:
+        def method(*args: Any) -> None:
+            tried.append(name)
+            if not isinstance(args[1], str):
+                args[1].write(b"partial")
+            raise OSError(code, os.strerror(code))
+
+        return method
+
+    monkeypatch.setattr(os, "link", unsupported("link", errno.EXDEV))
+    monkeypatch.setattr(
+        cwltool.file_copy,
+        "_CLONERS",
+        {
+            "reflink": unsupported("reflink", errno.EOPNOTSUPP),
+            "copy_file_range": unsupported("copy_file_range", errno.ENOSYS),
+        },
+    )
+    src = make_file(tmp_path / "src")
+    assert copy_file(src, str(tmp_path / "dst"), "link") == "copy"
+    assert tried == ["link", "reflink", "copy_file_range"]
+    assert (tmp_path / "dst").read_bytes() == b"contents\n"
+
+    monkeypatch.setattr(
+        cwltool.file_copy,
+        "_CLONERS",
+        {"reflink": unsupported("reflink", errno.ENOSPC)},
+    )
+    with pytest.raises(OSError, match=os.strerror(errno.ENOSPC)):
+        copy_file(src, str(tmp_path / "dst"), "reflink")
+
+
+def test_copytree(tmp_path: Path) -> None:
+    """Directories are copied like shutil.copytree, modes included."""
+    (tmp_path / "src" / "sub").mkdir(parents=True)
+    make_file(tmp_path / "src" / "sub" / "a")
+    (tmp_path / "src" / "b").symlink_to(tmp_path / "src" / "sub" / "a")
+    copytree(str(tmp_path / "src"), str(tmp_path / "dst"), "copy")
+    for name in ("sub/a", "b"):
+        copied = tmp_path / "dst" / name
+        assert not copied.is_symlink()
+        assert copied.read_bytes() == b"contents\n"
+        assert copied.stat().st_mode & 0o777 == 0o750
+    (tmp_path / "into").mkdir()
+    dst = copy2(str(tmp_path / "src" / "b"), str(tmp_path / "into"), "reflink")
+    assert dst == str(tmp_path / "into" / "b")
+
+
+@pytest.mark.parametrize("strategy", ["link", "copy"])
+def test_cached_outputs(tmp_path: Path, strategy: str) -> None:
+    """Outputs of cache hits can be hardlinks to the cache."""
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    for outdir in ("first", "second"):
+        error_code, _, stderr = get_main_output(
+            [
+                "--cachedir",
+                str(tmp_path / "cache"),
+                "--copy-strategy",
+                strategy,
+                "--outdir",
+                str(tmp_path / outdir),
+                str(tmp_path / "tool.cwl"),
+            ]
+        )
+        assert error_code == 0, stderr
+    assert "Using cached output" in stderr
+    (blob,) = (tmp_path / "cache" / "blobs").glob("*/*")
+    output = tmp_path / "second" / "out.txt"
+    assert output.read_text() == "output\n"
+    assert os.path.samefile(str(blob), str(output)) == (strategy == "link")
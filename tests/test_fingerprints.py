@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+import cwltool.fingerprints
+from cwltool.fingerprints import FingerprintStore, fingerprints, local_path
+from cwltool.process import compute_checksums
+from cwltool.provenance import checksum_copy
+from cwltool.stdfsaccess import StdFsAccess
+from cwltool.utils import CWLObjectType
+
+from .util import get_main_output
+
+
+@pytest.fixture
+def store(tmp_path: Path, monkeypatch: Any) -> str:
+    """Keep checksums in a fresh database for the duration of a test."""
+    path = str(tmp_path / "fingerprints.sqlite")
+    monkeypatch.setenv("CWLTOOL_FINGERPRINTS", path)
+    monkeypatch.setattr(cwltool.fingerprints, "_store", None)
+    return path
+
+
+@pytest.fixture
+def opened(monkeypatch: Any) -> List[str]:
+    """Record the files that are opened to be hashed."""
+    paths = []  # type: List[str]
+
+    def counting_open(path: str, mode: str = "r") -> Any:
+        paths.append(path)
+        return open(path, mode)
+
+    monkeypatch.setattr(cwltool.fingerprints, "open", counting_open, raising=False)
+    return paths
+
+
+def make_old(path: Path, contents: bytes) -> str:
+    """Write a file last modified long enough ago to be remembered."""
+    path.write_bytes(contents)
+    os.utime(str(path), (1000000000, 1000000000))
+    return str(path)
+
+
+def test_unchanged_files(tmp_path: Path, store: str, opened: List[str]) -> None:
+    """Files are hashed once, and again only once they change."""
+    path = make_old(tmp_path / "data.txt", b"data")
+    sha1 = hashlib.sha1(b"data").hexdigest()  # nosec
+    assert fingerprints().checksum(path) == sha1
+    assert fingerprints().checksum(path) == sha1
+    assert FingerprintStore(store).known(path) == sha1
+    assert fingerprints().known(str(tmp_path / "missing")) is None
+    assert len(opened) == 1
+
+    make_old(tmp_path / "data.txt", b"more data")
+    assert fingerprints().known(path) is None
+    assert fingerprints().checksum(path) == hashlib.sha1(b"more data").hexdigest()
+    os.utime(path, (2000000000, 2000000000))
+    assert fingerprints().known(path) is None
+    assert fingerprints().checksum(path, "md5") == hashlib.md5(b"more data").hexdigest()
+    assert len(opened) == 3
+
+
+def test_racy_files(tmp_path: Path, store: str) -> None:
+    """Files modified just before being hashed are not remembered for long."""
+    path = tmp_path / "new.txt"
+    path.write_text("new")
+    fingerprints().checksum(str(path))
+    assert fingerprints().known(str(path)) is not None
+    assert FingerprintStore(store).known(str(path)) is None
+    assert FingerprintStore(None).known(str(path)) is None
+
+
+def test_local_path(tmp_path: Path) -> None:
+    """Only files read by the standard file system access are remembered."""
+
+    class RemoteFsAccess(StdFsAccess):
+        def _abs(self, p: str) -> str:
+            return "s3://bucket/" + p
+
+    fs_access = StdFsAccess(str(tmp_path))
+    assert local_path(fs_access, "a.txt") == str(tmp_path / "a.txt")
+    assert local_path(fs_access, (tmp_path / "b").as_uri()) == str(tmp_path / "b")
+    assert local_path(fs_access, "http://example.com/a.txt") is None
+    assert local_path(RemoteFsAccess(str(tmp_path)), "a.txt") is None
+
+
+def test_compute_checksums(tmp_path: Path, store: str, opened: List[str]) -> None:
+    """Input checksums are reused between runs."""
+    path = make_old(tmp_path / "input.txt", b"input")
+    for _ in range(2):
+        fileobj = {
+            "class": "File",
+            "location": Path(path).as_uri(),
+        }  # type: CWLObjectType
+        compute_checksums(StdFsAccess(""), fileobj)
+        assert fileobj == {
+            "class": "File",
+            "location": Path(path).as_uri(),
+            "checksum": "sha1$" + hashlib.sha1(b"input").hexdigest(),  # nosec
+            "size": 5,
+        }
+    assert opened == [path]
+
+
+def test_checksum_copy(tmp_path: Path, store: str) -> None:
+    """Research objects use the checksums of the files they are given."""
+    path = make_old(tmp_path / "data.txt", b"data")
+    sha1 = hashlib.sha1(b"data").hexdigest()  # nosec
+    with open(path, "rb") as handle:
+        assert checksum_copy(handle) == sha1
+    assert FingerprintStore(store).known(path) == sha1
+    with open(path, "rb") as handle:
+        handle.read = None  # type: ignore
+        assert checksum_copy(handle) == sha1
+    assert checksum_copy(BytesIO(b"data")) == sha1
+
+
+def test_collect_output(tmp_path: Path, store: str, opened: List[str]) -> None:
+    """Output checksums are computed through the store."""
+    (tmp_path / "tool.cwl").write_text(
+        "cwlVersion: v1.0\n"
+        "class: CommandLineTool\n"
+        "inputs: []\n"
+        "outputs:\n"
+        "  out: stdout\n"
+        "stdout: out.txt\n"
+        "baseCommand: [echo, output]\n"
+    )
+    error_code, stdout, stderr = get_main_output(
+        ["--outdir", str(tmp_path / "out"), str(tmp_path / "tool.cwl")]
+    )
+    assert error_code == 0, stderr
+    output = json.loads(stdout)["out"]
+    assert output["checksum"] == "sha1$" + hashlib.sha1(b"output\n").hexdigest()
+    assert [os.path.basename(path) for path in opened] == ["out.txt"]
@@ -0,0 +1,76 @@
+import random
+from typing import Any, List
+
+import pytest
+from rdflib import Graph, URIRef
+from rdflib.namespace import OWL, RDFS
+from schema_salad.exceptions import ValidationException
+
+import cwltool.builder
+from cwltool.builder import check_format, format_is_subclass, formatSubclassOf
+from cwltool.utils import CWLObjectType
+
+EDAM = "http://edamontology.org/"
+
+
+def random_ontology(seed: int, size: int) -> Graph:
+    rand = random.Random(seed)
+    ontology = Graph()
+    for i in range(1, size):
+        fmt = URIRef(f"{EDAM}format_{i}")
+        for parent in rand.sample(range(i), min(i, rand.randint(1, 2))):
+            ontology.add((fmt, RDFS.subClassOf, URIRef(f"{EDAM}format_{parent}")))
+        if rand.random() < 0.1:
+            other = URIRef(f"{EDAM}format_{rand.randrange(size)}")
+            ontology.add((fmt, OWL.equivalentClass, other))
+    return ontology
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_format_is_subclass(seed: int) -> None:
+    """Remembered answers are the same as walking the ontology."""
+    ontology = random_ontology(seed, 30)
+    formats = [f"{EDAM}format_{i}" for i in range(32)]
+    for _ in range(2):
+        for fmt in formats:
+            for cls in formats:
+                assert format_is_subclass(fmt, cls, ontology) == formatSubclassOf(
+                    fmt, cls, ontology, set()
+                ), (fmt, cls)
+
+
+def test_check_format_walks_once(monkeypatch: Any) -> None:
+    """Files of the same format only walk the ontology once."""
+    ontology = random_ontology(4, 30)
+    walks = []  # type: List[Any]
+
+    def counting_walk(*args: Any) -> bool:
+        if not args[3]:
+            walks.append(args[:2])
+        return formatSubclassOf(*args)
+
+    monkeypatch.setattr(cwltool.builder, "formatSubclassOf", counting_walk)
+    files = [
+        {"class": "File", "location": f"file:///{i}.txt", "format": f"{EDAM}format_29"}
+        for i in range(100)
+    ]  # type: List[CWLObjectType]
+    for afile in files:
+        check_format(afile, [f"{EDAM}format_0"], ontology)
+    assert walks == [(f"{EDAM}format_29", f"{EDAM}format_0")]
+
+
+def test_format_ontology_changes() -> None:
+    """Triples added to the ontology are taken into account."""
+    ontology = Graph()
+    fastq, sequence = f"{EDAM}format_1930", f"{EDAM}format_2182"
+    reads = {
+        "class": "File",
+        "location": "file:///a.fastq",
+        "format": fastq,
+    }  # type: CWLObjectType
+    with pytest.raises(ValidationException, match="incompatible format"):
+        check_format([reads], sequence, ontology)
+    ontology.add((URIRef(fastq), RDFS.subClassOf, URIRef(sequence)))
+    check_format([reads], [f"{EDAM}format_1929", sequence], ontology)
+    assert not format_is_subclass(sequence, fastq, ontology)
+    assert not format_is_subclass(fastq, sequence, None)
@@ -0,0 +1,81 @@
+"""Startup checks and benchmark for ``import cwltool.main``."""
+
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+import pytest
+
+# Modules that must only be imported when their feature is used.
+LAZY_MODULES = (
+    "argcomplete",
+    "bagit",
+    "coloredlogs",
+    "cwltool.cwlrdf",
+    "cwltool.cwlviewer",
+    "cwltool.provenance",
+    "cwltool.provenance_profile",
+    "cwltool.software_requirements",
+    "cwltool.udocker",
+    "prov.model",
+    "pydot",
+)
+
+# Cumulative import time of cwltool.main, in microseconds, that counts as a
+# regression. Timings are only meaningful on a quiet machine, so the
+# benchmark only runs when a budget is given.
+IMPORT_BUDGET_US = os.environ.get("CWLTOOL_IMPORT_BUDGET_US")
+
+
+def imported_modules() -> List[str]:
+    """Give the modules in sys.modules after ``import cwltool.main``."""
+    code = "import json, sys, cwltool.main; print(json.dumps(list(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return list(json.loads(result.stdout))
+
+
+def import_times() -> Dict[str, int]:
+    """Run ``python -X importtime -c 'import cwltool.main'`` and parse it."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import cwltool.main"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}  # type: Dict[str, int]
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        times[fields[2].strip()] = int(fields[1])
+    return times
+
+
+def test_lazy_imports() -> None:
+    """Optional features are not imported at startup."""
+    modules = imported_modules()
+    assert "cwltool.main" in modules
+    eager = sorted(set(LAZY_MODULES) & set(modules))
+    assert not eager, f"imported at startup: {eager}"
+
+
+@pytest.mark.skipif(
+    IMPORT_BUDGET_US is None, reason="set CWLTOOL_IMPORT_BUDGET_US to benchmark"
+)
+def test_import_time_budget() -> None:
+    """Importing cwltool.main stays within the startup-time budget."""
+    budget = int(IMPORT_BUDGET_US or 0)
+    elapsed = min(import_times()["cwltool.main"] for _ in range(3))
+    assert (
+        elapsed < budget
+    ), f"import cwltool.main took {elapsed}us, budget is {budget}us"
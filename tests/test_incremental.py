@@ -0,0 +1,124 @@
+import json
+import re
+from pathlib import Path
+from typing import Any, Tuple
+
+from .util import get_main_output
+
+SIZE = """\
+cwlVersion: v1.1
+class: CommandLineTool
+inputs:
+  infile: File
+baseCommand: [sh, -c]
+arguments: ["wc -c < $(inputs.infile.path) | tr -d ' ' > size.txt"]
+outputs:
+  out:
+    type: File
+    outputBinding: {glob: size.txt}
+"""
+
+ECHO = """\
+cwlVersion: v1.1
+class: CommandLineTool
+inputs:
+  infile: File
+baseCommand: [sh, -c]
+arguments: ["echo $(inputs.infile.basename) > echo.txt"]
+outputs:
+  out:
+    type: File
+    outputBinding: {glob: echo.txt}
+"""
+
+WORKFLOW = """\
+cwlVersion: v1.1
+class: Workflow
+inputs:
+  infile: File
+outputs:
+  size: {type: File, outputSource: size/out}
+  echo: {type: File, outputSource: echo/out}
+  other: {type: File, outputSource: other/out}
+steps:
+  size:
+    run: size.cwl
+    in: {infile: infile}
+    out: [out]
+  echo:
+    run: echo.cwl
+    in: {infile: size/out}
+    out: [out]
+  other:
+    run: echo.cwl
+    in: {infile: infile}
+    out: [out]
+"""
+
+
+def run(tmp_path: Path) -> Tuple[Any, str]:
+    error_code, stdout, stderr = get_main_output(
+        [
+            "--incremental",
+            str(tmp_path / "state"),
+            "--outdir",
+            str(tmp_path / "out"),
+            str(tmp_path / "wf.cwl"),
+            "--infile",
+            str(tmp_path / "input.txt"),
+        ]
+    )
+    assert error_code == 0, stderr
+    return json.loads(stdout), stderr
+
+
+def logged(stderr: str, step: str, message: str) -> bool:
+    # Step names are made unique within the process, which runs all the tests.
+    return re.search(r"\[step %s(_[0-9]+)?\] %s" % (step, message), stderr) is not None
+
+
+def test_incremental(tmp_path: Path) -> None:
+    """Only the steps that changed, and those depending on them, are rerun."""
+    (tmp_path / "size.cwl").write_text(SIZE)
+    (tmp_path / "echo.cwl").write_text(ECHO)
+    (tmp_path / "wf.cwl").write_text(WORKFLOW)
+    (tmp_path / "input.txt").write_text("input\n")
+
+    first, stderr = run(tmp_path)
+    assert stderr.count("[job") > 0
+    assert "up to date" not in stderr
+
+    second, stderr = run(tmp_path)
+    assert stderr.count("up to date, using the outputs of the last run") == 3
+    assert "[job" not in stderr
+    assert (tmp_path / "out" / "size.txt").read_text() == "6\n"
+    for name in ("size", "echo", "other"):
+        assert second[name]["checksum"] == first[name]["checksum"]
+
+    # Same size: the size step reruns, but the echo step after it doesn't.
+    (tmp_path / "input.txt").write_text("INPUT\n")
+    _, stderr = run(tmp_path)
+    assert logged(stderr, "size", "inputs changed since the last run")
+    assert logged(stderr, "other", "inputs changed since the last run")
+    assert logged(stderr, "echo", "up to date")
+
+    (tmp_path / "size.cwl").write_text(SIZE.replace("wc -c", "wc -l"))
+    _, stderr = run(tmp_path)
+    assert logged(stderr, "size", "changed since the last run")
+    assert logged(stderr, "echo", "inputs changed since the last run")
+    assert logged(stderr, "other", "up to date")
+    assert (tmp_path / "out" / "size.txt").read_text() == "1\n"
+
+
+def test_changed_output(tmp_path: Path) -> None:
+    """Steps whose recorded outputs were modified are rerun."""
+    (tmp_path / "size.cwl").write_text(SIZE)
+    (tmp_path / "echo.cwl").write_text(ECHO)
+    (tmp_path / "wf.cwl").write_text(WORKFLOW)
+    (tmp_path / "input.txt").write_text("input\n")
+    run(tmp_path)
+    (tmp_path / "out" / "size.txt").write_text("modified\n")
+    _, stderr = run(tmp_path)
+    assert logged(stderr, "size", "outputs changed since the last run")
+    assert (tmp_path / "out" / "size.txt").read_text() == "6\n"
+    assert len(list((tmp_path / "state" / "outputs").iterdir())) == 3
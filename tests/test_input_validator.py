@@ -0,0 +1,95 @@
+import logging
+from typing import Any, Dict, List
+
+import pytest
+from schema_salad.avro.schema import RecordSchema
+from schema_salad.exceptions import ValidationException
+from schema_salad.validate import validate_ex
+
+from cwltool.context import LoadingContext, RuntimeContext
+from cwltool.errors import WorkflowException
+from cwltool.input_validator import InputValidator, compile_schema
+from cwltool.load_tool import load_tool
+from cwltool.utils import CWLObjectType
+
+from .util import get_data
+
+SAMPLES = [
+    None,
+    True,
+    3,
+    1 << 40,
+    1.5,
+    "text",
+    "$(inputs.x)",
+    [],
+    ["a", None],
+    {},
+    {"class": "File", "location": "file:///a.txt"},
+    {"class": "File", "location": "file:///a.txt", "size": "big"},
+    {"class": "File", "location": "file:///a.txt", "unknown": 1},
+    {"class": "File", "location": "file:///a.txt", "http://example.com/ext": 1},
+    {"class": "Directory", "location": "file:///d"},
+    [{"class": "File", "location": "file:///a.txt"}],
+]  # type: List[Any]
+
+
+@pytest.mark.parametrize(
+    "tool", ["tests/wf/cat.cwl", "tests/wf/scatter2.cwl", "tests/wf/formattest.cwl"]
+)
+def test_compiled_checks(tool: str) -> None:
+    """Compiled checks never accept what validate_ex rejects."""
+    process = load_tool(get_data(tool), LoadingContext())
+    schema = process.names.get_name("input_record_schema", None)
+    assert isinstance(schema, RecordSchema)
+    quiet = logging.getLogger("test_compiled_checks")
+    quiet.addHandler(logging.NullHandler())
+    quiet.propagate = False
+    compiled = {}  # type: Dict[int, Any]
+    for field in schema.fields:
+        check = compile_schema(field.type, compiled)
+        for sample in SAMPLES:
+            if check(sample):
+                assert validate_ex(
+                    field.type, sample, strict=False, raise_ex=False, logger=quiet
+                ), (field.name, sample)
+
+
+def test_shared_inputs_validated_once(tmp_path: Any) -> None:
+    """Jobs sharing an input value only check it once."""
+    process = load_tool(get_data("tests/wf/cat.cwl"), LoadingContext())
+    runtime_context = RuntimeContext({"outdir": str(tmp_path)})
+    shared = {
+        "class": "File",
+        "location": get_data("tests/wf/hello.txt"),
+    }  # type: CWLObjectType
+    process._init_job({"r": shared}, runtime_context)
+    validator = process.input_validator
+    assert isinstance(validator, InputValidator)
+
+    checked = []  # type: List[Any]
+    name, check, default = validator.fields[0]
+
+    def counting_check(datum: Any) -> bool:
+        checked.append(datum)
+        return check(datum)
+
+    validator.fields[0] = (name, counting_check, default)
+    process._init_job({"r": shared}, runtime_context)
+    assert checked == []
+    process._init_job({"r": dict(shared)}, runtime_context)
+    assert len(checked) == 1
+
+
+def test_invalid_job_order(tmp_path: Any) -> None:
+    """Invalid job orders still get validate_ex's error message."""
+    process = load_tool(get_data("tests/wf/cat.cwl"), LoadingContext())
+    schema = process.names.get_name("input_record_schema", None)
+    assert schema is not None
+    with pytest.raises(ValidationException) as expected:
+        validate_ex(schema, {"r": "not a file"}, strict=False)
+    with pytest.raises(WorkflowException) as raised:
+        process._init_job(
+            {"r": "not a file"}, RuntimeContext({"outdir": str(tmp_path)})
+        )
+    assert str(expected.value) in str(raised.value)
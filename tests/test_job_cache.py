@@ -0,0 +1,384 @@
+import json
+import os
+import shutil
+import sqlite3
+import stat
+from pathlib import Path
+from typing import List, cast
+
+import pytest
+
+from cwltool.job_cache import JobCache, file_checksum, parse_size
+
+from .util import get_main_output
+
+TOOL = """\
+cwlVersion: v1.1
+class: CommandLineTool
+inputs:
+  message: string
+baseCommand: [sh, -c]
+arguments:
+  - >-
+    mkdir $(inputs.message) && cd $(inputs.message) && mkdir sub empty &&
+    echo $(inputs.message) > sub/message.txt &&
+    echo shared > common.txt &&
+    echo '#!/bin/sh' > run.sh && chmod +x run.sh &&
+    ln -s sub/message.txt link.txt
+outputs:
+  result:
+    type: Directory
+    outputBinding: {glob: $(inputs.message)}
+"""
+
+WORKFLOW = """\
+cwlVersion: v1.1
+class: Workflow
+inputs: []
+outputs:
+  first: {type: Directory, outputSource: one/result}
+  second: {type: Directory, outputSource: two/result}
+steps:
+  one:
+    run: tool.cwl
+    in: {message: {default: one}}
+    out: [result]
+  two:
+    run: tool.cwl
+    in: {message: {default: two}}
+    out: [result]
+"""
+
+
+CHAINED = """\
+cwlVersion: v1.1
+class: Workflow
+inputs: []
+outputs:
+  counted: {type: File, outputSource: count/counted}
+steps:
+  make:
+    run: tool.cwl
+    in: {message: {default: one}}
+    out: [result]
+  count:
+    run:
+      class: CommandLineTool
+      inputs:
+        dir: Directory
+      baseCommand: [sh, -c]
+      arguments: ["wc -c < $(inputs.dir.path)/sub/message.txt"]
+      stdout: counted.txt
+      outputs:
+        counted: stdout
+    in: {dir: make/result}
+    out: [counted]
+"""
+
+
+def blobs(cachedir: Path) -> List[str]:
+    return sorted(p.name for p in (cachedir / "blobs").glob("*/*") if p.is_file())
+
+
+def listing(directory: Path) -> List[str]:
+    return sorted(
+        "{} {}".format(
+            p.relative_to(directory),
+            os.readlink(str(p)) if p.is_symlink() else oct(p.stat().st_mode),
+        )
+        for p in directory.rglob("*")
+    )
+
+
+def run(tmp_path: Path, outdir: str, *options: str) -> str:
+    error_code, stdout, stderr = get_main_output(
+        [
+            "--cachedir",
+            str(tmp_path / "cache"),
+            "--outdir",
+            str(tmp_path / outdir),
+            *options,
+            str(tmp_path / "wf.cwl"),
+        ]
+    )
+    assert error_code == 0, stderr
+    return stderr
+
+
+def test_job_cache(tmp_path: Path) -> None:
+    """Outputs are reused from the cache, and identical files stored once."""
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    (tmp_path / "wf.cwl").write_text(WORKFLOW)
+    cachedir = tmp_path / "cache"
+
+    stderr = run(tmp_path, "first")
+    assert stderr.count("Output of job will be cached in") == 2
+    contents = {b"one\n", b"two\n", b"shared\n", b"#!/bin/sh\n"}
+    files = [
+        p for p in (tmp_path / "first").rglob("*") if p.is_file() and not p.is_symlink()
+    ]
+    assert len(files) == 8
+    assert blobs(cachedir) == sorted({file_checksum(str(p))[5:] for p in files})
+    assert len(blobs(cachedir)) == len(contents)
+    assert sorted(p.name for p in cachedir.iterdir()) == [
+        "blobs",
+        "index.sqlite",
+        "locks",
+    ]
+
+    stderr = run(tmp_path, "second")
+    assert "Output of job will be cached in" not in stderr
+    assert stderr.count("Using cached output in") == 2
+    assert listing(tmp_path / "first") == listing(tmp_path / "second")
+    for name in ("one", "two"):
+        message = tmp_path / "second" / name / "link.txt"
+        assert message.read_text() == f"{name}\n"
+        assert os.access(str(tmp_path / "second" / name / "run.sh"), os.X_OK)
+    assert (tmp_path / "second" / "one" / "empty").is_dir()
+
+    for blob in (cachedir / "blobs").glob("*/*"):
+        blob.unlink()
+    stderr = run(tmp_path, "third")
+    assert stderr.count("Cached output is incomplete, rerunning") == 2
+    assert listing(tmp_path / "first") == listing(tmp_path / "third")
+    assert len(blobs(cachedir)) == len(contents)
+
+
+@pytest.mark.parametrize("parallel", [[], ["--parallel"]])
+def test_job_cache_chained(tmp_path: Path, parallel: List[str]) -> None:
+    """Steps after a hit are hits too, and hits leave nothing in the cache."""
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    (tmp_path / "wf.cwl").write_text(CHAINED)
+    run(tmp_path, "first", *parallel)
+    for outdir in ("second", "third"):
+        stderr = run(tmp_path, outdir, *parallel)
+        assert "Output of job will be cached in" not in stderr
+        assert stderr.count("Using cached output in") == 2
+        assert (tmp_path / outdir / "counted.txt").read_text().strip() == "4"
+        assert sorted(p.name for p in (tmp_path / "cache").iterdir()) == [
+            "blobs",
+            "index.sqlite",
+            "locks",
+        ]
+
+
+def test_job_cache_max_size(tmp_path: Path) -> None:
+    """Runs keep the cache within its size limit, keeping their newest entry."""
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    (tmp_path / "wf.cwl").write_text(WORKFLOW)
+    run(tmp_path, "first", "--cache-max-size", "0")
+    stderr = run(tmp_path, "second")
+    assert stderr.count("Output of job will be cached in") == 1
+    assert stderr.count("Using cached output in") == 1
+
+
+def test_job_cache_store(tmp_path: Path) -> None:
+    """Manifests describe the output directory they were made from."""
+    outdir = tmp_path / "out"
+    (outdir / "a" / "b").mkdir(parents=True)
+    (outdir / "a" / "x.txt").write_text("x")
+    (outdir / "a" / "b" / "y.txt").write_text("x")
+    (outdir / "tool").write_text("#!/bin/sh\n")
+    (outdir / "tool").chmod(0o755)
+    (outdir / "inside").symlink_to(outdir / "a" / "b")
+    (outdir / "outside").symlink_to("/etc/hostname")
+    cache = JobCache(str(tmp_path / "cache"))
+    manifest = cache.store("key", str(outdir))
+    assert cache.lookup("key") == manifest
+    assert cache.lookup("other") is None
+    assert [(e["path"], e["class"]) for e in manifest] == [
+        ("a", "Directory"),
+        ("inside", "Link"),
+        ("outside", "Link"),
+        ("tool", "File"),
+        (os.path.join("a", "b"), "Directory"),
+        (os.path.join("a", "x.txt"), "File"),
+        (os.path.join("a", "b", "y.txt"), "File"),
+    ]
+    assert manifest[1]["target"] == os.path.join("a", "b")
+    assert manifest[2]["target"] == "/etc/hostname"
+    assert json.loads(json.dumps(manifest)) == manifest
+    assert len(blobs(tmp_path / "cache")) == 2
+
+    restored = tmp_path / "restored"
+    restored.mkdir()
+    cache.materialize(manifest, str(restored))
+    assert listing(restored) == [
+        line.replace(str(outdir / "a" / "b"), os.path.join("a", "b"))
+        for line in listing(outdir)
+    ]
+    assert (restored / "inside" / "y.txt").read_text() == "x"
+    assert stat.S_IMODE((restored / "tool").stat().st_mode) & stat.S_IXUSR
+
+    cache.remove("key")
+    assert cache.lookup("key") is None
+
+
+def make_outputs(directory: Path, **files: str) -> str:
+    directory.mkdir(parents=True)
+    for name, contents in files.items():
+        (directory / name).write_text(contents)
+    return str(directory)
+
+
+def store(cache: JobCache, key: str, outdir: str) -> None:
+    """Store outputs, then remove them as the end of a run does."""
+    cache.store(key, outdir)
+    shutil.rmtree(outdir)
+
+
+def test_job_cache_eviction(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The least recently used entries go first, and shared files stay."""
+    clock = [1000.0]
+    monkeypatch.setattr("cwltool.job_cache.time.time", lambda: clock[0])
+    cache = JobCache(str(tmp_path / "cache"))
+    for key, size in (("a", 100), ("b", 200), ("c", 300)):
+        clock[0] += 1
+        outdir = make_outputs(tmp_path / key, data=key * size, common="x" * 1000)
+        store(cache, key, outdir)
+    clock[0] += 1
+    assert cache.lookup("a") is not None
+    assert len(blobs(tmp_path / "cache")) == 4
+
+    assert cache.evict(max_size=1600) == {
+        "evicted": 0,
+        "freed": 0,
+        "entries": 3,
+        "size": 1600,
+    }
+    assert cache.evict(max_size=1500) == {
+        "evicted": 1,
+        "freed": 200,
+        "entries": 2,
+        "size": 1400,
+    }
+    assert cache.lookup("b") is None
+
+    # Entries in use by a job are kept.
+    lock = cache.lock("c")
+    assert cache.evict(max_size=1100)["evicted"] == 1
+    lock.close()
+    assert cache.lookup("a") is None
+    assert cache.lookup("c") is not None
+    assert len(blobs(tmp_path / "cache")) == 2
+
+    clock[0] += 2 * 24 * 60 * 60
+    assert cache.evict(max_age=3)["evicted"] == 0
+    assert cache.evict(max_age=1) == {
+        "evicted": 1,
+        "freed": 1300,
+        "entries": 0,
+        "size": 0,
+    }
+    assert blobs(tmp_path / "cache") == []
+
+
+def test_job_cache_lfu(tmp_path: Path) -> None:
+    """Entries can be evicted by how often they were used."""
+    cache = JobCache(str(tmp_path / "cache"))
+    for key in ("a", "b", "c"):
+        cache.store(key, make_outputs(tmp_path / key, data=key * 10))
+    for key in ("a", "a", "b", "c", "c", "c"):
+        cache.lookup(key)
+    assert cache.evict(max_size=10, order="lfu")["evicted"] == 2
+    assert [cache.lookup(key) is not None for key in "abc"] == [False, False, True]
+
+
+def test_job_cache_upgrade(tmp_path: Path) -> None:
+    """Indexes made before entries were accounted for are upgraded."""
+    cachedir = tmp_path / "cache"
+    cachedir.mkdir()
+    manifest = [
+        {
+            "path": "data",
+            "class": "File",
+            "checksum": "sha1$" + "0" * 40,
+            "size": 5,
+            "executable": False,
+        }
+    ]
+    db = sqlite3.connect(str(cachedir / "index.sqlite"))
+    db.execute(
+        "CREATE TABLE jobs ("
+        "key TEXT PRIMARY KEY, manifest TEXT NOT NULL, created REAL NOT NULL)"
+    )
+    db.execute("INSERT INTO jobs VALUES ('key', ?, 1000)", (json.dumps(manifest),))
+    db.execute("PRAGMA user_version = 1")
+    db.commit()
+    db.close()
+    cache = JobCache(str(cachedir))
+    assert cache.lookup("key") == manifest
+    assert cache.evict(max_size=5)["size"] == 5
+    assert cache.evict(max_size=4) == {
+        "evicted": 1,
+        "freed": 0,
+        "entries": 0,
+        "size": 0,
+    }
+
+
+def test_cache_gc(tmp_path: Path) -> None:
+    """cwltool --cache-gc trims the cache and exits."""
+    cachedir = tmp_path / "cache"
+    cache = JobCache(str(cachedir))
+    for key in ("a", "b"):
+        store(cache, key, make_outputs(tmp_path / key, data=key * 10))
+    cache.lookup("b")
+    cache.lock("b").close()
+    (cachedir / "blobs" / "00").mkdir()
+    (cachedir / "blobs" / "00" / ("0" * 40)).write_text("left over")
+    (cachedir / "locks" / "gone").touch()
+    error_code, stdout, stderr = get_main_output(
+        ["--cache-gc", "--cachedir", str(cachedir), "--cache-max-size", "15"]
+    )
+    assert error_code == 0, stderr
+    assert json.loads(stdout) == {"evicted": 1, "freed": 19, "entries": 1, "size": 10}
+    assert sorted(p.name for p in (cachedir / "locks").iterdir()) == ["b"]
+    assert len(blobs(cachedir)) == 1
+    assert cache.lookup("b") is not None
+
+    error_code, _, stderr = get_main_output(["--cache-gc"])
+    assert error_code == 1
+    assert "--cache-gc needs --cachedir" in stderr
+
+
+def test_cache_gc_work_directories(tmp_path: Path) -> None:
+    """Directories of processes that exited are reclaimed, and counted."""
+    cachedir = tmp_path / "cache"
+    cache = JobCache(str(cachedir))
+    manifest = cache.store("a", make_outputs(tmp_path / "a", data="a" * 10))
+    shutil.rmtree(str(tmp_path / "a"))
+    live = cache.mkdtemp("a")
+    assert os.path.basename(live).startswith(cast(str, cache.owner) + "-a-")
+    cache.materialize(manifest, live)
+
+    (cachedir / "locks" / "owner-dead").touch()
+    make_outputs(cachedir / "dead-b-x", data="b" * 20)
+    (cachedir / "dead-b-x" / "restored").mkdir()
+    cache.materialize(manifest, str(cachedir / "dead-b-x" / "restored"))
+    make_outputs(cachedir / "tmpold", data="c" * 30)
+    os.utime(str(cachedir / "tmpold"), (1000, 1000))
+    make_outputs(cachedir / "tmpnew", data="d" * 40)
+
+    # Another process, as far as locks go.
+    other = JobCache(str(cachedir))
+    stats = other.collect_garbage(max_size=0)
+    assert stats == {"evicted": 1, "freed": 50, "entries": 0, "size": 0}
+    assert sorted(p.name for p in cachedir.iterdir()) == sorted(
+        ["blobs", "index.sqlite", "locks", os.path.basename(live), "tmpnew"]
+    )
+    assert sorted(p.name for p in (cachedir / "locks").iterdir()) == [
+        "owner-" + cast(str, cache.owner)
+    ]
+    assert (Path(live) / "data").read_text() == "a" * 10
+
+
+def test_parse_size() -> None:
+    assert parse_size("0") == 0
+    assert parse_size("1500") == 1500
+    assert parse_size("2k") == 2048
+    assert parse_size("1.5G") == 1536 * 1024 * 1024
+    assert parse_size("3TB") == 3 << 40
+    for text in ("", "G", "-1", "ten"):
+        with pytest.raises(ValueError):
+            parse_size(text)
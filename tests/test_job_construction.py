@@ -0,0 +1,94 @@
+"""Building a ``CommandLineTool.job`` must not copy its input Files."""
+
+import tracemalloc
+from pathlib import Path
+from typing import Any, Tuple
+
+from cwltool.context import LoadingContext, RuntimeContext
+from cwltool.load_tool import load_tool
+from cwltool.mutation import MutationManager
+from cwltool.process import Process
+from cwltool.workflow import default_make_tool
+
+TOOL = """\
+cwlVersion: v1.0
+class: CommandLineTool
+inputs:
+  files:
+    type: File[]
+    inputBinding: {position: 1}
+  more:
+    type:
+      type: array
+      items: File
+      inputBinding: {prefix: -i}
+outputs: []
+baseCommand: echo
+"""
+
+
+def make_tool(tmp_path: Path, count: int) -> Tuple[Process, Any]:
+    """Write a tool taking arrays of Files, and a job order for it."""
+    tmp_path.mkdir(exist_ok=True)
+    tool = tmp_path / "tool.cwl"
+    tool.write_text(TOOL)
+    files = []
+    for i in range(count):
+        path = tmp_path / f"input{i}.txt"
+        path.touch()
+        files.append({"class": "File", "location": path.as_uri()})
+    return (
+        load_tool(
+            str(tool), LoadingContext({"construct_tool_object": default_make_tool})
+        ),
+        {"files": files, "more": files[: count // 2]},
+    )
+
+
+def construct_job(tool: Process, job_order: Any, tmp_path: Path) -> Any:
+    runtime_context = RuntimeContext(
+        {
+            "outdir": str(tmp_path / "out"),
+            "tmpdir_prefix": str(tmp_path / "tmp"),
+            "mutation_manager": MutationManager(),
+        }
+    )
+    return next(tool.job(job_order, lambda out, status: None, runtime_context))
+
+
+def peak_allocations(tmp_path: Path, count: int) -> int:
+    """Peak allocations, in bytes, of building a job."""
+    tool, job_order = make_tool(tmp_path, count)
+    construct_job(tool, job_order, tmp_path)
+    tracemalloc.start()
+    try:
+        construct_job(tool, job_order, tmp_path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def test_job_construction_scales(tmp_path: Path) -> None:
+    """Building a job takes memory linear in its number of Files."""
+    small = peak_allocations(tmp_path / "small", 250)
+    large = peak_allocations(tmp_path / "large", 1000)
+    # Four times the Files; copying the job for every binding made this
+    # sixteen times bigger.
+    assert large < 8 * small, f"{small} bytes -> {large} bytes"
+
+
+def test_bindings_share_job_files(tmp_path: Path) -> None:
+    """Command line bindings refer to the job's Files rather than copies."""
+    tool, job_order = make_tool(tmp_path, 100)
+    job = construct_job(tool, job_order, tmp_path)
+    inputs = job.builder.job
+    job_files = {id(f) for f in inputs["files"] + inputs["more"]}
+    data = [b["datum"] for b in job.builder.bindings]
+    assert any(d is inputs["files"] for d in data)
+    assert not any(d is job_order["files"] for d in data)
+    files = [d for d in data if isinstance(d, dict)]
+    assert len(files) == 100 + 50
+    assert {id(f) for f in files} <= job_files
+    assert job.command_line[0] == "echo"
+    assert len(job.command_line) == 1 + 100 + 2 * 50
@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import pytest
+from schema_salad.utils import json_dumps
+
+from cwltool.load_tool import default_loader
+from cwltool.main import load_plain_job_order
+
+from .util import get_data
+
+
+@pytest.mark.parametrize(
+    "job_order",
+    [
+        "tests/wf/revsort-job.json",
+        "tests/wf/formattest-job.json",
+        "tests/wf/scatter-job2.json",
+        "tests/wf/wc-job.json",
+    ],
+)
+def test_plain_job_order(job_order: str) -> None:
+    """Plain job orders load the same with and without the full loader."""
+    path = get_data(job_order)
+    plain = load_plain_job_order(path, default_loader())
+    assert plain is not None
+    full, _ = default_loader().resolve_ref(path, checklinks=False)
+    assert json_dumps(plain, sort_keys=True) == json_dumps(full, sort_keys=True)
+
+
+def test_plain_job_order_prefixes(tmp_path: Path) -> None:
+    """Known prefixes are expanded and odd references left to the loader."""
+    job = tmp_path / "job.yml"
+    job.write_text(
+        "cwl:tool: tool.cwl\n"
+        "a: {class: File, path: sub dir/a.txt}\n"
+        "b: {class: Directory, location: ../up/}\n"
+        "c: [{class: File, location: 'http://example.com/c'}, {class: File, path: /abs}]\n"
+    )
+    plain = load_plain_job_order(str(job), default_loader())
+    assert plain is not None
+    full, _ = default_loader().resolve_ref(str(job), checklinks=False)
+    assert json_dumps(plain, sort_keys=True) == json_dumps(full, sort_keys=True)
+
+
+@pytest.mark.parametrize(
+    "contents",
+    [
+        "a:\n  $import: other.yml\n",
+        "$namespaces: {edam: 'http://edamontology.org/'}\na: 1\n",
+        "edam:x: 1\n",
+        "a: {id: '#x'}\n",
+        "- 1\n",
+        "a: [unclosed\n",
+    ],
+)
+def test_plain_job_order_fallback(tmp_path: Path, contents: str) -> None:
+    """Job orders using loader features are left to the full loader."""
+    job = tmp_path / "job.yml"
+    job.write_text(contents)
+    assert load_plain_job_order(str(job), default_loader()) is None
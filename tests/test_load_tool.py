@@ -1,13 +1,19 @@
 from pathlib import Path
+from typing import Any, Dict, List, cast
 
 import pytest
+from schema_salad.avro.schema import Names
+from schema_salad.ref_resolver import file_uri
 
+from cwltool import process
 from cwltool.context import LoadingContext, RuntimeContext
+from cwltool.document_cache import restore_entry
 from cwltool.errors import WorkflowException
-from cwltool.load_tool import load_tool
+from cwltool.load_tool import fetch_document, load_tool, prefetch_documents
 from cwltool.process import use_custom_schema, use_standard_schema
 from cwltool.update import INTERNAL_VERSION
 from cwltool.utils import CWLObjectType
+from cwltool.workflow import Workflow
 
 from .util import get_data
 
@@ -98,3 +104,133 @@ def test_load_graph_fragment_from_packed() -> None:
         ]
     finally:
         use_standard_schema("v1.0")
+
+
+def test_load_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Loading through --load-cache reuses entries until a dependency changes."""
+    for name in ("count-lines1-wf.cwl", "wc-tool.cwl", "parseInt-tool.cwl"):
+        (tmp_path / name).write_text(Path(get_data("tests/wf/" + name)).read_text())
+    cachedir = tmp_path / "cache"
+    restored = []  # type: List[str]
+
+    def counting_restore_entry(loader: Any, entry: Dict[str, Any]) -> Any:
+        restored.append(entry["uri"].rsplit("/", 1)[-1])
+        return restore_entry(loader, entry)
+
+    monkeypatch.setattr("cwltool.load_tool.restore_entry", counting_restore_entry)
+
+    def load() -> Workflow:
+        loadingContext = LoadingContext({"load_cache": str(cachedir)})
+        tool = load_tool(str(tmp_path / "count-lines1-wf.cwl"), loadingContext)
+        assert isinstance(tool, Workflow)
+        return tool
+
+    first = load()
+    entries = sorted(cachedir.iterdir())
+    assert entries
+    assert restored == []
+
+    second = load()
+    assert sorted(cachedir.iterdir()) == entries
+    assert sorted(restored) == [
+        "count-lines1-wf.cwl",
+        "parseInt-tool.cwl",
+        "wc-tool.cwl",
+    ]
+    assert first.tool["id"] == second.tool["id"]
+
+    def wc_step(workflow: Workflow) -> CWLObjectType:
+        for step in workflow.steps:
+            if step.tool["run"].endswith("wc-tool.cwl"):
+                return step.embedded_tool.tool
+        raise AssertionError("wc-tool step not found")
+
+    assert "label" not in wc_step(second)
+
+    wc_tool = tmp_path / "wc-tool.cwl"
+    wc_tool.write_text(wc_tool.read_text() + "label: changed\n")
+    del restored[:]
+    third = load()
+    assert "count-lines1-wf.cwl" in restored
+    assert "wc-tool.cwl" not in restored
+    assert wc_step(third)["label"] == "changed"
+
+
+def test_compiled_schema_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Schemas are compiled once and then loaded from the schema cache."""
+    monkeypatch.setenv("CWLTOOL_SCHEMA_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(process, "SCHEMA_CACHE", {})
+    built = process.get_schema("v1.1")
+    assert len(list(tmp_path.iterdir())) == 1
+
+    monkeypatch.setattr(process, "SCHEMA_CACHE", {})
+    loaded = process.get_schema("v1.1")
+    assert loaded is not built
+    assert isinstance(loaded[1], Names)
+    assert sorted(loaded[1].names) == sorted(cast(Names, built[1]).names)
+    assert loaded[0].ctx == built[0].ctx
+    assert "https://w3id.org/cwl/cwl#File" in loaded[3].idx
+
+    tool = load_tool(get_data("tests/echo.cwl"), LoadingContext())
+    for _ in tool.job({"inp": "abc"}, None, RuntimeContext()):
+        pass
+
+
+def test_compiled_schema_cache_opt_in(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Compiled schemas are only written to disk when a cache is given."""
+    monkeypatch.delenv("CWLTOOL_SCHEMA_CACHE_DIR", raising=False)
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "home"))
+    monkeypatch.setattr(process, "SCHEMA_CACHE", {})
+    process.get_schema("v1.1")
+    assert not (tmp_path / "home").exists()
+
+    monkeypatch.setattr(process, "SCHEMA_CACHE", {})
+    process.get_schema("v1.1", str(tmp_path / "cache"))
+    assert len(list((tmp_path / "cache" / "schemas").iterdir())) == 1
+
+
+def test_interned_process_schemas() -> None:
+    """Identical tools share their schemas and requirement tuples."""
+    first = load_tool(get_data("tests/echo.cwl"), LoadingContext())
+    second = load_tool(get_data("tests/echo.cwl"), LoadingContext())
+    assert first is not second
+    assert first.names is second.names
+    assert first.inputs_record_schema is second.inputs_record_schema
+    assert first.original_requirements is second.original_requirements
+    assert isinstance(first.original_requirements, tuple)
+    assert first.requirements is not second.requirements
+
+    # Jobs add the types they bind to their own copy of the names.
+    builder = first._init_job({"inp": "abc"}, RuntimeContext())
+    assert builder.names is not first.names
+    assert builder.names.names == first.names.names
+    builder.names.names["job_time_type"] = builder.names.names["File"]
+    assert "job_time_type" not in first.names.names
+
+    loadingContext = LoadingContext()
+    loadingContext.requirements = [
+        {"class": "EnvVarRequirement", "envDef": [{"envName": "A", "envValue": "b"}]}
+    ]
+    third = load_tool(get_data("tests/echo.cwl"), loadingContext)
+    assert third.names is not first.names
+    assert third.original_requirements is not first.original_requirements
+
+
+def test_prefetch_documents() -> None:
+    """Documents referenced through run are fetched before resolution."""
+    loadingContext, workflowobj, uri = fetch_document(
+        get_data("tests/wf/count-lines1-wf.cwl"), LoadingContext()
+    )
+    assert loadingContext.loader is not None
+    prefetch_documents(loadingContext.loader, workflowobj, uri, 4)
+    for name in ("wc-tool.cwl", "parseInt-tool.cwl"):
+        assert file_uri(get_data("tests/wf/" + name)) in loadingContext.loader.idx
+
+    tool = load_tool(
+        get_data("tests/wf/count-lines1-wf.cwl"), LoadingContext({"parallel_fetch": 4})
+    )
+    assert isinstance(tool, Workflow)
+    assert len(tool.steps) == 2
@@ -0,0 +1,188 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, List, Optional
+
+from cwltool import memo
+from cwltool.context import RuntimeContext
+from cwltool.utils import CWLObjectType
+
+from .util import get_main_output
+
+TOOL = """\
+cwlVersion: v1.1
+class: CommandLineTool
+inputs:
+  f: File
+baseCommand: [sh, -c]
+arguments: ["mkdir dir && wc -c < $(inputs.f.path) > dir/size.txt"]
+outputs:
+  dir:
+    type: Directory
+    outputBinding: {glob: dir}
+"""
+
+EXPRESSION = """\
+cwlVersion: v1.1
+class: ExpressionTool
+requirements:
+  InlineJavascriptRequirement: {}
+inputs:
+  f: File
+  dir: Directory?
+outputs:
+  same: File
+  literal: File
+expression: |
+  ${ return {"same": inputs.f,
+             "literal": {"class": "File", "basename": "x.txt", "contents": "x"}}; }
+"""
+
+SUBWORKFLOW = """\
+cwlVersion: v1.1
+class: Workflow
+inputs:
+  f: File
+outputs:
+  dir: {type: Directory, outputSource: measure/dir}
+  literal: {type: File, outputSource: pick/literal}
+steps:
+  measure:
+    run: tool.cwl
+    in: {f: f}
+    out: [dir]
+  pick:
+    run: expression.cwl
+    in: {f: f, dir: measure/dir}
+    out: [literal]
+"""
+
+WORKFLOW = """\
+cwlVersion: v1.1
+class: Workflow
+requirements:
+  SubworkflowFeatureRequirement: {}
+inputs:
+  infile: File
+outputs:
+  same: {type: File, outputSource: expr/same}
+  dir: {type: Directory, outputSource: sub/dir}
+  literal: {type: File, outputSource: sub/literal}
+steps:
+  expr:
+    run: expression.cwl
+    in: {f: infile}
+    out: [same]
+  sub:
+    run: subworkflow.cwl
+    in: {f: infile}
+    out: [dir, literal]
+"""
+
+
+def write_workflow(tmp_path: Path) -> None:
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    (tmp_path / "expression.cwl").write_text(EXPRESSION)
+    (tmp_path / "subworkflow.cwl").write_text(SUBWORKFLOW)
+    (tmp_path / "wf.cwl").write_text(WORKFLOW)
+    (tmp_path / "input.txt").write_text("input\n")
+
+
+def run(tmp_path: Path, outdir: str, *options: str) -> Any:
+    error_code, stdout, stderr = get_main_output(
+        [
+            "--cachedir",
+            str(tmp_path / "cache"),
+            "--outdir",
+            str(tmp_path / outdir),
+            *options,
+            str(tmp_path / "wf.cwl"),
+            "--infile",
+            str(tmp_path / "input.txt"),
+        ]
+    )
+    assert error_code == 0, stderr
+    return json.loads(stdout), stderr
+
+
+def test_memoized_steps(tmp_path: Path) -> None:
+    """Expressions and sub-workflows are not run again with the same inputs."""
+    write_workflow(tmp_path)
+    first, stderr = run(tmp_path, "first")
+    assert stderr.count("Output cached") == 3
+    assert "Output of job will be cached" in stderr
+
+    second, stderr = run(tmp_path, "second")
+    assert "[step expr] Using cached output" in stderr
+    assert "[step sub] Using cached output" in stderr
+    assert "[job" not in stderr
+    assert "[workflow sub]" not in stderr
+    assert (tmp_path / "second" / "dir" / "size.txt").read_text().strip() == "6"
+    assert (tmp_path / "second" / "x.txt").read_text() == "x"
+    assert (tmp_path / "second" / "input.txt").read_text() == "input\n"
+    for name in ("same", "dir", "literal"):
+        assert second[name]["basename"] == first[name]["basename"]
+    assert second["same"]["checksum"] == first["same"]["checksum"]
+
+    (tmp_path / "input.txt").write_text("changed input\n")
+    third, stderr = run(tmp_path, "third")
+    assert "Using cached output" not in stderr
+    assert (tmp_path / "third" / "dir" / "size.txt").read_text().strip() == "14"
+
+
+def test_memoized_steps_parallel(tmp_path: Path) -> None:
+    """The outputs restored for memoized steps are removed after the run."""
+    write_workflow(tmp_path)
+    run(tmp_path, "first", "--parallel")
+    for outdir in ("second", "third"):
+        _, stderr = run(tmp_path, outdir, "--parallel")
+        assert "[step sub] Using cached output" in stderr
+        assert (tmp_path / outdir / "x.txt").read_text() == "x"
+        assert sorted(p.name for p in (tmp_path / "cache").iterdir()) == [
+            "blobs",
+            "index.sqlite",
+            "locks",
+        ]
+
+
+def test_not_memoized(tmp_path: Path) -> None:
+    """Sub-workflows running anything that can't be reused are always run."""
+    write_workflow(tmp_path)
+    (tmp_path / "tool.cwl").write_text(
+        TOOL.replace("inputs:", "hints:\n  WorkReuse: {enableReuse: false}\ninputs:")
+    )
+    run(tmp_path, "first")
+    _, stderr = run(tmp_path, "second")
+    assert "[step expr] Using cached output" in stderr
+    assert "[step sub] Using cached output" not in stderr
+
+
+def test_changed_reference(tmp_path: Path) -> None:
+    """Entries referring to files that changed since are not used."""
+    runtime_context = RuntimeContext({"cachedir": str(tmp_path / "cache")})
+    outside = tmp_path / "outside.txt"
+    outside.write_text("outside\n")
+    outputs = {
+        "f": {"class": "File", "location": outside.as_uri(), "path": str(outside)}
+    }  # type: CWLObjectType
+    received = []  # type: List[Optional[CWLObjectType]]
+
+    def callback(out: Optional[CWLObjectType], status: str) -> None:
+        received.append(out)
+
+    memo.remember("key", "step", runtime_context, callback, outputs, "success")
+    assert received == [outputs]
+    job = memo.recall("key", "step", callback, runtime_context)
+    assert job is not None
+    job.run(runtime_context)
+    assert received[1] == {
+        "f": {
+            "class": "File",
+            "location": outside.as_uri(),
+            "checksum": "sha1$" + hashlib.sha1(b"outside\n").hexdigest(),  # nosec
+        }
+    }
+
+    outside.write_text("changed\n")
+    assert memo.recall("key", "step", callback, runtime_context) is None
+    assert memo.recall("key", "step", callback, runtime_context) is None
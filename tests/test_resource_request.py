@@ -0,0 +1,125 @@
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+import cwltool.resource_request
+from cwltool.context import LoadingContext, RuntimeContext
+from cwltool.errors import WorkflowException
+from cwltool.load_tool import load_tool
+from cwltool.process import Process
+from cwltool.resource_request import eval_resource, referenced_inputs
+from cwltool.utils import CWLObjectType
+from cwltool.workflow import default_make_tool
+
+TOOL = """\
+cwlVersion: v1.1
+class: CommandLineTool
+requirements:
+  InlineJavascriptRequirement: {}
+  ResourceRequirement:
+    coresMin: 2
+    coresMax: $(inputs.n + 2)
+    ramMin: $(inputs["n"] * 100)
+    tmpdirMax: $(runtime.outdir.length)
+    outdirMin: "$(inputs.dir ? 20 : 10)"
+inputs:
+  n: int
+  scattered: int
+  dir: boolean?
+outputs: []
+baseCommand: echo
+"""
+
+
+@pytest.fixture
+def counted_evals(monkeypatch: Any) -> List[str]:
+    """Record the resource expressions that are evaluated."""
+    evaluated = []  # type: List[str]
+
+    def counting_eval(builder: Any, resource_req: Any) -> Any:
+        evaluated.append(resource_req)
+        return eval_resource(builder, resource_req)
+
+    monkeypatch.setattr(cwltool.resource_request, "eval_resource", counting_eval)
+    return evaluated
+
+
+def load(tmp_path: Path, text: str) -> Process:
+    tool = tmp_path / "tool.cwl"
+    tool.write_text(text)
+    return load_tool(
+        str(tool), LoadingContext({"construct_tool_object": default_make_tool})
+    )
+
+
+def test_referenced_inputs() -> None:
+    """Expressions are remembered only if they depend on nothing but inputs."""
+    assert referenced_inputs("$(inputs.a + inputs['b'] * inputs.a)") == ("a", "b")
+    assert referenced_inputs('${ return inputs["a b"].size; }') == ("a b",)
+    assert referenced_inputs("$(1024)") == ()
+    for expr in (
+        "$(inputs)",
+        "$(Object.keys(inputs).length)",
+        "$(inputs[name])",
+        "$(runtime.cores)",
+        "${ return this.inputs.a; }",
+        "$(Math.random() * inputs.a)",
+    ):
+        assert referenced_inputs(expr) is None, expr
+
+
+def test_resources_remembered(tmp_path: Path, counted_evals: List[str]) -> None:
+    """Expressions are only evaluated again when the inputs they use change."""
+    tool = load(tmp_path, TOOL)
+    runtime_context = RuntimeContext({"outdir": str(tmp_path)})
+    jobs = [{"n": 1, "scattered": i} for i in range(5)]  # type: List[CWLObjectType]
+    jobs.append({"n": 2, "scattered": 0, "dir": True})
+    resources = [tool._init_job(job, runtime_context).resources for job in jobs]
+    outdir = len(str(tmp_path))
+    assert resources == 5 * [
+        {"cores": 2, "ram": 100, "tmpdirSize": outdir, "outdirSize": 10}
+    ] + [{"cores": 2, "ram": 200, "tmpdirSize": outdir, "outdirSize": 20}]
+    assert counted_evals == [
+        "$(inputs.n + 2)",
+        '$(inputs["n"] * 100)',
+        "$(runtime.outdir.length)",
+        "$(inputs.dir ? 20 : 10)",
+    ] + 4 * ["$(runtime.outdir.length)"] + [
+        "$(inputs.n + 2)",
+        '$(inputs["n"] * 100)',
+        "$(runtime.outdir.length)",
+        "$(inputs.dir ? 20 : 10)",
+    ]
+
+
+def test_static_resources(tmp_path: Path, counted_evals: List[str]) -> None:
+    """Literal requests are read once, and overridden requirements are used."""
+    tool = load(
+        tmp_path,
+        "cwlVersion: v1.0\n"
+        "class: CommandLineTool\n"
+        "hints:\n"
+        "  ResourceRequirement: {coresMax: 3, tmpdirMin: 4096}\n"
+        "inputs: []\n"
+        "outputs: []\n"
+        "baseCommand: echo\n",
+    )
+    runtime_context = RuntimeContext({"outdir": str(tmp_path)})
+    first = tool._init_job({}, runtime_context).resources
+    assert first == {"cores": 3, "ram": 1024, "tmpdirSize": 4096, "outdirSize": 1024}
+    first["cores"] = 100
+    assert tool._init_job({}, runtime_context).resources["cores"] == 3
+    tool.requirements.append({"class": "ResourceRequirement", "ramMin": 2048})
+    second = tool._init_job({}, runtime_context).resources
+    assert second == {"cores": 1, "ram": 2048, "tmpdirSize": 1024, "outdirSize": 1024}
+    assert counted_evals == []
+
+
+def test_resource_expression_type(tmp_path: Path) -> None:
+    """Expressions giving something other than a number are still refused."""
+    tool = load(tmp_path, TOOL.replace("$(inputs.n + 2)", "$([inputs.n])"))
+    runtime_context = RuntimeContext({"outdir": str(tmp_path)})
+    for _ in range(2):
+        with pytest.raises(WorkflowException, match="incorrect return type"):
+            tool._init_job({"n": 1, "scattered": 0}, runtime_context)
@@ -0,0 +1,159 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Iterator, Tuple, cast
+
+import pytest
+
+import cwltool.workflow  # noqa: F401  # sets the default tool constructor
+from cwltool.context import LoadingContext, RuntimeContext
+from cwltool.server import CWLServer, make_http_server
+
+from .util import get_data
+
+TOKEN = "secret"
+
+
+@pytest.fixture
+def api(tmp_path: Path) -> Iterator[Tuple[str, CWLServer]]:
+    """A server on a free local port."""
+    cwl_server = CWLServer(
+        LoadingContext(),
+        RuntimeContext({"outdir": str(tmp_path / "out")}),
+        workers=2,
+        root=str(tmp_path),
+    )
+    httpd = make_http_server("127.0.0.1:0", cwl_server, TOKEN)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    yield f"http://{host}:{port}", cwl_server
+    httpd.shutdown()
+    httpd.server_close()
+    cwl_server.shutdown()
+
+
+def request(url: str, body: Any = None, token: str = TOKEN) -> Any:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    headers = {"Authorization": f"Bearer {token}"}
+    req = urllib.request.Request(url, data=data, headers=headers)
+    with urllib.request.urlopen(req, timeout=60) as response:
+        return response.read().decode("utf-8")
+
+
+def test_server_runs(api: Tuple[str, CWLServer]) -> None:
+    """Submitted runs execute, stream their status and reuse the loaded tool."""
+    base, cwl_server = api
+    tool = get_data("tests/echo.cwl")
+    run_id = json.loads(
+        request(base + "/runs", {"tool": tool, "job_order": {"inp": "hello"}})
+    )["id"]
+
+    events = [
+        json.loads(line)
+        for line in request(f"{base}/runs/{run_id}/events").splitlines()
+    ]
+    assert events[0]["status"] == "queued"
+    assert events[-1]["status"] == "success"
+    assert events[-1]["output"] == {"out": "hello\n"}
+
+    loaded = cwl_server.load(tool)
+    second = json.loads(
+        request(base + "/runs", {"tool": tool, "job_order": {"inp": "again"}})
+    )["id"]
+    assert cwl_server.wait(second, timeout=60).output == {"out": "again\n"}
+    assert cwl_server.load(tool) is loaded
+
+    state = json.loads(request(f"{base}/runs/{second}"))
+    assert state["status"] == "success"
+
+
+def test_server_reports_errors(api: Tuple[str, CWLServer]) -> None:
+    """A run that cannot be loaded ends in the error state."""
+    base, cwl_server = api
+    run_id = json.loads(
+        request(base + "/runs", {"tool": "does-not-exist.cwl", "job_order": {}})
+    )["id"]
+    run = cwl_server.wait(run_id, timeout=60)
+    assert run.status == "error"
+    assert run.error
+
+
+def test_server_requires_token(api: Tuple[str, CWLServer]) -> None:
+    """Requests without the right token are refused before anything runs."""
+    base, cwl_server = api
+    tool = get_data("tests/echo.cwl")
+    for token in ("", "wrong"):
+        with pytest.raises(urllib.error.HTTPError) as err:
+            request(base + "/runs", {"tool": tool, "job_order": {}}, token=token)
+        assert err.value.code == 401
+    with pytest.raises(urllib.error.HTTPError) as err:
+        request(base + "/runs/0", token="wrong")
+    assert err.value.code == 401
+    assert cwl_server.runs == {}
+
+
+def test_server_confines_directories(
+    api: Tuple[str, CWLServer], tmp_path: Path
+) -> None:
+    """Base and output directories outside of the root are refused."""
+    base, cwl_server = api
+    tool = get_data("tests/echo.cwl")
+    for field in ("basedir", "outdir"):
+        for path in (str(tmp_path.parent), "../elsewhere", "/"):
+            body = {"tool": tool, "job_order": {"inp": "x"}, field: path}
+            with pytest.raises(urllib.error.HTTPError) as err:
+                request(base + "/runs", body)
+            assert err.value.code == 403
+    assert cwl_server.runs == {}
+
+    run = cwl_server.submit(tool, {"inp": "x"}, outdir="results")
+    assert run.outdir == str(tmp_path.resolve() / "results")
+    assert cwl_server.wait(run.id, timeout=60).status == "success"
+
+
+TOOL = """\
+cwlVersion: v1.1
+class: CommandLineTool
+inputs:
+  message: string
+baseCommand: echo
+stdout: out.txt
+arguments: [$(inputs.message)]
+outputs:
+  out: stdout
+"""
+
+
+def test_server_outdirs(tmp_path: Path) -> None:
+    """Runs get their own output directories, and finished runs are pruned."""
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    cwl_server = CWLServer(
+        LoadingContext(),
+        RuntimeContext({"outdir": str(tmp_path / "out")}),
+        workers=2,
+        max_runs=2,
+        root=str(tmp_path),
+    )
+    try:
+        runs = [
+            cwl_server.submit(str(tmp_path / "tool.cwl"), {"message": message})
+            for message in ("one", "two")
+        ]
+        for run, message in zip(runs, ("one", "two")):
+            assert cwl_server.wait(run.id, timeout=60).status == "success"
+            out = tmp_path / "out" / run.id / "out.txt"
+            assert out.read_text() == message + "\n"
+
+        # The run that finished first is the first to be forgotten.
+        last = max(runs, key=lambda run: cast(float, run.finished))
+        third = cwl_server.submit(str(tmp_path / "tool.cwl"), {"message": "three"})
+        assert sorted(cwl_server.runs) == sorted([last.id, third.id])
+        cwl_server.wait(third.id, timeout=60)
+        cwl_server.run_ttl = -1
+        cwl_server.prune()
+        assert cwl_server.runs == {}
+    finally:
+        cwl_server.shutdown()
@@ -0,0 +1,60 @@
+import copy
+from pathlib import Path
+
+import pytest
+from ruamel.yaml.comments import CommentedMap, CommentedSeq
+from schema_salad.exceptions import ValidationException
+
+from cwltool.context import LoadingContext, RuntimeContext
+from cwltool.load_tool import load_tool
+from cwltool.sourceline import PlainMap, PlainSeq, SourceLine, plain_copy
+
+from .util import get_data, get_main_output
+
+
+def test_plain_copy() -> None:
+    """Plain copies are dicts and lists which keep their source positions."""
+    tool = load_tool(get_data("tests/wf/cat.cwl"), LoadingContext()).tool
+    inputs = plain_copy(tool["inputs"])
+    assert isinstance(inputs, PlainSeq) and isinstance(inputs[0], PlainMap)
+    assert inputs == tool["inputs"]
+    assert inputs.lc is tool["inputs"].lc
+
+    again = copy.deepcopy(inputs)
+    assert again == inputs and again[0] is not inputs[0]
+    assert again[0].lc is tool["inputs"][0].lc
+
+    with pytest.raises(ValidationException, match=r"cat\.cwl:\d+:\d+: bad"):
+        with SourceLine(again[0], "type", ValidationException):
+            raise ValidationException("bad")
+
+
+def test_job_bindings_are_plain() -> None:
+    """Building a job copies no round-trip documents."""
+    tool = load_tool(get_data("tests/echo.cwl"), LoadingContext())
+    builder = tool._init_job({"inp": "hello"}, RuntimeContext())
+    for binding in builder.bindings:
+        assert not isinstance(binding, (CommentedMap, CommentedSeq))
+
+
+def test_binding_error_position(tmp_path: Path) -> None:
+    """Errors in input bindings point at the binding."""
+    tool = tmp_path / "tool.cwl"
+    tool.write_text(
+        "cwlVersion: v1.0\n"
+        "class: CommandLineTool\n"
+        "requirements:\n"
+        "  InlineJavascriptRequirement: {}\n"
+        "inputs:\n"
+        "  a:\n"
+        "    type: string\n"
+        "    inputBinding:\n"
+        "      valueFrom: $(self.nope.x)\n"
+        "outputs: []\n"
+        "baseCommand: echo\n"
+    )
+    rc, _, stderr = get_main_output(
+        ["--disable-js-validation", "--outdir", str(tmp_path), str(tool), "-a", "x"]
+    )
+    assert rc == 1
+    assert "tool.cwl:9:7: Expression evaluation error" in stderr
@@ -0,0 +1,80 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from cwltool.errors import WorkflowException
+from cwltool.pathmapper import PathMapper
+from cwltool.process import _staging_rounds, stage_files
+
+
+def make_mapper(tmp_path: Path, count: int) -> PathMapper:
+    pathmapper = PathMapper([], str(tmp_path), str(tmp_path / "stage"))
+    for index in range(count):
+        src = tmp_path / "src" / str(index)
+        src.parent.mkdir(exist_ok=True)
+        src.write_text(str(index))
+        target = tmp_path / "stage" / str(index % 7) / str(index)
+        pathmapper.update(str(src), str(src), str(target), "File", True)
+        pathmapper.update(
+            "_:%d" % index,
+            "copy %d" % index,
+            str(tmp_path / "stage" / "writable" / str(index)),
+            "CreateWritableFile",
+            True,
+        )
+    return pathmapper
+
+
+@pytest.mark.parametrize("workers", [1, 8])
+def test_stage_files(tmp_path: Path, workers: int) -> None:
+    """Files are staged the same way whatever the number of workers."""
+    pathmapper = make_mapper(tmp_path, 100)
+    pathmapper.update(
+        "_:dir", "_:dir", str(tmp_path / "stage" / "created"), "WritableDirectory", True
+    )
+    pathmapper.update(
+        "_:inside",
+        "inside",
+        str(tmp_path / "stage" / "created" / "inside"),
+        "CreateFile",
+        True,
+    )
+    stage_files(pathmapper, workers=workers)
+    for index in range(100):
+        link = tmp_path / "stage" / str(index % 7) / str(index)
+        assert os.readlink(str(link)) == str(tmp_path / "src" / str(index))
+        created = pathmapper.mapper("_:%d" % index)
+        assert created.resolved == created.target
+        assert Path(created.target).read_text() == "copy %d" % index
+    assert (tmp_path / "stage" / "created" / "inside").read_text() == "inside"
+
+
+@pytest.mark.parametrize("workers", [1, 8])
+def test_first_error(tmp_path: Path, workers: int) -> None:
+    """The error raised is that of the first entry that can't be staged."""
+    pathmapper = make_mapper(tmp_path, 20)
+    for name in ("missing1", "missing2"):
+        pathmapper.update(
+            name,
+            str(tmp_path / name),
+            str(tmp_path / "stage" / name),
+            "WritableFile",
+            True,
+        )
+    with pytest.raises(FileNotFoundError, match="missing1"):
+        stage_files(pathmapper, workers=workers)
+
+
+def test_conflict(tmp_path: Path) -> None:
+    pathmapper = make_mapper(tmp_path, 2)
+    target = str(tmp_path / "stage" / "0" / "0")
+    pathmapper.update("other", "other", target, "File", True)
+    with pytest.raises(WorkflowException, match="File staging conflict"):
+        stage_files(pathmapper, workers=8)
+
+
+def test_staging_rounds() -> None:
+    """Targets come after those they are inside of, and after the same ones."""
+    targets = ["/a/b/c", "/a", "/d", "/a/b", "/d", "/a/e"]
+    assert _staging_rounds(targets) == [[1, 2], [3, 4, 5], [0]]
@@ -0,0 +1,120 @@
+import csv
+import os
+from pathlib import Path
+
+import pytest
+
+from cwltool.docker import DockerCommandLineJob
+from cwltool.file_copy import writable_copy
+from cwltool.udocker import UDockerCommandLineJob
+
+from .util import get_main_output
+
+TOOL = """\
+cwlVersion: v1.1
+class: CommandLineTool
+requirements:
+  InitialWorkDirRequirement:
+    listing:
+      - entry: $(inputs.infile)
+        writable: true
+      - entry: $(inputs.indir)
+        writable: true
+inputs:
+  infile: File
+  indir: Directory
+baseCommand: [sh, -c]
+arguments:
+  - "echo more >> $(inputs.infile.basename) && echo new > $(inputs.indir.basename)/new"
+outputs:
+  out:
+    type: File
+    outputBinding: {glob: $(inputs.infile.basename)}
+  dir:
+    type: Directory
+    outputBinding: {glob: $(inputs.indir.basename)}
+"""
+
+
+def make_tree(path: Path) -> None:
+    (path / "sub").mkdir(parents=True)
+    (path / "sub" / "a").write_text("a\n")
+    (path / "b").symlink_to(path / "sub" / "a")
+    (path / "sub" / "a").chmod(0o444)
+    (path / "sub").chmod(0o555)
+
+
+@pytest.mark.parametrize("strategy", ["link", "reflink", "copy"])
+def test_writable_copy(tmp_path: Path, strategy: str) -> None:
+    """Copies are writable, whatever the modes of the original."""
+    make_tree(tmp_path / "src")
+    dst = writable_copy(str(tmp_path / "src"), str(tmp_path / "dst"), strategy)
+    assert dst == str(tmp_path / "dst")
+    for name in ("sub/a", "b"):
+        copied = tmp_path / "dst" / name
+        assert not copied.is_symlink()
+        assert not os.path.samefile(str(copied), str(tmp_path / "src" / "sub" / "a"))
+        assert copied.read_text() == "a\n"
+        assert copied.stat().st_mode & 0o777 == 0o644
+    assert (tmp_path / "dst" / "sub").stat().st_mode & 0o777 == 0o755
+    (tmp_path / "into").mkdir()
+    dst = writable_copy(str(tmp_path / "src" / "sub" / "a"), str(tmp_path / "into"))
+    assert dst == str(tmp_path / "into" / "a")
+    (tmp_path / "src" / "sub").chmod(0o755)
+
+
+@pytest.mark.parametrize("staging", ["reflink", "copy"])
+def test_writable_inputs(tmp_path: Path, staging: str) -> None:
+    """Jobs write to their own copies of writable inputs."""
+    (tmp_path / "tool.cwl").write_text(TOOL)
+    (tmp_path / "input.txt").write_text("input\n")
+    (tmp_path / "input.txt").chmod(0o444)
+    make_tree(tmp_path / "indir")
+    error_code, _, stderr = get_main_output(
+        [
+            "--writable-staging",
+            staging,
+            "--outdir",
+            str(tmp_path / "out"),
+            str(tmp_path / "tool.cwl"),
+            "--infile",
+            str(tmp_path / "input.txt"),
+            "--indir",
+            str(tmp_path / "indir"),
+        ]
+    )
+    (tmp_path / "indir" / "sub").chmod(0o755)
+    assert error_code == 0, stderr
+    assert (tmp_path / "out" / "input.txt").read_text() == "input\nmore\n"
+    assert (tmp_path / "out" / "indir" / "new").read_text() == "new\n"
+    assert (tmp_path / "input.txt").read_text() == "input\n"
+    assert not (tmp_path / "indir" / "new").exists()
+
+
+def test_overlay_volume(tmp_path: Path) -> None:
+    """Docker mounts writable directories behind an overlay; udocker can't."""
+    (tmp_path / "src").mkdir()
+    runtime = ["docker", "run"]
+    assert DockerCommandLineJob.append_overlay_volume(
+        runtime, str(tmp_path / "src"), "/var/lib/cwl/src", str(tmp_path / "layers")
+    )
+    assert runtime[-1].startswith("--mount=")
+    options = next(csv.reader([runtime[-1][len("--mount=") :]]))
+    assert options[:5] == [
+        "type=volume",
+        "target=/var/lib/cwl/src",
+        "volume-driver=local",
+        "volume-opt=type=overlay",
+        "volume-opt=device=overlay",
+    ]
+    (layers,) = tmp_path.glob("layers*")
+    assert options[5] == "volume-opt=o=lowerdir={},upperdir={},workdir={}".format(
+        tmp_path / "src", layers / "upper", layers / "work"
+    )
+    assert (layers / "upper").is_dir() and (layers / "work").is_dir()
+
+    runtime = []
+    assert not UDockerCommandLineJob.append_overlay_volume(
+        runtime, str(tmp_path / "src"), "/var/lib/cwl/src", str(tmp_path / "other")
+    )
+    assert runtime == []
@@ -2,10 +2,10 @@
 #
 # NOTE: This dynamically typed stub was automatically generated by stubgen.
 
-from typing import Any
+from typing import Any, Optional
 from requests.adapters import HTTPAdapter
 from .controller import CacheController as CacheController
-from .cache import DictCache as DictCache
+from .cache import BaseCache, DictCache as DictCache
 from .filewrapper import CallbackFileWrapper as CallbackFileWrapper
 
 class CacheControlAdapter(HTTPAdapter):
@@ -13,7 +13,16 @@ class CacheControlAdapter(HTTPAdapter):
     cache = ...  # type: Any
     heuristic = ...  # type: Any
     controller = ...  # type: Any
-    def __init__(self, cache=None, cache_etags=True, controller_class=None, serializer=None, heuristic=None, *args, **kw): ...
+    def __init__(
+        self,
+        cache: Optional[BaseCache] = ...,
+        cache_etags: bool = ...,
+        controller_class: Any = ...,
+        serializer: Any = ...,
+        heuristic: Any = ...,
+        *args: Any,
+        **kw: Any
+    ) -> None: ...
     def send(self, request, **kw): ...
     def build_response(self, request, response, from_cache=False): ...
     def close(self): ...